@@ -0,0 +1,231 @@
+"""
+Admission control for the crawl endpoints
+A global in-flight cap with a bounded FIFO wait queue, plus a per-user token
+bucket. Requests over a user's rate are rejected with 429; requests that
+would overflow the queue or wait past the queue deadline are shed with 503.
+Both carry a Retry-After hint. Limits are per worker process.
+"""
+
+import asyncio
+import logging
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Crawls running at once; further requests wait in the queue
+ADMISSION_MAX_IN_FLIGHT = int(os.environ.get("ADMISSION_MAX_IN_FLIGHT", "16"))
+ADMISSION_MAX_QUEUE = int(os.environ.get("ADMISSION_MAX_QUEUE", "64"))
+# Longest a request may wait for a slot before it is shed
+ADMISSION_QUEUE_TIMEOUT = float(os.environ.get("ADMISSION_QUEUE_TIMEOUT_SECONDS", "15"))
+# Per-user token bucket; 0 disables rate limiting
+RATE_LIMIT_PER_MINUTE = float(os.environ.get("RATE_LIMIT_PER_MINUTE", "20"))
+RATE_LIMIT_BURST = int(os.environ.get("RATE_LIMIT_BURST", "5"))
+RATE_LIMIT_MAX_USERS = int(os.environ.get("RATE_LIMIT_MAX_USERS", "10000"))
+
+
+class AdmissionRejected(Exception):
+    """Request refused before any work started"""
+
+    def __init__(self, status_code: int, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class TokenBucket:
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, tokens: float, updated: float):
+        self.tokens = tokens
+        self.updated = updated
+
+
+@dataclass
+class AdmissionStats:
+    admitted: int = 0
+    queued: int = 0
+    rate_limited: int = 0
+    shed_queue_full: int = 0
+    shed_queue_timeout: int = 0
+    wait_ms_total: float = 0.0
+    wait_ms_max: float = 0.0
+
+
+class AdmissionController:
+    """
+    Gate in front of expensive requests.
+
+    acquire() takes one rate-limit token for each user, all or none, then
+    its slots: at once if enough are free and nobody is queued, otherwise
+    after waiting its turn. A request costs one slot unless it asks for
+    more (a batch), capped at max_in_flight so it can always be admitted.
+    release() hands freed slots to waiters in FIFO order; a waiter that
+    needs more slots than are free holds back the ones behind it. Everything
+    runs on the event loop, so no locks are needed.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int = ADMISSION_MAX_IN_FLIGHT,
+        max_queue: int = ADMISSION_MAX_QUEUE,
+        queue_timeout: float = ADMISSION_QUEUE_TIMEOUT,
+        rate_per_minute: float = RATE_LIMIT_PER_MINUTE,
+        burst: int = RATE_LIMIT_BURST,
+        max_users: int = RATE_LIMIT_MAX_USERS,
+    ):
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self.rate_per_second = rate_per_minute / 60.0
+        self.burst = max(1, burst)
+        self.max_users = max_users
+        self.in_flight = 0
+        self.stats = AdmissionStats()
+        # (future, slots) per queued request, oldest first
+        self._waiters: Deque[Tuple[asyncio.Future, int]] = deque()
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        # Moving average of how long an admitted request holds its slot
+        self._service_seconds = 1.0
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    # Rate limiting
+
+    def _refill(self, user_id: str, now: float) -> TokenBucket:
+        bucket = self._buckets.get(user_id)
+        if bucket is None:
+            bucket = self._buckets[user_id] = TokenBucket(float(self.burst), now)
+            while len(self._buckets) > self.max_users:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(user_id)
+            bucket.tokens = min(
+                float(self.burst), bucket.tokens + (now - bucket.updated) * self.rate_per_second
+            )
+            bucket.updated = now
+        return bucket
+
+    def _take_tokens(self, user_ids) -> Optional[float]:
+        """
+        None if a token was taken from every user's bucket, otherwise seconds
+        until all of them have one; then no token is taken
+        """
+        now = time.monotonic()
+        buckets = [self._refill(user_id, now) for user_id in user_ids]
+        short = [bucket.tokens for bucket in buckets if bucket.tokens < 1]
+        if short:
+            return (1 - min(short)) / self.rate_per_second
+        for bucket in buckets:
+            bucket.tokens -= 1
+        return None
+
+    # Slots
+
+    def _retry_after(self) -> float:
+        # Time for the queue ahead to drain at the current service rate
+        return self._service_seconds * (len(self._waiters) + 1) / self.max_in_flight
+
+    async def acquire(self, *user_ids: Optional[str], slots: int = 1) -> int:
+        """Admit a request for user_ids; returns the slots taken, to pass to release()"""
+        users = list(dict.fromkeys(user_id for user_id in user_ids if user_id))
+        if users and self.rate_per_second > 0:
+            retry_after = self._take_tokens(users)
+            if retry_after is not None:
+                self.stats.rate_limited += 1
+                raise AdmissionRejected(429, "rate_limited", retry_after)
+
+        slots = min(max(1, slots), self.max_in_flight)
+        if self.in_flight + slots <= self.max_in_flight and not self._waiters:
+            self.in_flight += slots
+            self.stats.admitted += 1
+            return slots
+
+        if len(self._waiters) >= self.max_queue:
+            self.stats.shed_queue_full += 1
+            raise AdmissionRejected(503, "queue_full", self._retry_after())
+
+        waiter = asyncio.get_running_loop().create_future()
+        entry = (waiter, slots)
+        self._waiters.append(entry)
+        self.stats.queued += 1
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+            return slots
+        except asyncio.TimeoutError:
+            self.stats.shed_queue_timeout += 1
+            raise AdmissionRejected(503, "queue_timeout", self._retry_after())
+        except asyncio.CancelledError:
+            # Client went away; give back slots that were already handed over
+            if waiter.done() and not waiter.cancelled():
+                self.release(slots)
+            raise
+        finally:
+            if entry in self._waiters:
+                self._waiters.remove(entry)
+                # A large request leaving the head may let smaller ones in
+                self._admit_waiters()
+            wait_ms = (time.monotonic() - start) * 1000
+            self.stats.wait_ms_total += wait_ms
+            self.stats.wait_ms_max = max(self.stats.wait_ms_max, wait_ms)
+
+    def release(self, slots: int = 1) -> None:
+        self.in_flight -= slots
+        self._admit_waiters()
+
+    def _admit_waiters(self) -> None:
+        while self._waiters:
+            waiter, slots = self._waiters[0]
+            if waiter.done():
+                self._waiters.popleft()
+                continue
+            if self.in_flight + slots > self.max_in_flight:
+                return
+            self._waiters.popleft()
+            self.in_flight += slots
+            waiter.set_result(None)
+            self.stats.admitted += 1
+
+    @asynccontextmanager
+    async def admit(self, *user_ids: Optional[str], slots: int = 1):
+        """
+        Hold slots for the body, taking a rate-limit token from each of
+        user_ids; raises AdmissionRejected when refused
+        """
+        slots = await self.acquire(*user_ids, slots=slots)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self._service_seconds = 0.9 * self._service_seconds + 0.1 * (time.monotonic() - start)
+            self.release(slots)
+
+    def snapshot(self) -> Dict[str, Any]:
+        stats = self.stats
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "queue_depth": len(self._waiters),
+            "max_queue": self.max_queue,
+            "admitted": stats.admitted,
+            "queued": stats.queued,
+            "rate_limited": stats.rate_limited,
+            "shed_queue_full": stats.shed_queue_full,
+            "shed_queue_timeout": stats.shed_queue_timeout,
+            "avg_wait_ms": round(stats.wait_ms_total / stats.queued, 2) if stats.queued else 0.0,
+            "max_wait_ms": round(stats.wait_ms_max, 2),
+            "avg_service_seconds": round(self._service_seconds, 3),
+            "tracked_users": len(self._buckets),
+        }
+
+
+admission = AdmissionController()
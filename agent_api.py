@@ -1,28 +1,124 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
 from pydantic import BaseModel
-from dotenv import load_dotenv
-from openai import OpenAI
-from openai.types.chat import ChatCompletionMessageParam
-from supabase import create_client, Client
-import os
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
 import asyncio
+import functools
+import json
+import os
+import secrets
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+# Loads .env before the modules below read their settings
+from services import services
+
+from supabase_sources import search_query_key, source_registry
+from repository import get_repository
+from user_preferences import UserContextLoader, UserContextUnavailable, invalidate_user_context
+from write_behind import write_queue, WriteOp
+from agent_logger import log_agent_activity
+from recipe_catalog import build_normalized_rows, normalized_mode, store_normalized
+from crawl_cursor import InvalidCursor, decode_cursor, encode_cursor
+from diet_classifier import DIET_FILTER_ENABLED, requested_diet
+from durations import prompt_time_limit
+from admission import AdmissionRejected, admission
+from metrics import REQUEST_SECONDS, register_callback, render_metrics, time_stage
+from profiling import PROFILE_TOKEN, profiler
+from recipe_record import encode_json
+from tracing import server_timing, span, start_trace, timing_summary, traced
+
+if TYPE_CHECKING:
+    from openai.types.chat import ChatCompletionMessageParam
 
-from recipe_crawler import RecipeCrawler  # ✅ Use your real crawler
+# OpenAI, Supabase, httpx and bs4 are imported and connected by the service
+# container during startup, not when this module is imported
 
-# Load environment variables
-load_dotenv()
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+# Most prompts accepted by /agent/batch, and unique prompts per intent LLM call
+AGENT_BATCH_MAX_PROMPTS = int(os.environ.get("AGENT_BATCH_MAX_PROMPTS", "50"))
+INTENT_BATCH_SIZE = int(os.environ.get("INTENT_BATCH_SIZE", "20"))
+# Recipes per /agent page; /agent/more continues the same crawl
+AGENT_PAGE_SIZE = int(os.environ.get("AGENT_PAGE_SIZE", "10"))
 
-if not OPENAI_API_KEY or not SUPABASE_URL or not SUPABASE_KEY:
-    raise RuntimeError("Missing API keys or Supabase credentials in environment.")
+INTENT_SYSTEM_PROMPT = (
+    "You are a helpful assistant that extracts structured metadata from recipe prompts. "
+    "Return a valid JSON object with any of the following keys: "
+    "`diet_type`, `included_ingredients`, `excluded_ingredients`, and `cuisine`."
+)
 
-client = OpenAI(api_key=OPENAI_API_KEY)
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Check credentials, warm up clients, load recipe_sources, start the write queue
+    await services.start()
+    profiler.install(asyncio.get_running_loop())
+    try:
+        yield
+    finally:
+        await services.stop()
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+user_context_loader = UserContextLoader()
+
+# Scrape-time views of state the admission controller and write queue already keep
+register_callback(
+    "agent_admission_in_flight", "Crawl requests holding an admission slot",
+    lambda: [((), admission.in_flight)],
+)
+register_callback(
+    "agent_admission_queue_depth", "Crawl requests waiting for an admission slot",
+    lambda: [((), admission.queue_depth)],
+)
+register_callback(
+    "agent_admission_rejected_total", "Crawl requests refused by admission control",
+    lambda: [
+        (("rate_limited",), admission.stats.rate_limited),
+        (("queue_full",), admission.stats.shed_queue_full),
+        (("queue_timeout",), admission.stats.shed_queue_timeout),
+    ],
+    labelnames=["reason"],
+    kind="counter",
+)
+register_callback(
+    "agent_write_queue_depth", "Rows waiting in the write-behind queue",
+    lambda: [((), write_queue.snapshot()["depth"])],
+)
+register_callback(
+    "agent_write_queue_failed_rows_total", "Rows the write-behind queue gave up on",
+    lambda: [((), write_queue.snapshot()["failed_rows"])],
+    kind="counter",
+)
+
+def timed(endpoint: str):
+    """
+    Record end-to-end latency of an async endpoint in agent_request_seconds
+    and run it inside a trace, so its stages can be summarized
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with REQUEST_SECONDS.time(endpoint), start_trace(f"POST {endpoint}"):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+class RecipeJSONResponse(JSONResponse):
+    """Encodes Recipe records directly, skipping FastAPI's jsonable_encoder pass"""
+
+    def render(self, content) -> bytes:
+        return encode_json(content)
+
+def recipe_response(content: dict, response: Response) -> RecipeJSONResponse:
+    # Returning a Response bypasses the injected one, so carry its headers over
+    return RecipeJSONResponse(content, headers=dict(response.headers))
+
+def finish_timings(response: Response) -> Optional[dict]:
+    """Stage timings of the current request, also sent as a Server-Timing header"""
+    timings = timing_summary()
+    if timings:
+        response.headers["Server-Timing"] = server_timing(timings)
+        response.headers["X-Trace-Id"] = timings["trace_id"]
+    return timings
 
 app.add_middleware(
     CORSMiddleware,
@@ -32,45 +128,112 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected_handler(request, exc: AdmissionRejected):
+    # 429 for per-user rate limits, 503 when the server sheds load
+    return JSONResponse(
+        {"detail": exc.reason, "retry_after": exc.retry_after},
+        status_code=exc.status_code,
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
 class PromptRequest(BaseModel):
     prompt: str
     user_id: str
 
+class BatchPromptRequest(BaseModel):
+    requests: List[PromptRequest]
+
+class ProfilingUpdate(BaseModel):
+    enabled: Optional[bool] = None
+    sample_every: Optional[int] = None
+
+class ContinueRequest(BaseModel):
+    user_id: str
+    cursor: str
+
+@traced("llm_extraction")
 def extract_keywords_and_intent(prompt: str) -> dict:
-    messages: list[ChatCompletionMessageParam] = [
-        {
-            "role": "system",
-            "content": (
-                "You are a helpful assistant that extracts structured metadata from recipe prompts. "
-                "Return a valid JSON object with any of the following keys: "
-                "`diet_type`, `included_ingredients`, `excluded_ingredients`, and `cuisine`."
-            ),
-        },
+    messages: "list[ChatCompletionMessageParam]" = [
+        {"role": "system", "content": INTENT_SYSTEM_PROMPT},
         {"role": "user", "content": f"Prompt: {prompt}"}
     ]
 
     try:
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=messages,
-            temperature=0.3,
-        )
+        with time_stage("llm_extraction"):
+            response = services.openai.chat.completions.create(
+                model="gpt-3.5-turbo",
+                messages=messages,
+                temperature=0.3,
+            )
         raw = response.choices[0].message.content.strip()
         return eval(raw) if raw.startswith("{") else {"raw_response": raw}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"OpenAI error: {str(e)}")
 
-def load_user_settings(user_id: str) -> dict:
+@traced("llm_extraction", lambda prompts: {"prompts": len(prompts)})
+def extract_intents_batch(prompts: List[str]) -> List[dict]:
+    """
+    Intent metadata for several prompts from one LLM call, in prompt order.
+    Entries the model leaves out or malforms come back as {}.
+    """
+    messages: "list[ChatCompletionMessageParam]" = [
+        {
+            "role": "system",
+            "content": (
+                INTENT_SYSTEM_PROMPT
+                + " You will receive a JSON array of prompts. Respond with a JSON object "
+                "{\"results\": [...]} holding one such object per prompt, in the same order."
+            ),
+        },
+        {"role": "user", "content": f"Prompts: {json.dumps(prompts)}"},
+    ]
+
     try:
-        response = supabase \
-            .from_("user_settings") \
-            .select("*") \
-            .eq("user_id", user_id) \
-            .single() \
-            .execute()
-        return response.data or {}
+        with time_stage("llm_extraction"):
+            response = services.openai.chat.completions.create(
+                model="gpt-3.5-turbo",
+                messages=messages,
+                temperature=0.3,
+                response_format={"type": "json_object"},
+            )
+        results = json.loads(response.choices[0].message.content or "{}").get("results") or []
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Supabase error (user_settings): {str(e)}")
+        raise HTTPException(status_code=500, detail=f"OpenAI error: {str(e)}")
+
+    return [
+        results[i] if i < len(results) and isinstance(results[i], dict) else {}
+        for i in range(len(prompts))
+    ]
+
+async def extract_intents_for_prompts(prompts: List[str]) -> Tuple[Dict[str, dict], int]:
+    """
+    Intent metadata keyed by search_query_key, with one LLM call per
+    INTENT_BATCH_SIZE unique prompts. Returns (metadata by key, LLM calls made).
+    """
+    unique = {}
+    for prompt in prompts:
+        unique.setdefault(search_query_key(prompt), prompt)
+    keys = list(unique)
+    chunks = [keys[i:i + INTENT_BATCH_SIZE] for i in range(0, len(keys), INTENT_BATCH_SIZE)]
+
+    results = await asyncio.gather(
+        *(asyncio.to_thread(extract_intents_batch, [unique[key] for key in chunk]) for chunk in chunks)
+    )
+    extracted = {}
+    for chunk, metadata in zip(chunks, results):
+        extracted.update(zip(chunk, metadata))
+    return extracted, len(chunks)
+
+@traced("user_context")
+async def load_user_context(user_id: str) -> dict:
+    # Served from the shared per-user context cache; one concurrent load per miss
+    with time_stage("user_context"):
+        try:
+            return await user_context_loader.load_user_context(user_id)
+        except UserContextUnavailable as e:
+            # Never crawl without the user's allergies and dislikes
+            raise HTTPException(status_code=500, detail=f"Storage error (user context): {e}")
 
 def merge_settings_and_prompt(user_settings: dict, extracted_metadata: dict) -> dict:
     def merge_lists(key):
@@ -82,64 +245,287 @@ def merge_settings_and_prompt(user_settings: dict, extracted_metadata: dict) ->
     return {
         "diet_type": extracted_metadata.get("diet_type") or user_settings.get("diet_type"),
         "cuisine": extracted_metadata.get("cuisine"),
+        "time_constraint": extracted_metadata.get("time_constraint"),
         "included_ingredients": merge_lists("included_ingredients"),
         "excluded_ingredients": merge_lists("excluded_ingredients") +
                                 (user_settings.get("allergies") or []) +
                                 (user_settings.get("disliked_ingredients") or [])
     }
 
-# 🔄 Use RecipeCrawler for real crawling
-async def run_crawler(prompt: str, disliked_ingredients: list) -> list:
-    crawler = RecipeCrawler()
-    recipes = await crawler.crawl_and_scrape_recipes(prompt, disliked_ingredients, max_recipes=10)
-    return recipes
+async def run_crawler_page(
+    prompt: str,
+    disliked_ingredients: list,
+    url_filter=None,
+    state: Optional[dict] = None,
+    rank=None,
+    max_minutes: Optional[float] = None,
+    diet_type: Optional[str] = None,
+    query_profile: Optional[dict] = None,
+) -> Tuple[list, Optional[dict]]:
+    """
+    One page of AGENT_PAGE_SIZE recipes, picked from the candidate pool by
+    rank, plus the frontier for the next page. max_minutes, diet_type and
+    query_profile are kept in the frontier, so resumed pages apply the same
+    filters and ranking.
+    """
+    crawler = services.crawler()
+    try:
+        with span("crawl", resumed=state is not None):
+            if state is None:
+                return await crawler.start_crawl(
+                    prompt, disliked_ingredients, AGENT_PAGE_SIZE, url_filter, rank,
+                    max_minutes, diet_type, query_profile,
+                )
+            return await crawler.resume_crawl(state, AGENT_PAGE_SIZE, url_filter, rank)
+    finally:
+        await crawler.aclose()
+
+def resume_exclusions(state: dict, user_context: dict) -> list:
+    """A cursor's ingredient exclusions plus the user's current allergies and dislikes"""
+    return list(dict.fromkeys(
+        state.get("disliked_ingredients", []) + user_context.get("exclude_ingredients", [])
+    ))
+
+def crawl_diet(prompt: str, query_profile: dict) -> Optional[str]:
+    """Diet the crawl enforces on ingredients; None when filtering is off or the diet isn't classified"""
+    return requested_diet(prompt, query_profile) if DIET_FILTER_ENABLED else None
+
+@traced("ranking", lambda recipes, prompt, query_profile=None: {"recipes": len(recipes)})
+def rank_matches(recipes: list, prompt: str, query_profile: Optional[dict] = None) -> list:
+    """
+    Order a candidate pool best-first: keyword overlap, diet, time limit,
+    completeness, source reputation and macro targets (see recipe_ranker)
+    """
+    # Imported during warm-up; numpy stays out of the API import path
+    from recipe_ranker import rank_recipes, ranking_query
+
+    with time_stage("ranking"):
+        return rank_recipes(recipes, ranking_query(prompt, query_profile))
 
 # ✅ Store full recipe format in Supabase
-def store_recipe_matches(user_id: str, prompt: str, recipes: list):
+@traced("storage", lambda user_id, prompt, recipes: {"rows": len(recipes)})
+async def store_recipe_matches(user_id: str, prompt: str, recipes: list):
+    with time_stage("storage"):
+        await _store_recipe_matches(user_id, recipes)
+
+async def _store_recipe_matches(user_id: str, recipes: list):
     try:
-        rows = []
-        for recipe in recipes:
-            rows.append({
-                "user_id": user_id,
-                "title": recipe.get("title"),
-                "description": recipe.get("description"),
-                "image_url": recipe.get("image_url"),
-                "servings": recipe.get("servings"),
-                "source_url": recipe.get("source_url"),
-                "ingredients": recipe.get("ingredients"),
-                "macros": recipe.get("macros"),
-                "instructions": recipe.get("instructions"),
-                "site_name": recipe.get("site_name")
-            })
-        if rows:
-            supabase.from_("recipe_search").insert(rows).execute()
+        if normalized_mode():
+            # Recipes go to recipe_catalog once; recipe_search gets link rows only
+            catalog_rows, links = build_normalized_rows(
+                recipes, user_id, datetime.utcnow().isoformat()
+            )
+            if links:
+                await store_normalized(
+                    catalog_rows, WriteOp("insert", "recipe_search", links, service=False)
+                )
+            return
+
+        # Rows share the recipes' ingredient and instruction lists
+        rows = [recipe.to_row(user_id) for recipe in recipes]
+        if rows and not write_queue.submit(WriteOp("insert", "recipe_search", rows, service=False)):
+            await get_repository().insert_rows("recipe_search", rows, service=False)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Supabase insert error: {str(e)}")
 
 @app.post("/agent")
-async def agent_crawl_and_match(req: PromptRequest):
+@timed("/agent")
+async def agent_crawl_and_match(
+    req: PromptRequest, response: Response, x_profile: Optional[str] = Header(None)
+):
     if not req.prompt or not req.user_id:
         raise HTTPException(status_code=400, detail="Missing prompt or user_id")
 
-    extracted = extract_keywords_and_intent(req.prompt)
-    user_settings = load_user_settings(req.user_id)
-    query_profile = merge_settings_and_prompt(user_settings, extracted)
+    # Sampled or X-Profile requests are profiled, including their tasks and threads
+    with profiler.profile("agent", x_profile) as profile_session:
+        if profile_session is not None:
+            response.headers["X-Profile-Id"] = profile_session.id
+        async with admission.admit(req.user_id):
+            # Off the event loop so queued requests keep their deadlines
+            extracted = await asyncio.to_thread(extract_keywords_and_intent, req.prompt)
+            user_context = await load_user_context(req.user_id)
+            user_settings = user_context.get("settings") or {}
+            query_profile = merge_settings_and_prompt(user_settings, extracted)
+
+            enriched_prompt = req.prompt
+            disliked_ingredients = query_profile.get("excluded_ingredients", [])
+
+            all_matches, frontier = await run_crawler_page(
+                enriched_prompt,
+                disliked_ingredients,
+                user_context.get("url_filter"),
+                rank=lambda recipes: rank_matches(recipes, req.prompt, query_profile),
+                max_minutes=prompt_time_limit(req.prompt, query_profile),
+                diet_type=crawl_diet(req.prompt, query_profile),
+                query_profile=query_profile,
+            )
+            await store_recipe_matches(req.user_id, req.prompt, all_matches)
+            log_agent_activity(req.user_id, req.prompt, len(all_matches), finish_timings(response))
 
-    enriched_prompt = req.prompt
-    disliked_ingredients = query_profile.get("excluded_ingredients", [])
+            return recipe_response({
+                "status": "success",
+                "user_id": req.user_id,
+                "original_prompt": req.prompt,
+                "query_profile": query_profile,
+                "matches_found": len(all_matches),
+                "recipes": all_matches,
+                "next_cursor": encode_cursor(frontier, req.user_id) if frontier else None
+            }, response)
+
+@app.post("/agent/more")
+@timed("/agent/more")
+async def agent_more(req: ContinueRequest, response: Response):
+    # "Show more": resume the crawl frontier from a previous page's next_cursor
+    try:
+        state = decode_cursor(req.cursor, req.user_id)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=f"Invalid cursor: {e}")
+
+    async with admission.admit(req.user_id):
+        # Fresh context so recipes hated or saved, and allergies or dislikes
+        # added, since the last page are applied to this one
+        user_context = await load_user_context(req.user_id)
+        state["disliked_ingredients"] = resume_exclusions(state, user_context)
+        matches, frontier = await run_crawler_page(
+            state["prompt"],
+            state["disliked_ingredients"],
+            user_context.get("url_filter"),
+            state,
+            rank=lambda recipes: rank_matches(recipes, state["prompt"], state.get("query_profile")),
+        )
+        await store_recipe_matches(req.user_id, state["prompt"], matches)
+        log_agent_activity(req.user_id, state["prompt"], len(matches), finish_timings(response))
 
-    all_matches = await run_crawler(enriched_prompt, disliked_ingredients)
-    store_recipe_matches(req.user_id, req.prompt, all_matches[:10])
+        return recipe_response({
+            "status": "success",
+            "user_id": req.user_id,
+            "original_prompt": state["prompt"],
+            "matches_found": len(matches),
+            "recipes": matches,
+            "next_cursor": encode_cursor(frontier, req.user_id) if frontier else None
+        }, response)
 
+@app.post("/agent/batch")
+@timed("/agent/batch")
+async def agent_batch_crawl_and_match(req: BatchPromptRequest, response: Response):
+    # One shared crawl for many prompts (e.g. every meal of a weekly plan):
+    # LLM calls and page fetches scale with unique prompts, not request count
+    if not req.requests:
+        raise HTTPException(status_code=400, detail="No requests in batch")
+    if len(req.requests) > AGENT_BATCH_MAX_PROMPTS:
+        raise HTTPException(
+            status_code=400, detail=f"Batch exceeds {AGENT_BATCH_MAX_PROMPTS} prompts"
+        )
+    if any(not item.prompt or not item.user_id for item in req.requests):
+        raise HTTPException(status_code=400, detail="Missing prompt or user_id")
+
+    user_ids = list(dict.fromkeys(item.user_id for item in req.requests))
+    # One rate-limit token per user in the batch, and one slot per distinct
+    # prompt crawled (the controller caps a batch at every slot)
+    crawled_prompts = len({search_query_key(item.prompt) for item in req.requests})
+    async with admission.admit(*user_ids, slots=crawled_prompts):
+        (extracted, llm_calls), contexts = await asyncio.gather(
+            extract_intents_for_prompts([item.prompt for item in req.requests]),
+            asyncio.gather(*(load_user_context(user_id) for user_id in user_ids)),
+        )
+        context_by_user = dict(zip(user_ids, contexts))
+
+        profiles = [
+            merge_settings_and_prompt(
+                context_by_user[item.user_id].get("settings") or {},
+                extracted.get(search_query_key(item.prompt)) or {},
+            )
+            for item in req.requests
+        ]
+
+        crawler = services.crawler()
+        try:
+            with span("crawl", prompts=len(req.requests)):
+                matches, plan = await crawler.crawl_batch(
+                    [
+                        {
+                            "prompt": item.prompt,
+                            "disliked_ingredients": profile.get("excluded_ingredients", []),
+                            "url_filter": context_by_user[item.user_id].get("url_filter"),
+                            "rank": functools.partial(rank_matches, prompt=item.prompt, query_profile=profile),
+                            "max_minutes": prompt_time_limit(item.prompt, profile),
+                            "diet_type": crawl_diet(item.prompt, profile),
+                        }
+                        for item, profile in zip(req.requests, profiles)
+                    ],
+                    max_recipes=AGENT_PAGE_SIZE,
+                )
+        finally:
+            await crawler.aclose()
+
+        for item, recipes in zip(req.requests, matches):
+            await store_recipe_matches(item.user_id, item.prompt, recipes)
+
+        # Every entry of the batch is logged with the timings of the shared crawl
+        timings = finish_timings(response)
+        results = []
+        for item, profile, recipes in zip(req.requests, profiles, matches):
+            log_agent_activity(item.user_id, item.prompt, len(recipes), timings)
+            results.append({
+                "user_id": item.user_id,
+                "original_prompt": item.prompt,
+                "query_profile": profile,
+                "matches_found": len(recipes),
+                "recipes": recipes
+            })
+
+        return recipe_response({
+            "status": "success",
+            "results": results,
+            "plan": {**plan, "llm_calls": llm_calls},
+        }, response)
+
+@app.post("/users/{user_id}/context/invalidate")
+def invalidate_user_context_endpoint(user_id: str):
+    # Called by database webhooks when user_settings, hated_recipes or saved_recipes change
+    invalidate_user_context(user_id)
+    return {"status": "invalidated", "user_id": user_id}
+
+@app.get("/sources")
+def sources_status():
+    return {"sources": source_registry.stats()}
+
+@app.get("/db/stats")
+def db_stats():
+    repository = get_repository()
     return {
-        "status": "success",
-        "user_id": req.user_id,
-        "original_prompt": req.prompt,
-        "query_profile": query_profile,
-        "matches_found": len(all_matches),
-        "recipes": all_matches[:10]
+        "backend": repository.name,
+        "queries": repository.query_stats(),
+        "write_queue": write_queue.snapshot(),
     }
 
+@app.get("/admission/stats")
+def admission_stats():
+    return admission.snapshot()
+
+@app.get("/metrics")
+def metrics():
+    # Prometheus text exposition format
+    return Response(render_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.get("/profiling")
+def profiling_status():
+    return profiler.status()
+
+@app.post("/profiling")
+def update_profiling(update: ProfilingUpdate, x_profile_token: Optional[str] = Header(None)):
+    # Runtime toggle for the request profiler, guarded by PROFILE_TOKEN
+    if not PROFILE_TOKEN or not x_profile_token or not secrets.compare_digest(x_profile_token, PROFILE_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid profiling token")
+    profiler.configure(update.enabled, update.sample_every)
+    return profiler.status()
+
+@app.get("/ready")
+def readiness():
+    # 200 only after warm-up; liveness is GET /
+    status = services.status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
 @app.get("/")
 def root():
     return {"message": "Kitchnsync Agent API - Step 7 (Real Recipe Crawling Ready)"}
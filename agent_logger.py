@@ -3,27 +3,30 @@ Agent Activity Logger for KitchenSync Recipe Discovery Agent
 Logs agent runs to agent_logs table for debugging post-website integration
 """
 
+import asyncio
 import logging
-import os
-from supabase import create_client, Client
+from typing import TYPE_CHECKING, Any, Dict, Optional, Set
 
-logger = logging.getLogger(__name__)
+from data_access import db
+from write_behind import write_queue, WriteOp
 
+if TYPE_CHECKING:
+    from supabase import Client
 
-def get_supabase_service_client() -> Client:
-    """Initialize Supabase client with service role key for bypassing RLS"""
-    url = os.environ.get("SUPABASE_URL")
-    service_key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
+logger = logging.getLogger(__name__)
 
-    if not url or not service_key:
-        raise ValueError(
-            "SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY environment variables must be set"
-        )
+# Strong references to inline log writes scheduled on a running loop
+_pending_writes: Set[asyncio.Task] = set()
 
-    return create_client(url, service_key)
 
+def get_supabase_service_client() -> "Client":
+    """Shared Supabase client with service role key for bypassing RLS"""
+    return db.service
 
-def log_agent_activity(user_id: str, prompt: str, results_count: int) -> None:
+
+def log_agent_activity(
+    user_id: str, prompt: str, results_count: int, timings: Optional[Dict[str, Any]] = None
+) -> None:
     """
     Log agent activity to agent_logs table for debugging
 
@@ -31,12 +34,14 @@ def log_agent_activity(user_id: str, prompt: str, results_count: int) -> None:
         user_id: User ID who made the request
         prompt: The original prompt from the user
         results_count: Number of recipes successfully stored
+        timings: Per-stage timing summary of the request's trace, stored in
+            the timings column (see sql/agent_logs_timings.sql)
 
-    Note: created_at is set automatically by the database
+    Note: created_at is set automatically by the database. When the
+    write-behind queue is running the insert is batched and sent after the
+    response instead of inline.
     """
     try:
-        supabase = get_supabase_service_client()
-
         # Prepare log data
         log_data = {
             "user_id": user_id,
@@ -44,18 +49,37 @@ def log_agent_activity(user_id: str, prompt: str, results_count: int) -> None:
             "results_count": results_count,
             # created_at is handled by database default
         }
+        if timings is not None:
+            log_data["timings"] = timings
 
-        # Insert into agent_logs table
-        response = supabase.table("agent_logs").insert(log_data).execute()
+        op = WriteOp("insert", "agent_logs", [log_data])
+        if write_queue.submit(op):
+            return
 
-        if response.data:
-            logger.info(
-                f"✓ Logged agent activity for user {user_id}: {results_count} results for prompt '{prompt[:50]}...'"
-            )
-        else:
-            logger.warning(f"No data returned when logging activity for user {user_id}")
+        # Queue not running: write through the repository directly
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+
+        if loop is not None:
+            task = loop.create_task(write_queue.apply_now(op))
+            _pending_writes.add(task)
+            task.add_done_callback(_log_write_result)
+            return
+
+        asyncio.run(write_queue.apply_now(op))
+        logger.info(
+            f"✓ Logged agent activity for user {user_id}: {results_count} results for prompt '{prompt[:50]}...'"
+        )
 
     except Exception as e:
         # Don't crash the agent if logging fails - just log the error
         logger.error(f"Failed to log agent activity for user {user_id}: {e}")
         print(f"Agent logging error: {e}")  # Also print to console for debugging
+
+
+def _log_write_result(task: asyncio.Task) -> None:
+    _pending_writes.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"Failed to log agent activity: {task.exception()}")
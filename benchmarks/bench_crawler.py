@@ -0,0 +1,440 @@
+"""
+Microbenchmarks for the RecipeCrawler parsing hot paths
+
+  html_parse            - BeautifulSoup(html, "html.parser") on recipe pages (reference cost)
+  extract_jsonld        - _extract_jsonld_recipe on pre-parsed recipe pages
+  extract_recipe_links  - _extract_recipe_links (search page harvesting, parse included)
+  is_recipe_url         - _is_recipe_url on every link found in the search pages
+  format_recipe_output  - _format_recipe_output on the extracted JSON-LD
+  parse_servings        - _parse_servings on recipeYield values
+  excluded              - exclusion check of recipe ingredient_ids against compiled dislike lists
+  canonical_ids         - ingredient_vocabulary on every parsed ingredient name, cache bypassed
+  compile_exclusions    - compile_exclusions per dislike list (terms through the cache)
+  parse_ingredient      - ingredient_parser on every ingredient line, cache bypassed
+  parse_ingredients     - parse_ingredients per recipe through the LRU cache
+  ingredient_mask       - diet_classifier on every parsed ingredient name, cache bypassed
+  diet_tags             - diet_tags per recipe through the cache
+  parse_duration        - durations.parse_duration on prep/cook times, cache bypassed
+  recipe_times          - recipe_times per recipe through the LRU cache
+  rank_recipes          - recipe_ranker (all signals) on pools of 50 recipes for a vegetarian prompt
+
+Each benchmark reports ops/s (best of --repeat runs), tracemalloc peak
+allocation and retained bytes per call, and a digest of the outputs, so a
+change to an extractor can be judged on CPU, memory and correctness.
+
+The default fixture set is generated: a few hundred pages covering the
+JSON-LD shapes seen in the wild (lists, @graph, nested mainEntity, type
+lists, several or malformed scripts, none at all) at sizes from a few KB to
+several hundred KB. --corpus replays pages recorded by
+`bench_e2e.py --record`.
+
+Usage:
+  python benchmarks/bench_crawler.py
+  python benchmarks/bench_crawler.py --only extract_jsonld parse_servings --min-time 2
+  python benchmarks/bench_crawler.py --output crawler.json
+  python benchmarks/bench_crawler.py --baseline crawler.json --max-regression 0.1   # exit 1 on regression
+"""
+
+import argparse
+import gc
+import json
+import os
+import random
+import re
+import sys
+import time
+import tracemalloc
+import zlib
+from collections.abc import Mapping
+from urllib.parse import urljoin
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from bs4 import BeautifulSoup  # noqa: E402
+
+from diet_classifier import diet_tags, ingredient_mask  # noqa: E402
+from durations import parse_duration, recipe_times  # noqa: E402
+from ingredient_parser import parse_ingredient, parse_ingredients  # noqa: E402
+from ingredient_vocabulary import canonical_ids, compile_exclusions, ingredient_ids  # noqa: E402
+from recipe_crawler import RecipeCrawler  # noqa: E402
+from recipe_ranker import rank_recipes, ranking_query  # noqa: E402
+
+INGREDIENTS = [
+    "2 cups all-purpose flour", "1 lb boneless chicken thighs", "3 cloves garlic, minced",
+    "1 tablespoon extra-virgin olive oil", "1 medium yellow onion, diced", "2 ripe tomatoes",
+    "1 (15 ounce) can chickpeas, drained", "8 ounces spaghetti", "4 cups baby spinach",
+    "2 large eggs", "½ cup crumbled feta cheese", "1 teaspoon ground cumin",
+    "1 tablespoon low-sodium soy sauce", "8 ounces cremini mushrooms, sliced",
+    "1 ¼ pounds salmon fillet", "1 (13.5 ounce) can coconut milk", "2 tablespoons red curry paste",
+    "1 (14 ounce) block extra-firm tofu", "1 cup dried brown lentils", "4 cups vegetable broth",
+    "1 pound lean ground beef", "1 red bell pepper, sliced", "Juice of 1 lime",
+    "¼ cup chopped fresh cilantro", "1 cup plain Greek yogurt", "2 tablespoons unsalted butter",
+    "1 cup shredded sharp Cheddar cheese", "Salt and freshly ground pepper to taste",
+    "1-2 jalapeños, seeded", "3 tablespoons peanut butter", "1/2 cup heavy cream",
+]
+DISLIKES = [
+    "mushrooms", "cilantro", "olives", "anchovies", "peanut", "shellfish", "tofu", "dairy",
+    "pork", "coconut", "eggplant", "blue cheese", "prawns", "tree nuts", "jalapeños", "ghost pepper",
+]
+YIELDS = [4, "4", "6 servings", "Serves 4-6", ["8", "8 servings"], "Makes 24 cookies", "", None, "one loaf", 2.0]
+DURATIONS = ["PT1H30M", "P0DT0H45M", "PT90M", "P30M", "PT0S", "PT20M30S", "1 hr 10 mins", "45 minutes", "PT", "soon"]
+WORDS = "stir simmer season fold whisk roast braise garnish serve chop slice drizzle toss".split()
+SITES = ["www.allrecipes.com", "www.eatingwell.com", "www.foodnetwork.com", "cooking.example.org"]
+
+
+# Fixture set
+
+
+def _filler(rng: random.Random, size: int) -> str:
+    blocks = []
+    total = 0
+    while total < size:
+        kind = rng.random()
+        text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(20, 120)))
+        if kind < 0.6:
+            block = f'<div class="content-block"><p>{text}</p></div>'
+        elif kind < 0.8:
+            block = f'<ul class="list">{"".join(f"<li><span>{w}</span></li>" for w in text.split()[:20])}</ul>'
+        elif kind < 0.9:
+            block = f'<script>window.__data = {json.dumps({"words": text.split()[:30]})};</script>'
+        else:
+            block = f"<style>.c{rng.randint(0, 999)} {{ margin: {rng.randint(0, 9)}px; }}</style>"
+        blocks.append(block)
+        total += len(block)
+    return "".join(blocks)
+
+
+def _nav(rng: random.Random, count: int) -> str:
+    sections = ["topics", "collections", "videos", "about", "news", "gallery", "account"]
+    links = "".join(
+        f'<a href="/{rng.choice(sections)}/{rng.randint(1, 9999)}/">Link {i}</a>' for i in range(count)
+    )
+    return f"<header><nav>{links}</nav></header>"
+
+
+def _instructions(rng: random.Random, style: int):
+    steps = [" ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 30))) + "." for _ in range(rng.randint(3, 12))]
+    if style == 0:
+        return steps
+    if style == 1:
+        return [{"@type": "HowToStep", "text": f"  {step}  "} for step in steps]
+    if style == 2:
+        return [{"@type": "HowToSection", "name": "Main", "itemListElement": [{"@type": "HowToStep", "text": s} for s in steps]}]
+    return " ".join(steps)
+
+
+def _image(rng: random.Random, site: str, index: int):
+    url = f"https://{site}/img/{index}.jpg"
+    return rng.choice([url, {"@type": "ImageObject", "url": url}, [url, url.replace(".jpg", "-2.jpg")], []])
+
+
+def _recipe(rng: random.Random, site: str, index: int) -> dict:
+    return {
+        "@context": "https://schema.org",
+        "@type": "Recipe",
+        "name": f"Recipe {index}",
+        "description": " ".join(rng.choice(WORDS) for _ in range(25)),
+        "image": _image(rng, site, index),
+        "recipeYield": rng.choice(YIELDS),
+        "recipeIngredient": rng.sample(INGREDIENTS, rng.randint(5, 25)),
+        "recipeInstructions": _instructions(rng, rng.randrange(4)),
+        "prepTime": f"PT{rng.randint(5, 40)}M",
+        "cookTime": f"PT{rng.randint(1, 3)}H{rng.randint(0, 59)}M",
+        "nutrition": _nutrition(rng.randint(150, 900), index),
+    }
+
+
+def _nutrition(calories: int, index: int) -> dict:
+    # Own generator so the macros do not shift the rest of the fixture stream
+    rng = random.Random(index)
+    nutrition = {"@type": "NutritionInformation", "calories": f"{calories} calories"}
+    for prop, high in (("proteinContent", 60), ("fatContent", 45), ("carbohydrateContent", 90)):
+        if rng.random() < 0.8:
+            nutrition[prop] = f"{rng.randint(1, high)} g"
+    return nutrition
+
+
+def _jsonld_scripts(rng: random.Random, recipe: dict, shape: int) -> str:
+    def script(data) -> str:
+        text = data if isinstance(data, str) else json.dumps(data)
+        return f'<script type="application/ld+json">{text}</script>'
+
+    webpage = {"@type": "WebPage", "name": recipe["name"]}
+    if shape == 0:
+        return script(recipe)
+    if shape == 1:
+        return script([webpage, recipe])
+    if shape == 2:
+        return script({"@context": "https://schema.org", "@graph": [{"@type": "Organization"}, webpage, recipe]})
+    if shape == 3:
+        return script({**recipe, "@type": ["Recipe", "NewsArticle"]})
+    if shape == 4:
+        return script({"@type": "BreadcrumbList", "itemListElement": []}) + script(recipe)
+    if shape == 5:
+        return script('{"@type": "Recipe", "name": ') + script(recipe)
+    if shape == 6:
+        return script({"@type": "WebPage", "mainEntity": recipe})
+    return ""  # no structured data
+
+
+def generate_fixtures(recipe_pages: int, search_pages: int, seed: int):
+    """(recipe pages, search pages) as lists of (url, html)"""
+    rng = random.Random(seed)
+    recipes = []
+    for index in range(recipe_pages):
+        site = rng.choice(SITES)
+        size = int(2 ** rng.uniform(12.5, 18.5))  # ~6 KB to ~360 KB of page body
+        recipe = _recipe(rng, site, index)
+        html = (
+            f"<!DOCTYPE html><html><head><title>{recipe['name']}</title>"
+            f"{_jsonld_scripts(rng, recipe, index % 8)}</head><body>{_nav(rng, rng.randint(40, 300))}"
+            f"<article><h1>{recipe['name']}</h1>{_filler(rng, size)}</article></body></html>"
+        )
+        recipes.append((f"https://{site}/recipe/{index}/recipe-{index}/", html))
+
+    searches = []
+    for index in range(search_pages):
+        site = rng.choice(SITES)
+        cards = []
+        for n in range(rng.randint(20, 60)):
+            path = rng.choice([f"/recipe/{n}/dish-{n}/", f"/recipes/{n}-dish", f"/dish-{n}-recipe/", f"/gallery/{n}/"])
+            href = path if rng.random() < 0.5 else f"https://{site}{path}"
+            wrapper = rng.choice(["recipe-card", "card", "recipe-item", "tile"])
+            cards.append(f'<div class="{wrapper}"><a href="{href}">Dish {n}</a></div>')
+        size = int(2 ** rng.uniform(14, 18.6))
+        html = (
+            f"<!DOCTYPE html><html><head><title>Search</title></head><body>{_nav(rng, rng.randint(50, 300))}"
+            f"<main>{''.join(cards)}</main>{_filler(rng, size)}</body></html>"
+        )
+        searches.append((f"https://{site}/search?q=dish+{index}", html))
+    return recipes, searches
+
+
+def load_corpus(directory: str):
+    """(recipe pages, search pages) from a bench_e2e.py --record corpus"""
+    with open(os.path.join(directory, "manifest.json")) as f:
+        manifest = json.load(f)
+
+    def read(name: str) -> str:
+        with open(os.path.join(directory, name), encoding="utf-8", errors="replace") as f:
+            return f.read()
+
+    recipes, searches = [], []
+    for site, entry in manifest["sites"].items():
+        base = f"https://{site}.example"
+        searches.extend((f"{base}/search?q=recorded", read(name)) for name in entry["search"])
+        recipes.extend((base + path, read(name)) for path, name in entry["pages"].items())
+    return recipes, searches
+
+
+# Harness
+
+
+def digest(results) -> str:
+    # Recipe records digest like the dicts they replaced
+    default = lambda value: dict(value) if isinstance(value, Mapping) else str(value)  # noqa: E731
+    return f"{zlib.crc32(json.dumps(results, sort_keys=True, default=default).encode()):08x}"
+
+
+def bench(func, inputs, min_time: float, max_time: float, repeat: int, alloc_inputs: int) -> dict:
+    # The first pass collects outputs for the digest and doubles as a timing run
+    started = time.perf_counter()
+    results = [func(item) for item in inputs]
+    elapsed = time.perf_counter() - started
+    best = len(inputs) / elapsed
+    spent = elapsed
+
+    for _ in range(repeat - 1):
+        if spent >= max_time:
+            break
+        calls = 0
+        started = time.perf_counter()
+        while True:
+            for item in inputs:
+                func(item)
+            calls += len(inputs)
+            elapsed = time.perf_counter() - started
+            if elapsed >= min_time:
+                break
+        best = max(best, calls / elapsed)
+        spent += elapsed
+
+    # Separate pass: tracemalloc slows every allocation, so it never overlaps
+    # timing. Parsed trees are full of reference cycles; with automatic gc
+    # off, everything a call allocated stays in generation 0, so a cheap
+    # young collection frees those cycles before reading what was retained.
+    step = max(1, len(inputs) // alloc_inputs)
+    sample = inputs[::step][:alloc_inputs]
+    peak_total = 0
+    retained_total = 0
+    gc.collect()
+    gc.disable()
+    tracemalloc.start()
+    try:
+        for item in sample:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            result = func(item)
+            peak = tracemalloc.get_traced_memory()[1]
+            del result
+            gc.collect(0)
+            peak_total += peak - before
+            retained_total += tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+        gc.enable()
+
+    return {
+        "inputs": len(inputs),
+        "ops_per_sec": round(best, 1),
+        "us_per_op": round(1e6 / best, 2),
+        "peak_alloc_kib_per_op": round(peak_total / len(sample) / 1024, 2),
+        "retained_bytes_per_op": round(retained_total / len(sample), 1),
+        "output_digest": digest(results),
+    }
+
+
+def build_benchmarks(crawler: RecipeCrawler, recipes, searches, seed: int) -> dict:
+    rng = random.Random(seed)
+    soups = [BeautifulSoup(html, "html.parser") for _, html in recipes]
+    extracted = [(url, data) for (url, _), data in zip(recipes, map(crawler._extract_jsonld_recipe, soups)) if data]
+
+    href = re.compile(r'href="([^"]+)"')
+    links = [urljoin(url, match) for url, html in searches for match in href.findall(html)]
+
+    yields = [data.get("recipeYield") for _, data in extracted] + YIELDS
+    durations = [
+        str(data[key]) for _, data in extracted for key in ("prepTime", "cookTime", "totalTime") if data.get(key)
+    ] + DURATIONS
+    lines = [str(line) for _, data in extracted for line in (data.get("recipeIngredient") or [])]
+    pairs = [
+        (parse_ingredients(data.get("recipeIngredient") or []), rng.sample(DISLIKES, rng.randint(0, 8)))
+        for _, data in extracted
+    ]
+    exclusions = [(ingredient_ids(ingredients), compile_exclusions(dislikes)) for ingredients, dislikes in pairs]
+    formatted = [crawler._format_recipe_output(data, url) for url, data in extracted]
+    pools = [rng.sample(formatted, min(50, len(formatted))) for _ in range(40)]
+    query = ranking_query(
+        "quick high protein mushroom dinner under 600 calories",
+        {"diet_type": "vegetarian", "cuisine": "italian", "included_ingredients": ["spinach"]},
+    )
+
+    def parse_html(html: str) -> None:
+        BeautifulSoup(html, "html.parser")
+
+    return {
+        "html_parse": (parse_html, [html for _, html in recipes]),
+        "extract_jsonld": (crawler._extract_jsonld_recipe, soups),
+        "extract_recipe_links": (lambda page: crawler._extract_recipe_links(page[1], page[0]), searches),
+        "is_recipe_url": (crawler._is_recipe_url, links),
+        "format_recipe_output": (lambda item: crawler._format_recipe_output(item[1], item[0]), extracted),
+        "parse_servings": (crawler._parse_servings, yields),
+        "excluded": (lambda pair: pair[1].matches(pair[0]), exclusions),
+        "canonical_ids": (canonical_ids.__wrapped__, [item.name for items, _ in pairs for item in items]),
+        "compile_exclusions": (compile_exclusions, [dislikes for _, dislikes in pairs]),
+        # __wrapped__ skips the LRU cache so the grammar itself is measured
+        "parse_ingredient": (parse_ingredient.__wrapped__, lines),
+        "parse_ingredients": (parse_ingredients, [data.get("recipeIngredient") or [] for _, data in extracted]),
+        "ingredient_mask": (ingredient_mask.__wrapped__, [item.name for items, _ in pairs for item in items]),
+        "diet_tags": (diet_tags, [ingredients for ingredients, _ in pairs]),
+        "parse_duration": (parse_duration.__wrapped__, durations),
+        "recipe_times": (recipe_times, [data for _, data in extracted]),
+        "rank_recipes": (lambda pool: rank_recipes(pool, query), pools),
+    }
+
+
+def compare(report: dict, baseline: dict, max_regression: float) -> list:
+    """Benchmarks that slowed down by more than max_regression or changed output"""
+    regressions = []
+    for name, now in report["benchmarks"].items():
+        then = baseline.get("benchmarks", {}).get(name)
+        if not then:
+            continue
+        change = (now["ops_per_sec"] - then["ops_per_sec"]) / then["ops_per_sec"]
+        if -change > max_regression:
+            regressions.append({
+                "benchmark": name, "metric": "ops_per_sec",
+                "baseline": then["ops_per_sec"], "current": now["ops_per_sec"], "change": round(change, 3),
+            })
+        if report["fixtures"] == baseline.get("fixtures") and now["output_digest"] != then["output_digest"]:
+            regressions.append({
+                "benchmark": name, "metric": "output_digest",
+                "baseline": then["output_digest"], "current": now["output_digest"], "change": None,
+            })
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--recipe-pages", type=int, default=240)
+    parser.add_argument("--search-pages", type=int, default=60)
+    parser.add_argument("--corpus", help="recorded corpus directory (default: generated)")
+    parser.add_argument("--only", nargs="+", help="benchmarks to run")
+    parser.add_argument("--min-time", type=float, default=1.0, help="seconds per timing run")
+    parser.add_argument("--max-time", type=float, default=10.0, help="stop repeating after this many seconds")
+    parser.add_argument("--repeat", type=int, default=3, help="timing runs; the best is reported")
+    parser.add_argument("--alloc-inputs", type=int, default=40, help="inputs sampled for allocation stats")
+    parser.add_argument("--seed", type=int, default=11)
+    parser.add_argument("--output", help="also write the JSON report here")
+    parser.add_argument("--baseline", help="previous report to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.10, help="allowed ops/s drop")
+    args = parser.parse_args()
+
+    if args.corpus:
+        recipes, searches = load_corpus(args.corpus)
+    else:
+        recipes, searches = generate_fixtures(args.recipe_pages, args.search_pages, args.seed)
+
+    # Only the parsing helpers are exercised; skip the HTTP client __init__ creates
+    crawler = RecipeCrawler.__new__(RecipeCrawler)
+    benchmarks = build_benchmarks(crawler, recipes, searches, args.seed)
+    unknown = set(args.only or []) - set(benchmarks)
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    sizes = sorted(len(html) for _, html in recipes + searches)
+    report = {
+        "fixtures": {
+            "source": args.corpus or f"generated (seed {args.seed})",
+            "recipe_pages": len(recipes),
+            "search_pages": len(searches),
+            "page_kib": {
+                "min": round(sizes[0] / 1024, 1),
+                "median": round(sizes[len(sizes) // 2] / 1024, 1),
+                "max": round(sizes[-1] / 1024, 1),
+            },
+        },
+        "benchmarks": {},
+    }
+    for name, (func, inputs) in benchmarks.items():
+        if args.only and name not in args.only:
+            continue
+        if not inputs:
+            continue
+        report["benchmarks"][name] = bench(
+            func, inputs, args.min_time, args.max_time, args.repeat, args.alloc_inputs
+        )
+        print(f"{name}: {report['benchmarks'][name]['ops_per_sec']} ops/s", file=sys.stderr)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["regressions"] = compare(report, json.load(f), args.max_regression)
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if report.get("regressions"):
+        for regression in report["regressions"]:
+            print(
+                f"regression in {regression['benchmark']}: {regression['metric']} "
+                f"{regression['baseline']} -> {regression['current']}",
+                file=sys.stderr,
+            )
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,669 @@
+"""
+Offline end-to-end benchmark of POST /agent
+
+Everything the agent talks to runs locally:
+  recipe sites - a fixture corpus of search and recipe pages served by one
+                 HTTP server per site (distinct ports, so each is its own
+                 source), with configurable latency and jitter
+  OpenAI       - a fake chat completions server (OPENAI_BASE_URL) returning
+                 canned intent JSON after --llm-latency-ms
+  Supabase     - the sqlite storage backend, seeded with recipe_sources,
+                 user_settings and hated_recipes
+
+The API runs as `uvicorn main:asgi_app` in its own process, restarted for
+every concurrency level. Per level the report holds throughput, p50/p95/p99
+latency, server CPU time and peak RSS (from /proc, so Linux only).
+
+The default corpus is generated (realistic page sizes, JSON-LD recipes);
+--record DIR saves a corpus from the live sites once, and --corpus DIR
+replays it.
+
+Usage:
+  python benchmarks/bench_e2e.py --concurrency 1 4 16 --duration 20
+  python benchmarks/bench_e2e.py --latency-ms 150 --jitter-ms 50 --output e2e.json
+  python benchmarks/bench_e2e.py --baseline e2e.json --max-regression 0.1   # exit 1 on regression
+  python benchmarks/bench_e2e.py --record fixtures/ --record-queries chicken pasta
+  python benchmarks/bench_e2e.py --corpus fixtures/
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import socket
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROMPTS = [
+    "quick chicken dinner",
+    "vegetarian pasta for two",
+    "high protein breakfast",
+    "easy beef stir fry",
+    "healthy salmon with rice",
+    "keto lunch ideas",
+    "spicy tofu curry",
+    "one pot lentil soup",
+    "mediterranean chickpea salad",
+    "slow cooker pork tacos",
+]
+INGREDIENTS = [
+    "2 cups cooked rice", "1 lb chicken breast", "3 cloves garlic, minced", "1 tbsp olive oil",
+    "1 onion, diced", "2 tomatoes, chopped", "1 cup chickpeas", "8 oz pasta", "1 cup spinach",
+    "2 eggs", "1/2 cup feta cheese", "1 tsp cumin", "1 tbsp soy sauce", "1 cup mushrooms, sliced",
+    "1 lb salmon fillet", "1 can coconut milk", "2 tbsp curry paste", "1 block firm tofu",
+    "1 cup lentils", "4 cups vegetable broth", "1 lb ground beef", "1 bell pepper", "1 lime",
+    "1/4 cup cilantro", "1 cup greek yogurt", "2 tbsp butter", "1 cup shredded cheddar",
+]
+SITES = ["allrecipes", "eatingwell", "foodnetwork"]
+# Live search templates for --record
+LIVE_SOURCES = {
+    "allrecipes": "https://www.allrecipes.com/search?q={query}",
+    "eatingwell": "https://www.eatingwell.com/search?q={query}",
+    "foodnetwork": "https://www.foodnetwork.com/search/{query}-",
+}
+BENCH_USERS = 50
+
+
+# Fixture corpus
+#
+# corpus/manifest.json:
+#   {"sites": {name: {"search": [file, ...], "pages": {path: file}}}}
+# Search pages link to recipe pages by path, so they work on any host.
+
+
+def _padding(rng: random.Random, size: int) -> str:
+    words = "stir simmer season fold whisk roast braise garnish serve chop slice".split()
+    paragraphs = []
+    total = 0
+    while total < size:
+        text = " ".join(rng.choice(words) for _ in range(80))
+        paragraphs.append(f"<p>{text}</p>")
+        total += len(text) + 7
+    return "\n".join(paragraphs)
+
+
+def _nav(site: str, count: int = 120) -> str:
+    links = "".join(f'<li><a href="/topics/{site}-{i}/">Topic {i}</a></li>' for i in range(count))
+    return f"<nav><ul>{links}</ul></nav>"
+
+
+def _recipe_page(site: str, index: int, rng: random.Random, page_kb: int) -> str:
+    title = f"{site.title()} Recipe {index}"
+    recipe = {
+        "@context": "https://schema.org",
+        "@type": "Recipe",
+        "name": title,
+        "description": f"A reliable weeknight recipe number {index} from {site}.",
+        "image": {"@type": "ImageObject", "url": f"https://images.example.com/{site}/{index}.jpg"},
+        "recipeYield": f"{rng.randint(2, 6)} servings",
+        "recipeIngredient": rng.sample(INGREDIENTS, rng.randint(7, 14)),
+        "recipeInstructions": [
+            {"@type": "HowToStep", "text": f"Step {step}: " + " ".join(rng.sample(INGREDIENTS, 2))}
+            for step in range(1, rng.randint(5, 10))
+        ],
+        "nutrition": {
+            "@type": "NutritionInformation",
+            "calories": f"{rng.randint(250, 800)} kcal",
+            "proteinContent": f"{rng.randint(8, 50)} g",
+            "fatContent": f"{rng.randint(5, 40)} g",
+            "carbohydrateContent": f"{rng.randint(10, 90)} g",
+        },
+        "prepTime": f"PT{rng.randint(5, 30)}M",
+        "cookTime": f"PT{rng.randint(10, 90)}M",
+    }
+    return (
+        f"<!DOCTYPE html><html><head><title>{title}</title>"
+        f'<script type="application/ld+json">{json.dumps([{"@type": "WebPage"}, recipe])}</script>'
+        f"</head><body>{_nav(site)}<article><h1>{title}</h1>"
+        f"{_padding(rng, page_kb * 1024)}</article></body></html>"
+    )
+
+
+def _search_page(site: str, indexes, rng: random.Random, page_kb: int) -> str:
+    cards = "".join(
+        f'<div class="card"><a href="/recipe/{i}/{site}-recipe-{i}/">{site} recipe {i}</a></div>'
+        for i in indexes
+    )
+    return (
+        f"<!DOCTYPE html><html><head><title>{site} search</title></head><body>"
+        f"{_nav(site)}<main>{cards}</main>{_padding(rng, page_kb * 1024)}</body></html>"
+    )
+
+
+def generate_corpus(directory: str, recipes_per_site: int, search_pages: int, page_kb: int, seed: int) -> None:
+    rng = random.Random(seed)
+    manifest = {"sites": {}}
+    for site in SITES:
+        os.makedirs(os.path.join(directory, site), exist_ok=True)
+        pages = {}
+        for i in range(recipes_per_site):
+            name = f"{site}/recipe-{i}.html"
+            with open(os.path.join(directory, name), "w", encoding="utf-8") as f:
+                f.write(_recipe_page(site, i, rng, page_kb))
+            pages[f"/recipe/{i}/{site}-recipe-{i}/"] = name
+        searches = []
+        for n in range(search_pages):
+            name = f"{site}/search-{n}.html"
+            indexes = rng.sample(range(recipes_per_site), min(20, recipes_per_site))
+            with open(os.path.join(directory, name), "w", encoding="utf-8") as f:
+                f.write(_search_page(site, indexes, rng, page_kb // 2))
+            searches.append(name)
+        manifest["sites"][site] = {"search": searches, "pages": pages}
+    with open(os.path.join(directory, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+
+def record_corpus(directory: str, queries, recipes_per_query: int) -> None:
+    """Save search and recipe pages from the live sites in corpus format"""
+    import httpx
+    from bs4 import BeautifulSoup
+
+    sys.path.append(ROOT)
+    from recipe_crawler import RecipeCrawler
+
+    is_recipe_url = RecipeCrawler._is_recipe_url
+    headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/91.0 Safari/537.36"}
+    manifest = {"sites": {}}
+    with httpx.Client(timeout=30, follow_redirects=True, headers=headers) as client:
+        for site, template in LIVE_SOURCES.items():
+            origin = "{0.scheme}://{0.netloc}".format(urlparse(template))
+            os.makedirs(os.path.join(directory, site), exist_ok=True)
+            entry = {"search": [], "pages": {}}
+            for n, query in enumerate(queries):
+                response = client.get(template.replace("{query}", query.replace(" ", "+")))
+                if response.status_code != 200:
+                    print(f"skip {site} search {query!r}: HTTP {response.status_code}", file=sys.stderr)
+                    continue
+                html = response.text
+                urls = []
+                for link in BeautifulSoup(html, "html.parser").find_all("a", href=True):
+                    url = link["href"]
+                    if url.startswith(origin) and is_recipe_url(None, url) and url not in urls:
+                        urls.append(url)
+                # Links become origin-relative so they resolve against the fixture host
+                name = f"{site}/search-{n}.html"
+                with open(os.path.join(directory, name), "w", encoding="utf-8") as f:
+                    f.write(html.replace(origin, ""))
+                entry["search"].append(name)
+                for url in urls[:recipes_per_query]:
+                    path = urlparse(url).path
+                    if path in entry["pages"]:
+                        continue
+                    page = client.get(url)
+                    if page.status_code != 200:
+                        continue
+                    page_name = f"{site}/recipe-{len(entry['pages'])}.html"
+                    with open(os.path.join(directory, page_name), "w", encoding="utf-8") as f:
+                        f.write(page.text)
+                    entry["pages"][path] = page_name
+            manifest["sites"][site] = entry
+            print(f"recorded {site}: {len(entry['search'])} search pages, {len(entry['pages'])} recipes")
+    with open(os.path.join(directory, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+
+# Local stand-ins (run in a child process so they don't share the load
+# generator's GIL)
+
+
+def _fixture_handler(search_pages, pages, latency: float, jitter: float, seed: int):
+    rng = random.Random(seed)
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            with lock:
+                delay = max(0.0, latency + rng.uniform(-jitter, jitter))
+            time.sleep(delay)
+            url = urlparse(self.path)
+            if url.path.startswith("/search"):
+                query = parse_qs(url.query).get("q", [url.path])[0]
+                body = search_pages[zlib.crc32(query.encode()) % len(search_pages)]
+            else:
+                body = pages.get(url.path)
+            if body is None:
+                self.send_response(404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    return Handler
+
+
+def _llm_handler(latency: float, jitter: float, seed: int):
+    rng = random.Random(seed)
+    lock = threading.Lock()
+    # No nulls: /agent evaluates the single-prompt reply as a Python literal
+    intent = {"diet_type": "balanced", "included_ingredients": ["garlic"], "excluded_ingredients": ["mushrooms"]}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+            with lock:
+                delay = max(0.0, latency + rng.uniform(-jitter, jitter))
+            time.sleep(delay)
+            user = request.get("messages", [{}])[-1].get("content", "")
+            if user.startswith("Prompts:"):
+                count = len(json.loads(user[len("Prompts:"):]))
+                content = json.dumps({"results": [intent] * count})
+            else:
+                content = json.dumps(intent)
+            body = json.dumps({
+                "id": "chatcmpl-bench",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request.get("model", "gpt-3.5-turbo"),
+                "choices": [
+                    {"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}
+                ],
+                "usage": {"prompt_tokens": 50, "completion_tokens": 30, "total_tokens": 80},
+            }).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    return Handler
+
+
+def serve_standins(corpus: str, latency: float, jitter: float, llm_latency: float, seed: int, ports) -> None:
+    with open(os.path.join(corpus, "manifest.json")) as f:
+        manifest = json.load(f)
+
+    def read(name: str) -> bytes:
+        with open(os.path.join(corpus, name), "rb") as f:
+            return f.read()
+
+    servers = []
+    for n, (site, entry) in enumerate(manifest["sites"].items()):
+        search_pages = [read(name) for name in entry["search"]]
+        if not search_pages:
+            continue
+        pages = {path: read(name) for path, name in entry["pages"].items()}
+        handler = _fixture_handler(search_pages, pages, latency, jitter, seed + n)
+        servers.append((site, ThreadingHTTPServer(("127.0.0.1", 0), handler)))
+    servers.append(("openai", ThreadingHTTPServer(("127.0.0.1", 0), _llm_handler(llm_latency, llm_latency / 4, seed))))
+
+    for _, server in servers:
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    ports.update({site: server.server_address[1] for site, server in servers})
+    threading.Event().wait()
+
+
+# API server
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def get_status(url: str) -> int:
+    try:
+        with urllib.request.urlopen(url, timeout=1) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except OSError:
+        return 0
+
+
+def seed_database(path: str, ports: dict, seed: int) -> None:
+    sys.path.append(ROOT)
+    from sqlite_repository import SCHEMA
+
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    for site in SITES:
+        if site in ports:
+            conn.execute(
+                "INSERT INTO recipe_sources (site_name, url_template, active) VALUES (?, ?, 1)",
+                (site, f"http://127.0.0.1:{ports[site]}/search?q={{query}}"),
+            )
+    for i in range(BENCH_USERS):
+        user_id = f"bench-user-{i}"
+        conn.execute(
+            "INSERT INTO user_settings (user_id, diet_type, allergies, disliked_ingredients) VALUES (?, ?, ?, ?)",
+            (user_id, "balanced", json.dumps(["peanuts"]), json.dumps(rng.sample(["olives", "anchovies", "cilantro"], 1))),
+        )
+        site = rng.choice([s for s in SITES if s in ports])
+        for n in rng.sample(range(20), 3):
+            conn.execute(
+                "INSERT INTO hated_recipes (user_id, source_url) VALUES (?, ?)",
+                (user_id, f"http://127.0.0.1:{ports[site]}/recipe/{n}/{site}-recipe-{n}/"),
+            )
+    conn.commit()
+    conn.close()
+
+
+def server_env(workdir: str, ports: dict, max_concurrency: int) -> dict:
+    env = dict(os.environ)
+    env.update({
+        "OPENAI_API_KEY": "bench-placeholder",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{ports['openai']}/v1",
+        "AGENT_STORAGE_BACKEND": "sqlite",
+        "SQLITE_PATH": os.path.join(workdir, "bench.db"),
+        "CURSOR_SECRET": "bench",
+        "RATE_LIMIT_PER_MINUTE": "0",
+        "ADMISSION_MAX_IN_FLIGHT": str(max(16, max_concurrency)),
+        "ADMISSION_MAX_QUEUE": str(max(64, max_concurrency * 4)),
+        "NO_PROXY": "127.0.0.1,localhost",
+        "no_proxy": "127.0.0.1,localhost",
+    })
+    for name in ("TRACE_EXPORT_FILE", "TRACE_EXPORT_ENDPOINT"):
+        env.pop(name, None)
+    return env
+
+
+def process_tree(pid: int) -> list:
+    """pid and its descendants (uvicorn --workers forks)"""
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    tree, stack = [], [pid]
+    while stack:
+        current = stack.pop()
+        tree.append(current)
+        stack.extend(children.get(current, []))
+    return tree
+
+
+def cpu_seconds(pids) -> float:
+    ticks = os.sysconf("SC_CLK_TCK")
+    total = 0
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            total += int(fields[11]) + int(fields[12])
+        except (OSError, IndexError, ValueError):
+            pass
+    return total / ticks
+
+
+def peak_rss_mb(pids) -> float:
+    total_kb = 0
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmHWM:"):
+                        total_kb += int(line.split()[1])
+        except OSError:
+            pass
+    return round(total_kb / 1024, 1)
+
+
+def start_server(env: dict, workers: int, timeout: float):
+    port = free_port()
+    process = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "main:asgi_app", "--host", "127.0.0.1",
+            "--port", str(port), "--workers", str(workers), "--log-level", "warning",
+        ],
+        cwd=ROOT,
+        env=env,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("server exited during startup")
+        if get_status(f"http://127.0.0.1:{port}/ready") == 200:
+            return process, f"http://127.0.0.1:{port}"
+        time.sleep(0.05)
+    process.kill()
+    raise RuntimeError(f"server not ready after {timeout}s")
+
+
+def stop_server(process) -> None:
+    process.terminate()
+    try:
+        process.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+# Load generation
+
+
+def percentile(values, q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run_load(base: str, concurrency: int, duration: float, warmup: int, seed: int) -> dict:
+    import httpx
+
+    rng = random.Random(seed)
+    latencies = []
+    recipes = []
+    errors = {}
+
+    def body():
+        return {"prompt": rng.choice(PROMPTS), "user_id": f"bench-user-{rng.randrange(BENCH_USERS)}"}
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base, timeout=120, limits=limits, trust_env=False) as client:
+        for _ in range(warmup):
+            await client.post("/agent", json=body())
+
+        deadline = time.perf_counter() + duration
+
+        async def worker():
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                try:
+                    response = await client.post("/agent", json=body())
+                    outcome = response.status_code
+                except httpx.HTTPError as e:
+                    outcome = type(e).__name__
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                if outcome == 200:
+                    latencies.append(elapsed_ms)
+                    recipes.append(response.json().get("matches_found", 0))
+                else:
+                    errors[str(outcome)] = errors.get(str(outcome), 0) + 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return {"latencies": latencies, "recipes": recipes, "errors": errors, "elapsed": elapsed}
+
+
+def measure_level(args, env: dict, concurrency: int) -> dict:
+    process, base = start_server(env, args.workers, args.timeout)
+    try:
+        pids = process_tree(process.pid)
+        cpu_before = cpu_seconds(pids)
+        load = asyncio.run(run_load(base, concurrency, args.duration, args.warmup, args.seed + concurrency))
+        pids = process_tree(process.pid)
+        cpu_used = cpu_seconds(pids) - cpu_before
+        rss = peak_rss_mb(pids)
+    finally:
+        stop_server(process)
+
+    latencies = load["latencies"]
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": load["errors"],
+        "throughput_rps": round(len(latencies) / load["elapsed"], 2),
+        # A broken crawl returns fast, empty responses; check this before trusting throughput
+        "mean_recipes": round(statistics.fmean(load["recipes"]), 2) if load["recipes"] else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50), 1),
+            "p95": round(percentile(latencies, 95), 1),
+            "p99": round(percentile(latencies, 99), 1),
+            "mean": round(statistics.fmean(latencies), 1) if latencies else 0.0,
+            "max": round(max(latencies), 1) if latencies else 0.0,
+        },
+        "cpu_seconds": round(cpu_used, 2),
+        "cpu_percent": round(100 * cpu_used / load["elapsed"], 1),
+        "cpu_ms_per_request": round(1000 * cpu_used / len(latencies), 2) if latencies else None,
+        "peak_rss_mb": rss,
+    }
+
+
+def compare(report: dict, baseline: dict, max_regression: float) -> list:
+    """Levels whose throughput dropped or p95 rose by more than max_regression"""
+    previous = {level["concurrency"]: level for level in baseline.get("levels", [])}
+    regressions = []
+    for level in report["levels"]:
+        before = previous.get(level["concurrency"])
+        if not before:
+            continue
+        checks = [
+            ("throughput_rps", level["throughput_rps"], before["throughput_rps"], -1),
+            ("p95_ms", level["latency_ms"]["p95"], before["latency_ms"]["p95"], 1),
+        ]
+        for name, now, then, direction in checks:
+            if then and direction * (now - then) / then > max_regression:
+                regressions.append({
+                    "concurrency": level["concurrency"],
+                    "metric": name,
+                    "baseline": then,
+                    "current": now,
+                    "change": round((now - then) / then, 3),
+                })
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--duration", type=float, default=15, help="seconds per concurrency level")
+    parser.add_argument("--warmup", type=int, default=3, help="requests before measuring")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--latency-ms", type=float, default=80, help="fixture site response latency")
+    parser.add_argument("--jitter-ms", type=float, default=30, help="+/- uniform jitter on site latency")
+    parser.add_argument("--llm-latency-ms", type=float, default=300, help="fake OpenAI response latency")
+    parser.add_argument("--corpus", help="recorded corpus directory (default: generated)")
+    parser.add_argument("--recipes-per-site", type=int, default=40)
+    parser.add_argument("--page-kb", type=int, default=120, help="generated page size")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--timeout", type=float, default=60, help="server startup timeout")
+    parser.add_argument("--output", help="also write the JSON report here")
+    parser.add_argument("--baseline", help="previous report to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.10, help="allowed relative change")
+    parser.add_argument("--record", metavar="DIR", help="record a corpus from the live sites and exit")
+    parser.add_argument("--record-queries", nargs="+", default=["chicken", "pasta", "salmon", "vegetarian"])
+    parser.add_argument("--record-recipes", type=int, default=10, help="recipe pages per recorded search")
+    args = parser.parse_args()
+
+    if args.record:
+        record_corpus(args.record, args.record_queries, args.record_recipes)
+        return
+
+    with tempfile.TemporaryDirectory(prefix="bench-e2e-") as workdir:
+        corpus = args.corpus
+        if corpus is None:
+            corpus = os.path.join(workdir, "corpus")
+            generate_corpus(corpus, args.recipes_per_site, 4, args.page_kb, args.seed)
+
+        manager = multiprocessing.Manager()
+        ports = manager.dict()
+        standins = multiprocessing.Process(
+            target=serve_standins,
+            args=(corpus, args.latency_ms / 1000, args.jitter_ms / 1000, args.llm_latency_ms / 1000, args.seed, ports),
+            daemon=True,
+        )
+        standins.start()
+        try:
+            deadline = time.perf_counter() + 30
+            while "openai" not in ports:
+                if time.perf_counter() > deadline or not standins.is_alive():
+                    raise RuntimeError("fixture servers failed to start")
+                time.sleep(0.05)
+            ports = dict(ports)
+
+            env = server_env(workdir, ports, max(args.concurrency))
+            levels = []
+            for concurrency in args.concurrency:
+                # Fresh database and server per level: RSS peaks and caches don't carry over
+                if os.path.exists(env["SQLITE_PATH"]):
+                    os.remove(env["SQLITE_PATH"])
+                seed_database(env["SQLITE_PATH"], ports, args.seed)
+                levels.append(measure_level(args, env, concurrency))
+        finally:
+            standins.terminate()
+            manager.shutdown()
+
+    report = {
+        "config": {
+            "duration_s": args.duration,
+            "workers": args.workers,
+            "site_latency_ms": args.latency_ms,
+            "site_jitter_ms": args.jitter_ms,
+            "llm_latency_ms": args.llm_latency_ms,
+            "corpus": args.corpus or f"generated ({args.recipes_per_site} recipes/site, {args.page_kb} KB pages)",
+            "sources": [site for site in ports if site != "openai"],
+        },
+        "levels": levels,
+    }
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["regressions"] = compare(report, json.load(f), args.max_regression)
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if report.get("regressions"):
+        for regression in report["regressions"]:
+            print(
+                f"regression at concurrency {regression['concurrency']}: {regression['metric']} "
+                f"{regression['baseline']} -> {regression['current']} ({regression['change']:+.1%})",
+                file=sys.stderr,
+            )
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Benchmark recipe_search ingestion on a local Postgres instance
+
+Compares three ways of replacing users' search results:
+  copy_many      - PostgresRecipeStorage.replace_many (one DELETE + one COPY)
+  copy_per_user  - PostgresRecipeStorage.replace_user_recipes per user
+  insert_rows    - DELETE + executemany INSERT per user (row-at-a-time baseline)
+
+Usage:
+  DATABASE_URL=postgresql://postgres@localhost/kitchnsync \\
+      python benchmarks/bench_postgres_ingest.py --users 500 --recipes 10
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from postgres_storage import (  # noqa: E402
+    PostgresRecipeStorage,
+    RECIPE_SEARCH_COLUMNS,
+    _copy_values,
+)
+
+
+def make_rows(user_id: str, count: int) -> list:
+    created_at = datetime.utcnow().isoformat()
+    return [
+        {
+            "user_id": user_id,
+            "title": f"Benchmark Recipe {i}",
+            "description": "A recipe generated for ingestion benchmarks",
+            "image_url": f"https://example.com/images/{user_id}/{i}.jpg",
+            "ingredients": [f"{i + 1} cups ingredient {j}" for j in range(12)],
+            "instructions": [f"Step {j}: do something useful" for j in range(8)],
+            "macros": {"calories": 420, "protein": 31.5, "fat": 12.0, "carbs": 40.0},
+            "servings": 4,
+            "source_url": f"https://example.com/recipe/{user_id}-{i}",
+            "site_name": "example.com",
+            "created_at": created_at,
+        }
+        for i in range(count)
+    ]
+
+
+async def insert_rows(storage: PostgresRecipeStorage, rows_by_user: dict) -> int:
+    columns = ", ".join(RECIPE_SEARCH_COLUMNS)
+    placeholders = ", ".join(["%s"] * len(RECIPE_SEARCH_COLUMNS))
+    total = 0
+    async with storage.pool.connection() as conn:
+        for user_id, rows in rows_by_user.items():
+            async with conn.transaction():
+                await conn.execute(
+                    "DELETE FROM recipe_search WHERE user_id = %s", (user_id,)
+                )
+                async with conn.cursor() as cur:
+                    await cur.executemany(
+                        f"INSERT INTO recipe_search ({columns}) VALUES ({placeholders})",
+                        [_copy_values(row) for row in rows],
+                    )
+            total += len(rows)
+    return total
+
+
+async def copy_per_user(storage: PostgresRecipeStorage, rows_by_user: dict) -> int:
+    total = 0
+    for user_id, rows in rows_by_user.items():
+        total += await storage.replace_user_recipes(user_id, rows)
+    return total
+
+
+async def copy_many(storage: PostgresRecipeStorage, rows_by_user: dict) -> int:
+    return await storage.replace_many(rows_by_user)
+
+
+async def run(args) -> dict:
+    storage = PostgresRecipeStorage(args.dsn)
+    await storage.ensure_schema()
+    rows_by_user = {
+        f"bench-user-{u}": make_rows(f"bench-user-{u}", args.recipes)
+        for u in range(args.users)
+    }
+    total_rows = args.users * args.recipes
+
+    results = {}
+    for name, fn in (
+        ("insert_rows", insert_rows),
+        ("copy_per_user", copy_per_user),
+        ("copy_many", copy_many),
+    ):
+        timings = []
+        for _ in range(args.rounds):
+            start = time.perf_counter()
+            await fn(storage, rows_by_user)
+            timings.append(time.perf_counter() - start)
+        best = min(timings)
+        results[name] = {
+            "best_seconds": round(best, 4),
+            "rows_per_second": round(total_rows / best, 1),
+            "recipes_per_minute": round(total_rows / best * 60),
+        }
+
+    async with storage.pool.connection() as conn:
+        await conn.execute(
+            "DELETE FROM recipe_search WHERE user_id LIKE %s", ("bench-user-%",)
+        )
+    await storage.close()
+    return {
+        "users": args.users,
+        "recipes_per_user": args.recipes,
+        "rounds": args.rounds,
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--dsn", default=os.environ.get("DATABASE_URL"))
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--recipes", type=int, default=10)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+    if not args.dsn:
+        parser.error("--dsn or DATABASE_URL is required")
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
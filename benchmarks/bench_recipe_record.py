@@ -0,0 +1,231 @@
+"""
+Recipe record vs plain dict: per-recipe memory and serialization cost
+
+  build            - creating the per-recipe container from extracted fields
+  storage_rows     - recipe_search rows for store_recipe_matches
+  response_json    - /agent response body: jsonable_encoder + JSONResponse
+                     for dicts, encode_json for Recipe records
+
+Recipes are extracted once from the bench_crawler fixtures (or a --corpus
+recorded by `bench_e2e.py --record`) so both variants carry the same field
+values. Memory is the tracemalloc size of the container itself; ingredient
+and instruction lists are shared by both and not counted. Response bodies
+from both paths are compared byte for byte.
+
+Usage:
+  python benchmarks/bench_recipe_record.py
+  python benchmarks/bench_recipe_record.py --page-size 50 --min-time 2
+"""
+
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from bs4 import BeautifulSoup  # noqa: E402
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+
+from bench_crawler import generate_fixtures, load_corpus  # noqa: E402
+from recipe_crawler import RecipeCrawler  # noqa: E402
+from recipe_record import RECIPE_FIELDS, Recipe, encode_json  # noqa: E402
+
+
+def build_dict(values: tuple) -> dict:
+    # The dict _format_recipe_output returned before Recipe
+    (title, description, image_url, ingredients, parsed_ingredients, instructions,
+     macros, servings, prep_time, cook_time, total_time, diet_tags, source_url, site_name) = values
+    return {
+        "title": title,
+        "description": description,
+        "image_url": image_url,
+        "ingredients": ingredients,
+        "parsed_ingredients": parsed_ingredients,
+        "instructions": instructions,
+        "macros": macros,
+        "servings": servings,
+        "prep_time": prep_time,
+        "cook_time": cook_time,
+        "total_time": total_time,
+        "diet_tags": diet_tags,
+        "source_url": source_url,
+        "site_name": site_name,
+    }
+
+
+def build_record(values: tuple) -> Recipe:
+    (title, description, image_url, ingredients, parsed_ingredients, instructions,
+     macros, servings, prep_time, cook_time, total_time, diet_tags, source_url, site_name) = values
+    return Recipe(
+        title=title,
+        description=description,
+        image_url=image_url,
+        ingredients=ingredients,
+        parsed_ingredients=parsed_ingredients,
+        instructions=instructions,
+        macros=macros,
+        servings=servings,
+        prep_time=prep_time,
+        cook_time=cook_time,
+        total_time=total_time,
+        diet_tags=diet_tags,
+        source_url=source_url,
+        site_name=site_name,
+    )
+
+
+def dict_row(recipe: dict, user_id: str) -> dict:
+    # store_recipe_matches row building before Recipe.to_row
+    return {
+        "user_id": user_id,
+        "title": recipe.get("title"),
+        "description": recipe.get("description"),
+        "image_url": recipe.get("image_url"),
+        "servings": recipe.get("servings"),
+        "prep_time": recipe.get("prep_time"),
+        "cook_time": recipe.get("cook_time"),
+        "total_time": recipe.get("total_time"),
+        "diet_tags": recipe.get("diet_tags"),
+        "source_url": recipe.get("source_url"),
+        "ingredients": recipe.get("ingredients"),
+        "parsed_ingredients": recipe.get("parsed_ingredients"),
+        "macros": recipe.get("macros"),
+        "instructions": recipe.get("instructions"),
+        "site_name": recipe.get("site_name"),
+    }
+
+
+def response_body(recipes: list) -> dict:
+    return {
+        "status": "success",
+        "user_id": "bench-user",
+        "original_prompt": "quick vegetarian dinner",
+        "query_profile": {"diet_type": "vegetarian", "excluded_ingredients": []},
+        "matches_found": len(recipes),
+        "recipes": recipes,
+        "next_cursor": None,
+    }
+
+
+def rate(func, items, min_time: float, repeat: int) -> float:
+    """Best items/s over repeat runs of at least min_time seconds"""
+    best = 0.0
+    for _ in range(repeat):
+        calls = 0
+        started = time.perf_counter()
+        while True:
+            for item in items:
+                func(item)
+            calls += len(items)
+            elapsed = time.perf_counter() - started
+            if elapsed >= min_time:
+                break
+        best = max(best, calls / elapsed)
+    return best
+
+
+def container_bytes(build, fields: list) -> float:
+    """tracemalloc bytes retained per container built from already-extracted fields"""
+    gc.collect()
+    gc.disable()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        kept = [build(item) for item in fields]
+        retained = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+        gc.enable()
+    # The list holding them is not part of the per-recipe cost
+    return (retained - sys.getsizeof(kept)) / len(kept)
+
+
+def compare(name: str, old, old_items, new, new_items, min_time: float, repeat: int) -> dict:
+    old_rate = rate(old, old_items, min_time, repeat)
+    new_rate = rate(new, new_items, min_time, repeat)
+    print(f"{name}: dict {old_rate:.0f}/s, record {new_rate:.0f}/s", file=sys.stderr)
+    return {
+        "dict_ops_per_sec": round(old_rate, 1),
+        "record_ops_per_sec": round(new_rate, 1),
+        "dict_us_per_op": round(1e6 / old_rate, 2),
+        "record_us_per_op": round(1e6 / new_rate, 2),
+        "speedup": round(new_rate / old_rate, 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--recipe-pages", type=int, default=240)
+    parser.add_argument("--corpus", help="recorded corpus directory (default: generated)")
+    parser.add_argument("--page-size", type=int, default=10, help="recipes per response body")
+    parser.add_argument("--min-time", type=float, default=1.0, help="seconds per timing run")
+    parser.add_argument("--repeat", type=int, default=3, help="timing runs; the best is reported")
+    parser.add_argument("--seed", type=int, default=11)
+    args = parser.parse_args()
+
+    if args.corpus:
+        pages, _ = load_corpus(args.corpus)
+    else:
+        pages, _ = generate_fixtures(args.recipe_pages, 0, args.seed)
+
+    crawler = RecipeCrawler.__new__(RecipeCrawler)
+    records = []
+    for url, html in pages:
+        data = crawler._extract_jsonld_recipe(BeautifulSoup(html, "html.parser"))
+        if data:
+            records.append(crawler._format_recipe_output(data, url))
+    fields = [tuple(getattr(recipe, name) for name in RECIPE_FIELDS) for recipe in records]
+    # A dict pipeline would carry parsed ingredients as dicts too
+    dicts = [
+        build_dict(tuple(
+            [item.to_dict() for item in value] if name == "parsed_ingredients" else value
+            for name, value in zip(RECIPE_FIELDS, values)
+        ))
+        for values in fields
+    ]
+    pages_of = lambda items: [  # noqa: E731
+        response_body(items[i:i + args.page_size]) for i in range(0, len(items), args.page_size)
+    ]
+    dict_pages, record_pages = pages_of(dicts), pages_of(records)
+
+    render = JSONResponse(None).render
+    dict_json = [render(jsonable_encoder(page)) for page in dict_pages]
+    record_json = [encode_json(page) for page in record_pages]
+
+    report = {
+        "recipes": len(records),
+        "page_size": args.page_size,
+        "memory_bytes_per_recipe": {
+            "dict": round(container_bytes(build_dict, fields), 1),
+            "record": round(container_bytes(build_record, fields), 1),
+        },
+        "build": compare(
+            "build", build_dict, fields, build_record, fields, args.min_time, args.repeat
+        ),
+        "storage_rows": compare(
+            "storage_rows",
+            lambda recipe: dict_row(recipe, "bench-user"), dicts,
+            lambda recipe: recipe.to_row("bench-user"), records,
+            args.min_time, args.repeat,
+        ),
+        "response_json": compare(
+            "response_json",
+            lambda page: render(jsonable_encoder(page)), dict_pages,
+            encode_json, record_pages,
+            args.min_time, args.repeat,
+        ),
+        "response_bytes_identical": dict_json == record_json,
+    }
+    print(json.dumps(report, indent=2))
+    if not report["response_bytes_identical"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
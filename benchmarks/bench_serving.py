@@ -0,0 +1,288 @@
+"""
+Benchmark requests per second for the serving modes in main.py
+
+Modes:
+  legacy  - the previous ASGItoWSGI shim (new event loop per request, buffered
+            bodies, lifespan never run), kept here as the baseline
+  wsgi    - main.app: persistent background event loop, streamed bodies
+  asgi    - main.asgi_app served natively by uvicorn
+
+Each mode runs in its own server process with the same number of workers;
+WSGI modes use a threaded server (gunicorn gthread when installed, otherwise
+wsgiref with one thread per connection). Requests go to a cheap endpoint by
+default so the numbers measure serving overhead, not crawling.
+
+Usage:
+  python benchmarks/bench_serving.py --duration 10 --concurrency 32
+  python benchmarks/bench_serving.py --modes wsgi asgi --path /sources
+
+No Supabase or OpenAI access is needed: the server processes use the sqlite
+storage backend and a placeholder OpenAI key unless the environment says
+otherwise.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+
+# Server side
+
+
+class LegacyASGItoWSGI:
+    """The original per-request event loop adapter from main.py"""
+
+    def __init__(self, asgi_app):
+        self.asgi_app = asgi_app
+
+    def __call__(self, environ, start_response):
+        scope = {
+            "type": "http",
+            "method": environ["REQUEST_METHOD"],
+            "path": environ.get("PATH_INFO", "/"),
+            "query_string": environ.get("QUERY_STRING", "").encode(),
+            "headers": [
+                (key.lower().replace("_", "-").encode(), value.encode())
+                for key, value in environ.items()
+                if key.startswith("HTTP_")
+            ],
+        }
+        response = {"status": 500, "headers": [], "body": b""}
+
+        async def receive():
+            content_length = int(environ.get("CONTENT_LENGTH") or 0)
+            body = environ["wsgi.input"].read(content_length) if content_length else b""
+            return {"type": "http.request", "body": body}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["headers"] = message.get("headers", [])
+            elif message["type"] == "http.response.body":
+                response["body"] += message.get("body", b"")
+
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            loop.run_until_complete(self.asgi_app(scope, receive, send))
+        finally:
+            loop.close()
+
+        start_response(
+            f"{response['status']} OK",
+            [(name.decode(), value.decode()) for name, value in response["headers"]],
+        )
+        return [response["body"]]
+
+
+def serve(mode: str, port: int, workers: int, threads: int) -> None:
+    if mode == "asgi":
+        import uvicorn
+
+        uvicorn.run(
+            "main:asgi_app",
+            host="127.0.0.1",
+            port=port,
+            workers=workers,
+            log_level="warning",
+            access_log=False,
+        )
+        return
+
+    app_ref = "main:app" if mode == "wsgi" else "bench_serving:legacy_app"
+    if shutil.which("gunicorn"):
+        os.execvp(
+            "gunicorn",
+            [
+                "gunicorn",
+                app_ref,
+                "--bind", f"127.0.0.1:{port}",
+                "--workers", str(workers),
+                "--worker-class", "gthread",
+                "--threads", str(threads),
+                "--log-level", "warning",
+                "--chdir", ROOT,
+                "--pythonpath", os.path.dirname(os.path.abspath(__file__)),
+            ],
+        )
+
+    from socketserver import ThreadingMixIn
+    from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+    class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+        daemon_threads = True
+        request_queue_size = 1024
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_message(self, *args):
+            pass
+
+    if mode == "wsgi":
+        from main import app
+    else:
+        from main import fastapi_app
+
+        app = LegacyASGItoWSGI(fastapi_app)
+    make_server("127.0.0.1", port, app, ThreadingWSGIServer, QuietHandler).serve_forever()
+
+
+def legacy_app(environ, start_response):
+    # gunicorn entry point for the legacy mode
+    global _legacy
+    if "_legacy" not in globals():
+        from main import fastapi_app
+
+        _legacy = LegacyASGItoWSGI(fastapi_app)
+    return _legacy(environ, start_response)
+
+
+# Client side
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port: int, timeout: float = 30) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Server on port {port} did not start")
+
+
+async def load(url: str, duration: float, concurrency: int, keepalive: bool) -> dict:
+    import httpx
+
+    limits = httpx.Limits(
+        max_connections=concurrency,
+        max_keepalive_connections=concurrency if keepalive else 0,
+    )
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+
+        async def worker():
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    response = await client.get(url)
+                    if response.status_code >= 500:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                    continue
+                latencies.append(time.perf_counter() - start)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+
+    def percentile(p):
+        if not latencies:
+            return None
+        return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 2)
+
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": percentile(0.50),
+        "p99_ms": percentile(0.99),
+    }
+
+
+def run_mode(mode: str, args, env: dict) -> dict:
+    port = free_port()
+    process = subprocess.Popen(
+        [
+            sys.executable, os.path.abspath(__file__),
+            "--serve", mode,
+            "--port", str(port),
+            "--workers", str(args.workers),
+            "--threads", str(args.threads),
+        ],
+        cwd=ROOT,
+        env=env,
+    )
+    try:
+        wait_for_port(port)
+        url = f"http://127.0.0.1:{port}{args.path}"
+        # Warm up so lifespan startup and first imports are not measured
+        asyncio.run(load(url, 1, 4, args.keepalive))
+        return asyncio.run(load(url, args.duration, args.concurrency, args.keepalive))
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--modes", nargs="+", default=["legacy", "wsgi", "asgi"])
+    parser.add_argument("--path", default="/")
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--keepalive", action="store_true", help="reuse client connections")
+    parser.add_argument("--serve", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.port, args.workers, args.threads)
+        return
+
+    workdir = tempfile.mkdtemp(prefix="bench-serving-")
+    env = dict(os.environ)
+    env.setdefault("OPENAI_API_KEY", "bench-placeholder")
+    env.setdefault("AGENT_STORAGE_BACKEND", "sqlite")
+    env.setdefault("SQLITE_PATH", os.path.join(workdir, "bench.db"))
+
+    results = {}
+    for mode in args.modes:
+        results[mode] = run_mode(mode, args, env)
+        print(f"{mode}: {results[mode]['rps']} req/s", file=sys.stderr)
+
+    print(
+        json.dumps(
+            {
+                "path": args.path,
+                "duration_seconds": args.duration,
+                "concurrency": args.concurrency,
+                "workers": args.workers,
+                "wsgi_server": "gunicorn" if shutil.which("gunicorn") else "wsgiref",
+                "keepalive": args.keepalive,
+                "results": results,
+            },
+            indent=2,
+        )
+    )
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Benchmark cold start: import cost and time-to-first-request
+
+  import    - `python -X importtime -c "import agent_api"`: total import time,
+              the slowest modules, and whether heavy client libraries
+              (openai, supabase, bs4, httpx) were pulled in at import
+  startup   - spawn `uvicorn main:asgi_app` and time until /ready returns 200
+              and the first GET / succeeds
+
+Usage:
+  python benchmarks/bench_startup.py --runs 5
+  python benchmarks/bench_startup.py --max-first-request-ms 3000   # exit 1 if slower
+
+Runs against the sqlite storage backend with a placeholder OpenAI key unless
+the environment provides real settings; nothing is called over the network.
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ("openai", "supabase", "bs4", "httpx")
+
+
+def bench_env(workdir: str) -> dict:
+    env = dict(os.environ)
+    env.setdefault("OPENAI_API_KEY", "bench-placeholder")
+    env.setdefault("AGENT_STORAGE_BACKEND", "sqlite")
+    env.setdefault("SQLITE_PATH", os.path.join(workdir, "bench.db"))
+    return env
+
+
+def parse_importtime(stderr: str) -> list:
+    """(module, self_us, cumulative_us) rows from -X importtime output"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def measure_import(env: dict, top: int) -> dict:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import agent_api"],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import agent_api failed:\n{result.stderr[-2000:]}")
+    rows = parse_importtime(result.stderr)
+    imported = {name for name, _, _ in rows}
+    total_us = next(cumulative for name, _, cumulative in rows if name == "agent_api")
+    slowest = sorted(rows, key=lambda row: row[2], reverse=True)[:top]
+    return {
+        "agent_api_ms": round(total_us / 1000, 1),
+        "modules": len(rows),
+        "heavy_modules_imported": [name for name in HEAVY_MODULES if name in imported],
+        "slowest_cumulative_ms": {name: round(cumulative / 1000, 1) for name, _, cumulative in slowest},
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def get_status(url: str) -> int:
+    try:
+        with urllib.request.urlopen(url, timeout=1) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except OSError:
+        return 0
+
+
+def measure_startup(env: dict, timeout: float) -> dict:
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "main:asgi_app",
+            "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning",
+        ],
+        cwd=ROOT,
+        env=env,
+    )
+    try:
+        ready_ms = None
+        deadline = started + timeout
+        while time.perf_counter() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError("server exited during startup")
+            if get_status(f"{base}/ready") == 200:
+                ready_ms = (time.perf_counter() - started) * 1000
+                break
+            time.sleep(0.01)
+        if ready_ms is None:
+            raise RuntimeError(f"server not ready after {timeout}s")
+        if get_status(f"{base}/") != 200:
+            raise RuntimeError("first request failed")
+        first_request_ms = (time.perf_counter() - started) * 1000
+        return {"ready_ms": round(ready_ms, 1), "first_request_ms": round(first_request_ms, 1)}
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=10, help="slowest modules to report")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--max-first-request-ms", type=float, help="fail if the median is slower")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="bench-startup-") as workdir:
+        env = bench_env(workdir)
+        imports = [measure_import(env, args.top) for _ in range(args.runs)]
+        startups = [measure_startup(env, args.timeout) for _ in range(args.runs)]
+
+    report = {
+        "runs": args.runs,
+        "import": {
+            **imports[-1],
+            "agent_api_ms": round(statistics.median(run["agent_api_ms"] for run in imports), 1),
+        },
+        "startup": {
+            "ready_ms": round(statistics.median(run["ready_ms"] for run in startups), 1),
+            "first_request_ms": round(
+                statistics.median(run["first_request_ms"] for run in startups), 1
+            ),
+            "samples": startups,
+        },
+    }
+    print(json.dumps(report, indent=2))
+
+    limit = args.max_first_request_ms
+    if limit is not None and report["startup"]["first_request_ms"] > limit:
+        print(
+            f"first request took {report['startup']['first_request_ms']}ms (limit {limit}ms)",
+            file=sys.stderr,
+        )
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
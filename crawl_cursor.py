@@ -0,0 +1,81 @@
+"""
+Continuation tokens for paginated crawls
+A cursor is the crawl frontier (remaining candidate URLs per site, seen URL
+ids, per-site offsets) compressed, bound to a user and signed, so "show
+more" resumes the crawl instead of starting over. The signature matters:
+the server fetches the URLs inside a cursor, so clients must not edit them.
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import os
+import secrets
+import time
+import zlib
+from typing import Any, Dict
+
+logger = logging.getLogger(__name__)
+
+CURSOR_VERSION = 1
+# How long a "show more" token stays valid
+CURSOR_TTL_SECONDS = int(os.environ.get("CURSOR_TTL_SECONDS", "3600"))
+CURSOR_SECRET = os.environ.get("CURSOR_SECRET") or os.environ.get("SESSION_SECRET")
+
+if not CURSOR_SECRET:
+    # Tokens then only verify in the process that issued them
+    logger.warning("CURSOR_SECRET/SESSION_SECRET not set; crawl cursors are per-process")
+    CURSOR_SECRET = secrets.token_hex(32)
+
+_KEY = CURSOR_SECRET.encode("utf-8")
+
+
+class InvalidCursor(ValueError):
+    """Cursor is malformed, tampered with, expired or for another user"""
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def _sign(payload: bytes) -> bytes:
+    return hmac.new(_KEY, payload, hashlib.sha256).digest()[:16]
+
+
+def encode_cursor(state: Dict[str, Any], user_id: str) -> str:
+    """Signed, compressed token for a crawl frontier"""
+    document = {"v": CURSOR_VERSION, "u": user_id, "t": int(time.time()), "f": state}
+    payload = zlib.compress(json.dumps(document, separators=(",", ":")).encode("utf-8"), 9)
+    return f"{_b64encode(payload)}.{_b64encode(_sign(payload))}"
+
+
+def decode_cursor(token: str, user_id: str) -> Dict[str, Any]:
+    """Crawl frontier from a token issued to user_id; raises InvalidCursor"""
+    try:
+        payload_text, signature_text = token.split(".", 1)
+        payload = _b64decode(payload_text)
+        signature = _b64decode(signature_text)
+    except ValueError:
+        raise InvalidCursor("Malformed cursor")
+
+    if not hmac.compare_digest(signature, _sign(payload)):
+        raise InvalidCursor("Cursor signature mismatch")
+
+    try:
+        document = json.loads(zlib.decompress(payload))
+    except (zlib.error, ValueError):
+        raise InvalidCursor("Malformed cursor")
+
+    if document.get("v") != CURSOR_VERSION:
+        raise InvalidCursor("Unsupported cursor version")
+    if document.get("u") != user_id:
+        raise InvalidCursor("Cursor was issued to another user")
+    if time.time() - document.get("t", 0) > CURSOR_TTL_SECONDS:
+        raise InvalidCursor("Cursor expired")
+    return document["f"]
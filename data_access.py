@@ -0,0 +1,185 @@
+"""
+Shared Supabase data-access layer
+Holds long-lived anon and service-role clients over one pooled HTTP connection
+pool, with async wrappers and per-query timing for every module
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional
+
+if TYPE_CHECKING:
+    import httpx
+    from supabase import Client
+
+# httpx and supabase are imported when the first client is created, so
+# importing this module (and everything that uses db) stays cheap
+
+logger = logging.getLogger(__name__)
+
+# Connection pool shared by the anon and service-role clients
+DB_MAX_CONNECTIONS = int(os.environ.get("SUPABASE_MAX_CONNECTIONS", "20"))
+DB_MAX_KEEPALIVE = int(os.environ.get("SUPABASE_MAX_KEEPALIVE", "10"))
+DB_TIMEOUT_SECONDS = float(os.environ.get("SUPABASE_TIMEOUT_SECONDS", "10"))
+# Queries slower than this are logged at warning level
+DB_SLOW_QUERY_MS = float(os.environ.get("SUPABASE_SLOW_QUERY_MS", "500"))
+
+
+@dataclass
+class QueryStats:
+    """Accumulated timings for one query label"""
+
+    count: int = 0
+    errors: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+
+    def record(self, elapsed_ms: float, ok: bool) -> None:
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        if not ok:
+            self.errors += 1
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "avg_ms": round(self.total_ms / self.count, 2) if self.count else 0.0,
+            "max_ms": round(self.max_ms, 2),
+        }
+
+
+class SupabaseDataAccess:
+    """
+    Process-wide access to Supabase.
+
+    Clients are created on first use and reused for the life of the process.
+    Queries are passed in as builders so callers keep the supabase-py query
+    syntax while every call goes through the same timing and pooling.
+    """
+
+    def __init__(self):
+        self._anon: Optional["Client"] = None
+        self._service: Optional["Client"] = None
+        self._http: Optional["httpx.Client"] = None
+        self._lock = threading.Lock()
+        self._stats: Dict[str, QueryStats] = {}
+
+    def _http_client(self) -> "httpx.Client":
+        if self._http is None:
+            import httpx
+
+            self._http = httpx.Client(
+                timeout=DB_TIMEOUT_SECONDS,
+                follow_redirects=True,
+                limits=httpx.Limits(
+                    max_connections=DB_MAX_CONNECTIONS,
+                    max_keepalive_connections=DB_MAX_KEEPALIVE,
+                ),
+            )
+        return self._http
+
+    def _create_client(self, key_name: str) -> "Client":
+        from supabase import create_client, ClientOptions
+
+        url = os.environ.get("SUPABASE_URL")
+        key = os.environ.get(key_name)
+
+        if not url or not key:
+            raise ValueError(
+                f"SUPABASE_URL and {key_name} environment variables must be set"
+            )
+
+        return create_client(
+            url, key, options=ClientOptions(httpx_client=self._http_client())
+        )
+
+    @property
+    def anon(self) -> "Client":
+        """Client using the anon key (subject to RLS)"""
+        if self._anon is None:
+            with self._lock:
+                if self._anon is None:
+                    self._anon = self._create_client("SUPABASE_KEY")
+        return self._anon
+
+    @property
+    def service(self) -> "Client":
+        """Client using the service role key for bypassing RLS"""
+        if self._service is None:
+            with self._lock:
+                if self._service is None:
+                    self._service = self._create_client("SUPABASE_SERVICE_ROLE_KEY")
+        return self._service
+
+    def execute(
+        self, label: str, build: Callable[["Client"], Any], service: bool = True
+    ) -> Any:
+        """
+        Build and execute a query, recording its latency under label.
+
+        Args:
+            label: Stable name for the query, e.g. "user_settings.select"
+            build: Receives the client and returns an executable query builder
+            service: Use the service-role client (default) or the anon client
+        """
+        start = time.perf_counter()
+        ok = False
+        try:
+            client = self.service if service else self.anon
+            response = build(client).execute()
+            ok = True
+            return response
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self._record(label, elapsed_ms, ok)
+
+    async def run(
+        self, label: str, build: Callable[["Client"], Any], service: bool = True
+    ) -> Any:
+        """Async variant of execute; runs the blocking call off the event loop"""
+        return await asyncio.to_thread(self.execute, label, build, service)
+
+    def insert(self, table: str, rows: Any, service: bool = True) -> Any:
+        return self.execute(
+            f"{table}.insert", lambda db: db.table(table).insert(rows), service
+        )
+
+    async def ainsert(self, table: str, rows: Any, service: bool = True) -> Any:
+        return await asyncio.to_thread(self.insert, table, rows, service)
+
+    def _record(self, label: str, elapsed_ms: float, ok: bool) -> None:
+        stats = self._stats.get(label)
+        if stats is None:
+            stats = self._stats.setdefault(label, QueryStats())
+        stats.record(elapsed_ms, ok)
+        if elapsed_ms >= DB_SLOW_QUERY_MS:
+            logger.warning(f"Slow Supabase query {label}: {elapsed_ms:.0f}ms")
+
+    def query_stats(self) -> Dict[str, Dict[str, Any]]:
+        return {label: stats.as_dict() for label, stats in self._stats.items()}
+
+    def close(self) -> None:
+        with self._lock:
+            if self._http is not None:
+                self._http.close()
+            self._http = None
+            self._anon = None
+            self._service = None
+
+
+db = SupabaseDataAccess()
+
+
+def get_data_access() -> SupabaseDataAccess:
+    return db
+
+
+def rows(response: Any) -> List[Dict[str, Any]]:
+    """Response data as a list, tolerating empty responses"""
+    return response.data if response is not None and response.data else []
@@ -0,0 +1,246 @@
+"""
+Local diet-compliance classification
+Decides from a recipe's parsed ingredient names whether it is vegan,
+vegetarian, keto, gluten-free or dairy-free, without an LLM call.
+
+TAXONOMY maps ingredient words and phrases to categories (meat, dairy,
+gluten, ...). At import it is compiled into a phrase index: token tuples ->
+bitmask of categories, with the longest phrase winning, so "coconut milk"
+is not dairy and "soy sauce" is gluten. Qualifiers such as "vegan" or
+"gluten-free" clear the categories they rule out. Each ingredient name is
+classified once (LRU cached) and a recipe's mask is the OR of its
+ingredients, so tagging a recipe is a handful of dict and set lookups.
+"""
+
+import os
+import re
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from ingredient_parser import ingredient_rows
+from ingredient_vocabulary import ingredient_tokens
+
+# Drop crawled recipes that don't comply with the requested diet_type
+DIET_FILTER_ENABLED = os.environ.get("DIET_FILTER_ENABLED", "true").lower() in ("1", "true", "yes")
+
+CATEGORIES = ("meat", "poultry", "seafood", "gelatin", "dairy", "egg", "honey", "gluten", "sugar", "starch")
+_BIT = {category: 1 << index for index, category in enumerate(CATEGORIES)}
+
+
+def _mask(*categories: str) -> int:
+    mask = 0
+    for category in categories:
+        mask |= _BIT[category]
+    return mask
+
+
+# Categories each diet rules out
+DIET_RULES = {
+    "vegan": _mask("meat", "poultry", "seafood", "gelatin", "dairy", "egg", "honey"),
+    "vegetarian": _mask("meat", "poultry", "seafood", "gelatin"),
+    "keto": _mask("sugar", "starch"),
+    "gluten-free": _mask("gluten"),
+    "dairy-free": _mask("dairy"),
+}
+DIET_ALIASES = {
+    "plant-based": "vegan",
+    "veggie": "vegetarian",
+    "ketogenic": "keto",
+    "gluten free": "gluten-free",
+    "celiac": "gluten-free",
+    "dairy free": "dairy-free",
+    "lactose-free": "dairy-free",
+    "non-dairy": "dairy-free",
+}
+
+# Ingredient word or phrase -> categories; () marks a phrase that is safe
+# despite containing a listed word ("coconut milk", "eggplant" is its own word)
+TAXONOMY: Dict[str, Tuple[str, ...]] = {
+    # meat
+    **{word: ("meat",) for word in (
+        "beef", "pork", "lamb", "mutton", "veal", "venison", "goat", "bacon", "ham", "sausage",
+        "prosciutto", "pancetta", "chorizo", "salami", "pepperoni", "steak", "brisket", "meatball",
+        "jerky", "lard", "bison", "rabbit", "short rib", "pork rind", "hot dog", "bone broth", "tallow",
+    )},
+    # poultry
+    **{word: ("poultry",) for word in ("chicken", "turkey", "duck", "goose", "quail", "cornish hen")},
+    # seafood
+    **{word: ("seafood",) for word in (
+        "fish", "salmon", "tuna", "cod", "halibut", "tilapia", "trout", "sardine", "anchovy",
+        "mackerel", "haddock", "snapper", "catfish", "shrimp", "prawn", "crab", "lobster",
+        "scallop", "clam", "mussel", "oyster", "squid", "calamari", "octopus", "fish sauce",
+        "oyster sauce", "worcestershire sauce", "bonito", "caviar", "roe",
+    )},
+    "gelatin": ("gelatin",),
+    "gelatine": ("gelatin",),
+    # dairy
+    **{word: ("dairy",) for word in (
+        "milk", "butter", "cheese", "cream", "yogurt", "yoghurt", "ghee", "buttermilk", "parmesan",
+        "mozzarella", "cheddar", "ricotta", "feta", "mascarpone", "whey", "casein", "sour cream",
+        "half and half", "creme fraiche", "paneer", "brie", "gruyere", "halloumi", "pecorino",
+        "romano", "gouda", "provolone", "burrata", "kefir", "custard", "ice cream",
+    )},
+    # egg
+    **{word: ("egg",) for word in ("egg", "egg white", "egg yolk", "mayonnaise", "mayo", "meringue", "aioli")},
+    "honey": ("honey", "sugar"),
+    # gluten grains and the foods made from them
+    **{word: ("gluten", "starch") for word in (
+        "flour", "wheat", "bread", "breadcrumb", "panko", "pasta", "spaghetti", "noodle",
+        "macaroni", "penne", "fettuccine", "linguine", "lasagna", "orzo", "couscous", "barley",
+        "rye", "semolina", "farro", "bulgur", "tortilla", "pita", "naan", "cracker", "biscuit",
+        "croissant", "bun", "bagel", "roll", "pastry", "pie crust", "crouton", "baguette",
+    )},
+    **{word: ("gluten",) for word in ("soy sauce", "seitan", "beer", "malt", "teriyaki sauce", "hoisin sauce")},
+    # sugars and starches (keto)
+    **{word: ("sugar",) for word in (
+        "sugar", "syrup", "maple syrup", "molasses", "agave", "jam", "jelly", "marmalade",
+        "candy", "caramel", "chocolate chip", "marshmallow", "ketchup", "date",
+    )},
+    **{word: ("starch",) for word in (
+        "rice", "oat", "oatmeal", "quinoa", "corn", "cornmeal", "cornstarch", "polenta", "grits",
+        "potato", "sweet potato", "yam", "cassava", "tapioca", "rice noodle", "corn tortilla",
+        "rice flour", "potato starch", "bean", "lentil", "chickpea", "banana", "raisin",
+    )},
+    # look-alikes that are fine
+    **{phrase: () for phrase in (
+        "coconut milk", "almond milk", "soy milk", "cashew milk", "coconut cream", "coconut yogurt",
+        "almond butter", "cashew butter", "sunflower butter", "cocoa butter", "butternut squash",
+        "butter lettuce", "cream of tartar", "almond flour", "coconut flour", "cauliflower rice",
+        "rice vinegar", "rice wine vinegar", "tamari", "coconut aminos", "nutritional yeast",
+        "snap pea", "vegetable broth", "vegetable stock", "green bean", "egg replacer",
+        "flax egg", "sugar substitute", "monk fruit", "stevia", "corn salad",
+    )},
+    "peanut butter": ("starch",),
+    "apple butter": ("sugar",),
+    "oat milk": ("starch",),
+    "rice milk": ("starch",),
+    "butter bean": ("starch",),
+    "chickpea flour": ("starch",),
+    "buckwheat": ("starch",),
+    "cream cheese": ("dairy",),
+    "goat cheese": ("dairy",),
+    "graham cracker": ("gluten", "starch", "sugar"),
+    "egg noodle": ("egg", "gluten", "starch"),
+    "chicken broth": ("poultry",),
+    "chicken stock": ("poultry",),
+    "beef broth": ("meat",),
+    "beef stock": ("meat",),
+}
+
+# Qualifiers that clear categories for the rest of the ingredient name
+QUALIFIERS: Dict[str, Tuple[str, ...]] = {
+    "vegan": ("meat", "poultry", "seafood", "gelatin", "dairy", "egg", "honey"),
+    "plant based": ("meat", "poultry", "seafood", "dairy", "egg"),
+    "meatless": ("meat", "poultry"),
+    "dairy free": ("dairy",),
+    "non dairy": ("dairy",),
+    "nondairy": ("dairy",),
+    "lactose free": ("dairy",),
+    "gluten free": ("gluten",),
+    "sugar free": ("sugar",),
+    "egg free": ("egg",),
+}
+
+
+def _compile() -> Tuple[Dict[Tuple[str, ...], Tuple[int, int]], int]:
+    """Phrase index: token tuple -> (categories set, categories cleared), and the longest phrase"""
+    index = {}
+    for phrase, categories in TAXONOMY.items():
+        index[ingredient_tokens(phrase)] = (_mask(*categories), 0)
+    for phrase, categories in QUALIFIERS.items():
+        index[ingredient_tokens(phrase)] = (0, _mask(*categories))
+    return index, max(len(key) for key in index)
+
+
+_PHRASES, _LONGEST = _compile()
+
+
+@lru_cache(maxsize=16384)
+def ingredient_mask(name: str) -> int:
+    """Category bitmask for one ingredient name; longest phrase match at each position"""
+    tokens = ingredient_tokens(name)
+    found = cleared = 0
+    i = 0
+    while i < len(tokens):
+        for size in range(min(_LONGEST, len(tokens) - i), 0, -1):
+            entry = _PHRASES.get(tokens[i:i + size])
+            if entry is not None:
+                found |= entry[0]
+                cleared |= entry[1]
+                i += size
+                break
+        else:
+            i += 1
+    return found & ~cleared
+
+
+def recipe_mask(names: Iterable[str]) -> int:
+    mask = 0
+    for name in names:
+        mask |= ingredient_mask(name)
+    return mask
+
+
+def _compliant(mask: int) -> List[str]:
+    return [diet for diet, rule in DIET_RULES.items() if not mask & rule]
+
+
+def diet_tags(ingredients: Iterable[Any]) -> List[str]:
+    """Diets (DIET_RULES order) that parsed ingredients comply with"""
+    return _compliant(recipe_mask(ingredient.name for ingredient in ingredients))
+
+
+def recipe_diet_tags(recipe: Dict[str, Any]) -> List[str]:
+    """diet_tags for a recipe record or dict, classifying its ingredients if needed"""
+    tags = recipe.get("diet_tags")
+    if tags is None:
+        return _compliant(recipe_mask(row.get("name") or "" for row in ingredient_rows(recipe)))
+    return list(tags)
+
+
+def diet_violations(ingredients: Iterable[Any], diet: str) -> int:
+    """Number of ingredients that break diet"""
+    rule = DIET_RULES[diet]
+    return sum(1 for ingredient in ingredients if ingredient_mask(ingredient.name) & rule)
+
+
+def canonical_diet(value: Optional[str]) -> Optional[str]:
+    """DIET_RULES key for a diet_type such as "Vegan", "gluten free" or "plant-based"; None if not classified"""
+    if not value:
+        return None
+    diet = " ".join(str(value).lower().replace("_", " ").split())
+    diet = DIET_ALIASES.get(diet, diet).replace(" ", "-")
+    diet = DIET_ALIASES.get(diet, diet)
+    return diet if diet in DIET_RULES else None
+
+
+# Words that name a diet when the prompt, not an extracted diet_type, says
+# so. "veggie" is left out: in a prompt it mostly means vegetables ("chicken
+# and veggie stir fry"). "gluten-free", "gluten free" and "glutenfree" all
+# name the same diet.
+_PROMPT_DIET_PHRASES = [phrase for phrase in (*DIET_RULES, *DIET_ALIASES) if phrase != "veggie"]
+_PROMPT_DIETS = [
+    (
+        re.compile(rf"\b{'[- ]?'.join(map(re.escape, re.split(r'[- ]', phrase)))}\b", re.IGNORECASE),
+        canonical_diet(phrase),
+    )
+    for phrase in sorted(_PROMPT_DIET_PHRASES, key=len, reverse=True)
+]
+_ANIMAL = _mask("meat", "poultry", "seafood")
+
+
+def requested_diet(prompt: str, query_profile: Optional[Dict[str, Any]] = None) -> Optional[str]:
+    """
+    The extracted diet_type if it is one we classify, else the first diet
+    named in the prompt. A prompt diet that rules out meat, poultry or
+    seafood the prompt itself asks for ("vegetarian chili with beef") is
+    ignored; qualified names such as "vegan sausage" don't count as meat.
+    """
+    diet = canonical_diet((query_profile or {}).get("diet_type"))
+    if diet:
+        return diet
+    named = ingredient_mask(prompt) & _ANIMAL
+    for pattern, name in _PROMPT_DIETS:
+        if pattern.search(prompt) and not DIET_RULES[name] & named:
+            return name
+    return None
@@ -0,0 +1,165 @@
+"""
+Recipe durations and prompt time limits
+schema.org prepTime, cookTime and totalTime are ISO-8601 durations
+("PT1H30M", "P0DT0H45M"), though some sites emit plain text ("45 mins",
+"1 hr 10 min"). parse_duration turns either into whole minutes; the same
+few dozen values repeat across most pages, so results are LRU cached.
+time_limit reads the limit a prompt asks for ("under 30 minutes", "quick"),
+and not the numbers and words that name a dish ("2 minute noodles", "fast
+food").
+"""
+
+import logging
+import os
+import re
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Time limit implied by "quick", "fast" or "weeknight" without a number
+QUICK_MEAL_MINUTES = float(os.environ.get("QUICK_MEAL_MINUTES", "30"))
+
+_NUMBER = r"(\d+(?:[.,]\d+)?)"
+_ISO_DURATION = re.compile(
+    rf"^P(?:{_NUMBER}W)?(?:{_NUMBER}D)?"
+    rf"(?:T(?:{_NUMBER}H)?(?:{_NUMBER}M)?(?:{_NUMBER}S)?"
+    # "P30M" is a common markup slip for "PT30M"; months make no sense for a recipe
+    rf"|(?:{_NUMBER}M))?$",
+    re.IGNORECASE,
+)
+_ISO_MINUTES = (7 * 24 * 60, 24 * 60, 60, 1, 1 / 60, 1)
+_TEXT_HOURS = re.compile(rf"{_NUMBER}\s*(?:hours?|hrs?|h)\b", re.IGNORECASE)
+_TEXT_MINUTES = re.compile(rf"{_NUMBER}\s*(?:minutes?|mins?|m)\b", re.IGNORECASE)
+
+# In a prompt a number is a limit only when worded as one ("under 30 minutes",
+# "in 1 hour", "45 minutes or less"); "2 minute noodles" names a dish
+_LIMIT_BEFORE = (
+    r"\b(?:under|in|within|less\s+than|no\s+more\s+than|at\s+most|max(?:imum)?|up\s+to)"
+    r"\s+(?:about\s+|around\s+|roughly\s+)?"
+)
+_LIMIT_AFTER = r"(?=\s*(?:or\s+(?:less|under)|max(?:imum)?|tops)\b)"
+_MINUTES_UNIT = r"\s*(?:-\s*)?(?:minutes?|mins?)\b"
+_HOURS_UNIT = r"\s*(?:-\s*)?(?:hours?|hrs?)\b"
+_HOURS_NUMBER = r"(\d+(?:\.\d+)?|an?|one)"
+# "1 hour 30 minutes" and "an hour and 15 mins" are one limit, not two
+_HOURS_AND_MINUTES = rf"{_HOURS_NUMBER}{_HOURS_UNIT}\s*,?\s*(?:and\s+)?(\d+){_MINUTES_UNIT}"
+_PROMPT_HOURS_AND_MINUTES = re.compile(
+    rf"{_LIMIT_BEFORE}{_HOURS_AND_MINUTES}|\b{_HOURS_AND_MINUTES}{_LIMIT_AFTER}", re.IGNORECASE
+)
+_PROMPT_MINUTES = re.compile(
+    rf"{_LIMIT_BEFORE}(\d+){_MINUTES_UNIT}|\b(\d+){_MINUTES_UNIT}{_LIMIT_AFTER}", re.IGNORECASE
+)
+_PROMPT_HOURS = re.compile(
+    rf"{_LIMIT_BEFORE}{_HOURS_NUMBER}{_HOURS_UNIT}|\b{_HOURS_NUMBER}{_HOURS_UNIT}{_LIMIT_AFTER}",
+    re.IGNORECASE,
+)
+# An extracted time_constraint is a limit by definition, so bare numbers count
+_CONSTRAINT_HOURS_AND_MINUTES = re.compile(rf"\b{_HOURS_AND_MINUTES}", re.IGNORECASE)
+_CONSTRAINT_MINUTES = re.compile(rf"(\d+){_MINUTES_UNIT}", re.IGNORECASE)
+_CONSTRAINT_HOURS = re.compile(rf"\b{_HOURS_NUMBER}{_HOURS_UNIT}", re.IGNORECASE)
+# "fast food", "quick bread" and "quick oats" name foods, not a time limit
+_QUICK = re.compile(
+    r"\b(?:quick|fast|speedy|weeknight|rushed|in a hurry)\b"
+    r"(?![\s-]+(?:foods?|breads?|oats|rise|rising|acting|yeast)\b)",
+    re.IGNORECASE,
+)
+
+
+def _number(value: Optional[str]) -> float:
+    return float(value.replace(",", ".")) if value else 0.0
+
+
+@lru_cache(maxsize=4096)
+def parse_duration(value: str) -> Optional[int]:
+    """Whole minutes from "PT1H30M", "P1DT2H", "PT90M" or "1 hr 30 mins"; None if unparseable"""
+    text = value.strip()
+    match = _ISO_DURATION.match(text)
+    if match and text.upper() not in ("P", "PT"):
+        minutes = sum(_number(group) * scale for group, scale in zip(match.groups(), _ISO_MINUTES))
+        return int(round(minutes))
+
+    hours = _TEXT_HOURS.search(text)
+    minutes = _TEXT_MINUTES.search(text)
+    if not hours and not minutes:
+        return None
+    return int(round(_number(hours and hours.group(1)) * 60 + _number(minutes and minutes.group(1))))
+
+
+def _duration(value: Any) -> Optional[int]:
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, (int, float)):
+        # Bare numbers are taken as minutes
+        return int(value) if value >= 0 else None
+    if isinstance(value, list):
+        value = next((item for item in value if isinstance(item, str)), None)
+        if value is None:
+            return None
+    try:
+        return parse_duration(str(value))
+    except (TypeError, ValueError) as e:
+        logger.warning(f"Error parsing duration {value!r}: {e}")
+        return None
+
+
+def recipe_times(data: Dict[str, Any]) -> Tuple[Optional[int], Optional[int], Optional[int]]:
+    """
+    (prep, cook, total) minutes from a schema.org Recipe. A missing or zero
+    totalTime falls back to prep + cook when either is known.
+    """
+    prep = _duration(data.get("prepTime"))
+    cook = _duration(data.get("cookTime"))
+    total = _duration(data.get("totalTime"))
+    if not total and (prep or cook):
+        total = (prep or 0) + (cook or 0)
+    return prep, cook, total
+
+
+def _hours(value: str) -> float:
+    return 1.0 if value.lower() in ("a", "an", "one") else float(value)
+
+
+def _first_group(match: Optional["re.Match[str]"]) -> Optional[str]:
+    return next((group for group in match.groups() if group), None) if match else None
+
+
+def _stated_limit(text: str, constraint: bool) -> Optional[float]:
+    both = (_CONSTRAINT_HOURS_AND_MINUTES if constraint else _PROMPT_HOURS_AND_MINUTES).search(text)
+    if both:
+        # Only one alternative matched, so its two groups are the set ones
+        hours, minutes = [group for group in both.groups() if group]
+        return _hours(hours) * 60 + float(minutes)
+    minutes = _first_group((_CONSTRAINT_MINUTES if constraint else _PROMPT_MINUTES).search(text))
+    if minutes:
+        return float(minutes)
+    hours = _first_group((_CONSTRAINT_HOURS if constraint else _PROMPT_HOURS).search(text))
+    if hours:
+        return _hours(hours) * 60
+    return None
+
+
+def time_limit(text: str, constraint: bool = False) -> Optional[float]:
+    """
+    Minutes from "under 30 minutes", "in an hour", "in 1 hour 15 minutes",
+    "45 minutes or less" or "quick"; None when no limit is asked for. With constraint (an extracted
+    time_constraint such as "30 minutes") a bare number is a limit too.
+    """
+    limit = _stated_limit(text, constraint)
+    if limit is None and _QUICK.search(text):
+        return QUICK_MEAL_MINUTES
+    return limit
+
+
+def prompt_time_limit(prompt: str, query_profile: Optional[Dict[str, Any]] = None) -> Optional[float]:
+    """
+    time_limit of the prompt together with the extracted time_constraint;
+    a number in either wins over "quick" in either
+    """
+    constraint = str((query_profile or {}).get("time_constraint") or "")
+    limit = _stated_limit(prompt, False)
+    if limit is None:
+        limit = _stated_limit(constraint, True)
+    if limit is None and (_QUICK.search(prompt) or _QUICK.search(constraint)):
+        return QUICK_MEAL_MINUTES
+    return limit
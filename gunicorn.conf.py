@@ -0,0 +1,38 @@
+"""
+Gunicorn settings for both serving modes
+
+WSGI (persistent-loop adapter in main.py, threaded workers):
+    gunicorn main:app
+Native ASGI (preferred; requires the uvicorn-worker package on uvicorn >= 0.30):
+    GUNICORN_WORKER_CLASS=uvicorn_worker.UvicornWorker gunicorn main:asgi_app
+
+Each worker is a separate process with its own event loop, caches and
+write-behind queue, so WEB_CONCURRENCY scales across CPUs while threads (WSGI)
+or the event loop (ASGI) handle concurrency inside a worker.
+"""
+
+import multiprocessing
+import os
+
+bind = f"{os.environ.get('HOST', '0.0.0.0')}:{os.environ.get('PORT', '5000')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", str(min(multiprocessing.cpu_count(), 4))))
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+# Only used by gthread workers: WSGI requests in flight per worker
+threads = int(os.environ.get("GUNICORN_THREADS", "16"))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT_SECONDS", "120"))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT_SECONDS", "30"))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE_SECONDS", "5"))
+
+
+def post_worker_init(worker):
+    # Run the FastAPI lifespan at worker boot instead of on the first request
+    start = getattr(worker.wsgi, "start", None)
+    if callable(start) and hasattr(worker.wsgi, "asgi_app"):
+        start()
+
+
+def worker_exit(server, worker):
+    # Drain the write-behind queue and close pools before the worker exits
+    close = getattr(worker.wsgi, "close", None)
+    if callable(close) and hasattr(worker.wsgi, "asgi_app"):
+        close()
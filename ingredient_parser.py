@@ -0,0 +1,218 @@
+"""
+Structured ingredient parsing
+Splits recipeIngredient lines such as "1 ½ cups all-purpose flour, sifted"
+or "1 (15 ounce) can chickpeas, drained" into quantity (with range upper
+bound), canonical unit, ingredient name and note, the fields of
+models.IngredientModel. One precompiled pattern does the tokenizing and
+results are kept in an LRU cache, since the same lines ("2 large eggs",
+"Salt and pepper to taste") recur across most recipes.
+"""
+
+import logging
+import os
+import re
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+INGREDIENT_CACHE_SIZE = int(os.environ.get("INGREDIENT_CACHE_SIZE", "16384"))
+
+VULGAR_FRACTIONS = {
+    "½": 1 / 2, "⅓": 1 / 3, "⅔": 2 / 3, "¼": 1 / 4, "¾": 3 / 4,
+    "⅕": 1 / 5, "⅖": 2 / 5, "⅗": 3 / 5, "⅘": 4 / 5, "⅙": 1 / 6,
+    "⅚": 5 / 6, "⅐": 1 / 7, "⅛": 1 / 8, "⅜": 3 / 8, "⅝": 5 / 8,
+    "⅞": 7 / 8, "⅑": 1 / 9, "⅒": 1 / 10,
+}
+
+# Canonical unit -> spellings seen in recipe markup (matched case-insensitively)
+UNITS = {
+    "cup": ["cups", "cup"],
+    "tablespoon": ["tablespoons", "tablespoon", "tbsps", "tbsp", "tbls", "tbl", "tbs"],
+    "teaspoon": ["teaspoons", "teaspoon", "tsps", "tsp"],
+    "fluid ounce": ["fluid ounces", "fluid ounce", "fl. oz", "fl oz"],
+    "ounce": ["ounces", "ounce", "oz"],
+    "pound": ["pounds", "pound", "lbs", "lb"],
+    "milligram": ["milligrams", "milligram", "mg"],
+    "gram": ["grams", "gram", "gr", "g"],
+    "kilogram": ["kilograms", "kilogram", "kg"],
+    "milliliter": ["milliliters", "milliliter", "millilitres", "millilitre", "ml"],
+    "liter": ["liters", "liter", "litres", "litre", "l"],
+    "quart": ["quarts", "quart", "qt"],
+    "pint": ["pints", "pint", "pt"],
+    "gallon": ["gallons", "gallon", "gal"],
+    "pinch": ["pinches", "pinch"],
+    "dash": ["dashes", "dash"],
+    "clove": ["cloves", "clove"],
+    "can": ["cans", "can", "tins", "tin"],
+    "package": ["packages", "package", "packets", "packet", "pkg"],
+    "jar": ["jars", "jar"],
+    "bottle": ["bottles", "bottle"],
+    "box": ["boxes", "box"],
+    "bag": ["bags", "bag"],
+    "slice": ["slices", "slice"],
+    "stick": ["sticks", "stick"],
+    "piece": ["pieces", "piece"],
+    "sprig": ["sprigs", "sprig"],
+    "bunch": ["bunches", "bunch"],
+    "head": ["heads", "head"],
+    "stalk": ["stalks", "stalk"],
+    "handful": ["handfuls", "handful"],
+}
+_UNIT_ALIASES = {alias: unit for unit, aliases in UNITS.items() for alias in aliases}
+
+_FRACTION_CHARS = "".join(VULGAR_FRACTIONS)
+_NUMBER = (
+    rf"(?:\d+\s*[{_FRACTION_CHARS}]"  # 1½, 1 ½
+    rf"|[{_FRACTION_CHARS}]"  # ½
+    r"|\d+\s+\d+\s*[/⁄]\s*\d+"  # 1 1/2
+    r"|\d+\s*[/⁄]\s*\d+"  # 3/4
+    r"|\d*\.\d+|\d+)"  # 0.5, .5, 2
+)
+_UNIT = "|".join(
+    re.escape(alias).replace(r"\ ", r"\s+")
+    for alias in sorted(_UNIT_ALIASES, key=len, reverse=True)
+)
+INGREDIENT_PATTERN = re.compile(
+    rf"^(?:(?P<quantity>{_NUMBER})(?:\s*(?:-|–|—|to|or)\s*(?P<quantity_max>{_NUMBER}))?"
+    rf"|(?P<article>an?)(?=\s+(?:{_UNIT})\b))?"
+    r"\s*(?:\((?P<size>[^)]*)\))?"
+    rf"\s*(?:(?P<unit>{_UNIT})\.?(?=[\s,(]|$))?"
+    r"\s*(?:\((?P<unit_size>[^)]*)\))?"
+    r"\s*(?:of\s+)?(?P<rest>.*)$",
+    re.IGNORECASE,
+)
+_PARENTHETICAL = re.compile(r"\s*\(([^)]*)\)")
+_SLASH = re.compile(r"\s*[/⁄]\s*")
+
+
+class Ingredient:
+    """
+    Parsed ingredient line. Instances are shared through the parse cache,
+    so treat them as read-only; scaled() returns a new one.
+    """
+
+    __slots__ = ("text", "quantity", "quantity_max", "unit", "name", "note")
+
+    def __init__(
+        self,
+        text: str,
+        quantity: Optional[float] = None,
+        quantity_max: Optional[float] = None,
+        unit: Optional[str] = None,
+        name: str = "",
+        note: Optional[str] = None,
+    ):
+        self.text = text
+        self.quantity = quantity
+        self.quantity_max = quantity_max
+        self.unit = unit
+        self.name = name  # lowercased ingredient head, e.g. "all-purpose flour"
+        self.note = note  # lowercased preparation and size notes, e.g. "15 ounce; drained"
+
+    def __repr__(self) -> str:
+        return f"Ingredient({self.quantity!r}, {self.unit!r}, {self.name!r})"
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Ingredient):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    def __hash__(self) -> int:
+        return hash(self.text)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "text": self.text,
+            "quantity": self.quantity,
+            "quantity_max": self.quantity_max,
+            "unit": self.unit,
+            "name": self.name,
+            "note": self.note,
+        }
+
+    def scaled(self, factor: float) -> "Ingredient":
+        """Same ingredient with quantities multiplied by factor (e.g. new_servings / servings)"""
+        return Ingredient(
+            self.text,
+            _round(self.quantity * factor) if self.quantity is not None else None,
+            _round(self.quantity_max * factor) if self.quantity_max is not None else None,
+            self.unit,
+            self.name,
+            self.note,
+        )
+
+
+def _round(value: float) -> float:
+    return round(value, 3)
+
+
+def parse_quantity(token: str) -> Optional[float]:
+    """Number from "2", "0.5", "3/4", "1 1/2", "½" or "1½"; None if unparseable"""
+    token = _SLASH.sub("/", token.strip())
+    total = 0.0
+    if token and token[-1] in VULGAR_FRACTIONS:
+        total = VULGAR_FRACTIONS[token[-1]]
+        token = token[:-1].strip()
+    try:
+        for part in token.split():
+            if "/" in part:
+                numerator, _, denominator = part.partition("/")
+                if float(denominator) == 0:
+                    return None
+                total += float(numerator) / float(denominator)
+            else:
+                total += float(part)
+    except ValueError:
+        return None
+    return _round(total)
+
+
+@lru_cache(maxsize=INGREDIENT_CACHE_SIZE)
+def parse_ingredient(line: str) -> Ingredient:
+    text = " ".join(line.split())
+    match = INGREDIENT_PATTERN.match(text)
+    if not match:
+        return Ingredient(text, name=text.lower())
+
+    if match.group("quantity"):
+        quantity = parse_quantity(match.group("quantity"))
+    else:
+        # "a pinch of salt", "a can of beans"
+        quantity = 1.0 if match.group("article") else None
+    quantity_max = (
+        parse_quantity(match.group("quantity_max")) if match.group("quantity_max") else None
+    )
+    unit = match.group("unit")
+    if unit:
+        unit = _UNIT_ALIASES.get(" ".join(unit.lower().split()))
+
+    notes = [match.group("size"), match.group("unit_size")]
+    # Parentheticals ("butter (softened)") move to the note before splitting off ", minced"
+    rest = match.group("rest")
+    notes.extend(_PARENTHETICAL.findall(rest))
+    name, _, comment = _PARENTHETICAL.sub("", rest).partition(",")
+    notes.append(comment)
+    note = "; ".join(part.strip().lower() for part in notes if part and part.strip()) or None
+
+    return Ingredient(text, quantity, quantity_max, unit, name.strip().lower(), note)
+
+
+def ingredient_rows(recipe: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """JSON-ready parsed_ingredients for a recipe record or dict, parsing ingredients if needed"""
+    parsed = recipe.get("parsed_ingredients")
+    if parsed is None:
+        parsed = parse_ingredients(recipe.get("ingredients") or [])
+    return [item.to_dict() if isinstance(item, Ingredient) else item for item in parsed]
+
+
+def parse_ingredients(lines: Iterable[Any]) -> List[Ingredient]:
+    """Parse recipeIngredient entries; non-string entries are parsed from their str()"""
+    parsed = []
+    for line in lines:
+        try:
+            parsed.append(parse_ingredient(line if isinstance(line, str) else str(line)))
+        except Exception as e:
+            logger.warning(f"Error parsing ingredient {line!r}: {e}")
+            parsed.append(Ingredient(str(line), name=str(line).lower()))
+    return parsed
@@ -0,0 +1,385 @@
+"""
+Canonical ingredient vocabulary
+User exclusions (allergies, disliked_ingredients) are free text ("prawns",
+"tree nuts") and recipe ingredient names are free text too, so comparing
+them by substring both misses ("prawns" vs "shrimp") and over-matches
+("nut" in "nutmeg"). Here both sides are mapped to integer ids once:
+
+  SYNONYMS   alternative names and spellings of one ingredient
+  COMPOUNDS  products that contain other ingredients ("peanut butter")
+  GROUPS     categories a user may exclude as a whole ("tree nut", "dairy")
+
+At import every name is tokenized (lowercased, singularized) into a token
+trie, and a name is canonicalized by longest match at each position, so
+"coconut milk" is not milk and "macadamia nuts" is one ingredient. Words
+outside the vocabulary get a stable id of their own, so "cilantro" still
+excludes "cilantro". An exclusion also covers the names that contain it as
+whole words and are not compounds: "cream" excludes sour cream and heavy
+cream, "onion" green onions (scallions) and "pepper" bell peppers. A
+recipe's ingredient_ids are computed at extraction and an exclusion list is
+compiled once (cached per term), after which checking a recipe is a set
+intersection.
+"""
+
+import re
+import unicodedata
+import zlib
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+from ingredient_parser import INGREDIENT_CACHE_SIZE, Ingredient
+
+# Canonical name -> other names for the same ingredient
+SYNONYMS: Dict[str, Tuple[str, ...]] = {
+    "shrimp": ("prawn", "scampi"),
+    "crawfish": ("crayfish", "crawdad"),
+    "squid": ("calamari",),
+    "scallion": ("green onion", "spring onion"),
+    "cilantro": ("coriander", "coriander leaf"),
+    "eggplant": ("aubergine", "brinjal"),
+    "zucchini": ("courgette",),
+    "arugula": ("rocket",),
+    "beet": ("beetroot",),
+    "chickpea": ("garbanzo", "garbanzo bean", "chana"),
+    "bell pepper": ("capsicum", "sweet pepper", "red bell pepper", "green bell pepper"),
+    "chili pepper": ("chili", "chile", "chilli", "chile pepper", "chilli pepper", "red pepper flake"),
+    "black pepper": ("pepper", "peppercorn", "ground pepper"),
+    "cornstarch": ("cornflour", "corn starch"),
+    "powdered sugar": ("icing sugar", "confectioners sugar"),
+    "heavy cream": ("double cream", "whipping cream", "heavy whipping cream"),
+    "yogurt": ("yoghurt",),
+    "parmesan": ("parmigiano", "parmigiano reggiano", "parmesan reggiano"),
+    "peanut": ("groundnut",),
+    "hazelnut": ("filbert",),
+    "pine nut": ("pignoli", "pinon"),
+    "macadamia": ("macadamia nut",),
+    "gelatin": ("gelatine",),
+    "mayonnaise": ("mayo",),
+    "jalapeno": ("jalapeno pepper",),
+    "serrano": ("serrano pepper",),
+    "habanero": ("habanero pepper",),
+    "poblano": ("poblano pepper",),
+    "cayenne": ("cayenne pepper",),
+}
+
+# Product -> ingredients it contains
+COMPOUNDS: Dict[str, Tuple[str, ...]] = {
+    "peanut butter": ("peanut",),
+    "peanut oil": ("peanut",),
+    "almond milk": ("almond",),
+    "almond flour": ("almond",),
+    "almond butter": ("almond",),
+    "cashew milk": ("cashew",),
+    "cashew butter": ("cashew",),
+    "nut butter": ("nut",),
+    "mixed nut": ("almond", "cashew", "hazelnut", "pecan", "brazil nut", "peanut"),
+    "coconut milk": ("coconut",),
+    "coconut cream": ("coconut",),
+    "coconut flour": ("coconut",),
+    "soy milk": ("soy",),
+    "soy sauce": ("soy", "wheat"),
+    "tamari": ("soy",),
+    "tofu": ("soy",),
+    "tempeh": ("soy",),
+    "edamame": ("soy",),
+    "miso": ("soy",),
+    "sesame oil": ("sesame",),
+    "tahini": ("sesame",),
+    "hummus": ("chickpea", "sesame"),
+    "pesto": ("basil", "pine nut", "parmesan"),
+    "egg noodle": ("egg", "wheat"),
+    "mayonnaise": ("egg",),
+    "aioli": ("egg", "garlic"),
+    "meringue": ("egg",),
+    "fish sauce": ("anchovy",),
+    "worcestershire sauce": ("anchovy",),
+    "oyster sauce": ("oyster",),
+    "chicken broth": ("chicken",),
+    "chicken stock": ("chicken",),
+    "beef broth": ("beef",),
+    "beef stock": ("beef",),
+    "garlic powder": ("garlic",),
+    "onion powder": ("onion",),
+    "tomato paste": ("tomato",),
+    "tomato sauce": ("tomato",),
+    "rice noodle": ("rice",),
+    "corn tortilla": ("corn",),
+    "flour tortilla": ("wheat",),
+    "breadcrumb": ("wheat",),
+    "panko": ("wheat",),
+    "buttermilk": ("milk",),
+    # Look-alikes that contain none of the ingredients they are named after
+    "oyster mushroom": ("mushroom",),
+    "cream of tartar": (),
+    "cocoa butter": (),
+    "butter lettuce": (),
+    "butter bean": (),
+    "egg replacer": (),
+}
+
+# Category -> members (ingredients or other categories)
+GROUPS: Dict[str, Tuple[str, ...]] = {
+    "nut": ("tree nut", "peanut"),
+    "tree nut": (
+        "almond", "cashew", "walnut", "pecan", "pistachio", "hazelnut", "macadamia",
+        "brazil nut", "pine nut", "chestnut",
+    ),
+    "seafood": ("fish", "shellfish"),
+    "fish": (
+        "salmon", "tuna", "cod", "halibut", "tilapia", "trout", "sardine", "anchovy",
+        "mackerel", "haddock", "snapper", "catfish", "swordfish", "sea bass", "bonito",
+    ),
+    "shellfish": ("crustacean", "mollusk"),
+    "crustacean": ("shrimp", "crab", "lobster", "crawfish", "langoustine"),
+    "mollusk": ("clam", "mussel", "oyster", "scallop", "squid", "octopus"),
+    "meat": ("beef", "pork", "lamb", "veal", "venison", "goat", "bison", "rabbit"),
+    "pork": ("bacon", "ham", "prosciutto", "pancetta", "chorizo", "lard", "pork rind"),
+    "sausage": ("chorizo", "salami", "pepperoni", "bratwurst", "kielbasa"),
+    "poultry": ("chicken", "turkey", "duck", "goose", "quail"),
+    "dairy": (
+        "milk", "butter", "cream", "heavy cream", "sour cream", "cheese", "yogurt", "ghee",
+        "buttermilk", "whey", "casein", "kefir", "ice cream", "half and half", "creme fraiche",
+    ),
+    "cheese": (
+        "parmesan", "cheddar", "mozzarella", "ricotta", "feta", "goat cheese", "cream cheese",
+        "mascarpone", "brie", "gruyere", "halloumi", "pecorino", "gouda", "provolone",
+        "paneer", "blue cheese", "cottage cheese", "monterey jack",
+    ),
+    "egg": ("egg white", "egg yolk"),
+    "soy": ("soybean",),
+    "gluten": (
+        "wheat", "barley", "rye", "spelt", "farro", "semolina", "bulgur", "couscous",
+        "seitan", "flour", "bread", "pasta", "noodle", "cracker", "pita", "naan",
+        "beer", "malt",
+    ),
+    "allium": ("onion", "garlic", "shallot", "leek", "scallion", "chive"),
+    "nightshade": ("tomato", "potato", "eggplant", "bell pepper", "chili pepper"),
+    "chili pepper": ("jalapeno", "serrano", "habanero", "poblano", "cayenne", "chipotle"),
+    "mushroom": (
+        "shiitake", "portobello", "cremini", "oyster mushroom", "chanterelle", "porcini",
+        "enoki", "morel",
+    ),
+}
+
+# Words that say nothing about which ingredient is meant
+DESCRIPTORS = frozenset(
+    "a an and or of to with fresh freshly raw cooked chopped diced minced sliced grated "
+    "shredded large small medium whole dried frozen canned optional taste".split()
+)
+
+_WORD = re.compile(r"[a-z]+")
+_SPLIT = re.compile(r"[,;/]")
+_IRREGULAR = {"leaves": "leaf", "halves": "half", "loaves": "loaf"}
+# Ids of words outside the vocabulary start here, clear of the entry ids
+_WORD_ID_BASE = 1 << 32
+
+
+def singular(word: str) -> str:
+    """Crude singular form: "tomatoes" -> "tomato", "anchovies" -> "anchovy" """
+    if word in _IRREGULAR:
+        return _IRREGULAR[word]
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 4 and word.endswith(("oes", "ches", "shes", "sses", "xes")):
+        return word[:-2]
+    if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us")):
+        return word[:-1]
+    return word
+
+
+def ingredient_tokens(text: str) -> Tuple[str, ...]:
+    """Lowercased, singularized, accent-free words of an ingredient name ("jalapeño" -> "jalapeno")"""
+    text = text.lower()
+    if not text.isascii():
+        text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii")
+    return tuple(singular(word) for word in _WORD.findall(text))
+
+
+def _word_id(word: str) -> int:
+    # crc32 rather than hash() so ids do not change between processes
+    return _WORD_ID_BASE + zlib.crc32(word.encode("utf-8"))
+
+
+def _closure(name: str, edges: Dict[str, Tuple[str, ...]], seen: Optional[Set[str]] = None) -> Set[str]:
+    """name and everything reachable from it through edges"""
+    seen = seen if seen is not None else set()
+    if name not in seen:
+        seen.add(name)
+        for child in edges.get(name, ()):
+            _closure(child, edges, seen)
+    return seen
+
+
+def _compile():
+    """
+    Entry ids, the token trie (terminal key None -> ids), group expansions,
+    and for each vocabulary name the ids of the longer non-compound names
+    containing it as whole words ("cream" -> sour cream, heavy cream, ...)
+    """
+    names: List[str] = []
+    for table in (SYNONYMS, COMPOUNDS, GROUPS):
+        for name, related in table.items():
+            names.append(name)
+            if table is not SYNONYMS:
+                names.extend(related)
+    ids = {name: index for index, name in enumerate(dict.fromkeys(names))}
+
+    trie: Dict = {}
+
+    def insert(phrase: str, entry_ids: FrozenSet[int]) -> None:
+        node = trie
+        for token in ingredient_tokens(phrase):
+            node = node.setdefault(token, {})
+        node[None] = entry_ids
+
+    for name in ids:
+        # A compound also stands for what it contains
+        insert(name, frozenset(ids[part] for part in _closure(name, COMPOUNDS)))
+    for name, synonyms in SYNONYMS.items():
+        for synonym in synonyms:
+            insert(synonym, _trie_ids(trie, name))
+
+    parents: Dict[str, Tuple[str, ...]] = {}
+    for group, members in GROUPS.items():
+        for member in members:
+            parents[member] = parents.get(member, ()) + (group,)
+    expansions = {}
+    for group in GROUPS:
+        # Excluding a group excludes its members, and generic mentions of
+        # the categories it belongs to ("chopped nuts" for "tree nuts")
+        names = _closure(group, GROUPS) | _closure(group, parents)
+        expansions[ids[group]] = frozenset(ids[name] for name in names)
+
+    containing: Dict[Tuple[str, ...], Set[int]] = {}
+    varieties = [(name, name) for name in ids] + [
+        (synonym, name) for name, synonyms in SYNONYMS.items() for synonym in synonyms
+    ]
+    for phrase, name in varieties:
+        if name in COMPOUNDS:
+            # Compounds list what they contain: "coconut milk" is not milk
+            continue
+        tokens = ingredient_tokens(phrase)
+        kinds = {ids[kind] for kind in _closure(name, GROUPS)}
+        for start in range(len(tokens)):
+            for end in range(start + 1, len(tokens) + 1):
+                run = tokens[start:end]
+                # Only runs that are names themselves: "green" is not excluding scallions
+                if len(run) < len(tokens) and _is_name(trie, run):
+                    containing.setdefault(run, set()).update(kinds)
+    return ids, trie, expansions, {key: frozenset(value) for key, value in containing.items()}
+
+
+def _is_name(trie: Dict, tokens: Tuple[str, ...]) -> bool:
+    node = trie
+    for token in tokens:
+        node = node.get(token)
+        if node is None:
+            return False
+    return None in node
+
+
+def _trie_ids(trie: Dict, phrase: str) -> FrozenSet[int]:
+    node = trie
+    for token in ingredient_tokens(phrase):
+        node = node[token]
+    return node[None]
+
+
+ENTRY_IDS, _TRIE, _EXPANSIONS, _CONTAINING = _compile()
+
+
+def _match(tokens: Tuple[str, ...]) -> Tuple[List[FrozenSet[int]], List[str]]:
+    """Longest vocabulary match at each position: (entry id sets, words left unmatched)"""
+    entries: List[FrozenSet[int]] = []
+    words: List[str] = []
+    i = 0
+    while i < len(tokens):
+        node = _TRIE
+        found, end = None, i
+        for j in range(i, len(tokens)):
+            node = node.get(tokens[j])
+            if node is None:
+                break
+            if None in node:
+                found, end = node[None], j + 1
+        if found is not None:
+            entries.append(found)
+            i = end
+        else:
+            words.append(tokens[i])
+            i += 1
+    return entries, words
+
+
+@lru_cache(maxsize=INGREDIENT_CACHE_SIZE)
+def canonical_ids(name: str) -> FrozenSet[int]:
+    """Ids of the vocabulary entries in an ingredient name, plus ids of its other words"""
+    entries, words = _match(ingredient_tokens(name))
+    found = set().union(*entries) if entries else set()
+    found.update(_word_id(word) for word in words if word not in DESCRIPTORS)
+    return frozenset(found)
+
+
+def ingredient_ids(ingredients: Iterable[Ingredient]) -> FrozenSet[int]:
+    """canonical_ids of every parsed ingredient's name and note, for a recipe"""
+    found: Set[int] = set()
+    for ingredient in ingredients:
+        found |= canonical_ids(ingredient.name)
+        if ingredient.note:
+            found |= canonical_ids(ingredient.note)
+    return frozenset(found)
+
+
+class IngredientExclusions:
+    """
+    Compiled exclusion list. ids match when any of them is in a recipe's
+    ingredient_ids; phrases (terms with words outside the vocabulary, such
+    as "ghost pepper") match when all of their ids are.
+    """
+
+    __slots__ = ("ids", "phrases")
+
+    def __init__(self, ids: FrozenSet[int] = frozenset(), phrases: Tuple[FrozenSet[int], ...] = ()):
+        self.ids = ids
+        self.phrases = phrases
+
+    def __bool__(self) -> bool:
+        return bool(self.ids or self.phrases)
+
+    def __repr__(self) -> str:
+        return f"IngredientExclusions(ids={len(self.ids)}, phrases={len(self.phrases)})"
+
+    def matches(self, recipe_ids: FrozenSet[int]) -> bool:
+        if not self.ids.isdisjoint(recipe_ids):
+            return True
+        return any(phrase <= recipe_ids for phrase in self.phrases)
+
+
+@lru_cache(maxsize=4096)
+def _term_exclusion(term: str) -> Tuple[FrozenSet[int], Optional[FrozenSet[int]]]:
+    """(ids any of which exclude, and an all-of phrase or None) for one user term"""
+    tokens = tuple(token for token in ingredient_tokens(term) if token not in DESCRIPTORS)
+    # Names the term is part of ("cream" in "sour cream") are excluded outright
+    found: Set[int] = set(_CONTAINING.get(tokens, ()))
+    entries, words = _match(tokens)
+    if words:
+        return frozenset(found), frozenset(set().union(*entries) | {_word_id(word) for word in words})
+    for entry in entries:
+        for entry_id in entry:
+            found |= _EXPANSIONS.get(entry_id, {entry_id})
+    return frozenset(found), None
+
+
+def compile_exclusions(terms: Iterable[str]) -> IngredientExclusions:
+    """IngredientExclusions for allergies and disliked ingredients ("prawns", "tree nuts, dairy")"""
+    ids: Set[int] = set()
+    phrases: List[FrozenSet[int]] = []
+    for term in terms:
+        for part in _SPLIT.split(str(term)):
+            if not part.strip():
+                continue
+            term_ids, phrase = _term_exclusion(part.strip().lower())
+            ids |= term_ids
+            if phrase and phrase not in phrases:
+                phrases.append(phrase)
+    return IngredientExclusions(frozenset(ids), tuple(phrases))
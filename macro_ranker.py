@@ -0,0 +1,132 @@
+"""
+Macro-based recipe ranking
+Prompts such as "high protein vegetarian dinner" or "low carb lunch under
+500 calories" are turned into MacroTargets, and a page of candidate recipes
+is scored against them in one vectorized NumPy pass over a (recipes x
+macros) matrix of per-serving values. Recipes without nutrition data keep
+a neutral score minus a small penalty, so recipes known to meet the targets
+score higher. recipe_ranker uses the scores as its macros signal.
+"""
+
+import os
+import re
+from dataclasses import dataclass, fields
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+
+# Per-serving targets implied by prompt phrases without explicit numbers
+HIGH_PROTEIN_GRAMS = float(os.environ.get("HIGH_PROTEIN_GRAMS", "25"))
+LOW_CALORIE_KCAL = float(os.environ.get("LOW_CALORIE_KCAL", "500"))
+LOW_CARB_GRAMS = float(os.environ.get("LOW_CARB_GRAMS", "30"))
+KETO_CARB_GRAMS = float(os.environ.get("KETO_CARB_GRAMS", "15"))
+LOW_FAT_GRAMS = float(os.environ.get("LOW_FAT_GRAMS", "10"))
+HIGH_FIBER_GRAMS = float(os.environ.get("HIGH_FIBER_GRAMS", "8"))
+# Score subtracted from recipes missing a macro that a target needs
+MISSING_MACRO_PENALTY = 0.25
+
+MACRO_COLUMNS = ("calories", "protein", "fat", "carbs", "fiber")
+
+_NUMBER = r"(\d+(?:\.\d+)?)"
+_PROTEIN_GRAMS = re.compile(rf"{_NUMBER}\s*(?:g|grams?)\s+(?:of\s+)?protein", re.I)
+_CALORIE_LIMIT = re.compile(
+    rf"(?:under|below|less than|at most|max(?:imum)?|<=?)\s*{_NUMBER}\s*(?:k?cals?|calories)"
+    rf"|{_NUMBER}\s*(?:k?cals?|calories)\s*(?:or (?:less|under|fewer)|max(?:imum)?)",
+    re.I,
+)
+_CARB_LIMIT = re.compile(
+    rf"(?:under|below|less than|at most|max(?:imum)?)\s*{_NUMBER}\s*(?:g|grams?)"
+    rf"\s+(?:of\s+)?(?:net\s+)?carbs?",
+    re.I,
+)
+_HIGH_PROTEIN = re.compile(r"\b(?:high|higher|lots of|extra)[- ]protein\b|\bprotein[- ](?:packed|rich|heavy)\b", re.I)
+_LOW_CALORIE = re.compile(r"\b(?:low|lower|reduced)[- ]cal(?:orie)?s?\b", re.I)
+_LOW_CARB = re.compile(r"\b(?:low|lower|no)[- ]carbs?\b", re.I)
+_KETO = re.compile(r"\bketo(?:genic)?\b", re.I)
+_LOW_FAT = re.compile(r"\b(?:low|lower|reduced)[- ]fat\b", re.I)
+_HIGH_FIBER = re.compile(r"\b(?:high|higher)[- ]fib(?:er|re)\b|\bfib(?:er|re)[- ]rich\b", re.I)
+
+
+@dataclass
+class MacroTargets:
+    """Per-serving goals; None means no preference"""
+
+    min_protein: Optional[float] = None
+    max_calories: Optional[float] = None
+    max_carbs: Optional[float] = None
+    max_fat: Optional[float] = None
+    min_fiber: Optional[float] = None
+
+    @property
+    def active(self) -> bool:
+        return any(getattr(self, f.name) is not None for f in fields(self))
+
+    def to_dict(self) -> Dict[str, float]:
+        return {f.name: getattr(self, f.name) for f in fields(self) if getattr(self, f.name) is not None}
+
+
+def _first_number(match: Optional[re.Match]) -> Optional[float]:
+    if not match:
+        return None
+    return next(float(group) for group in match.groups() if group is not None)
+
+
+def macro_targets(prompt: str, query_profile: Optional[Dict[str, Any]] = None) -> MacroTargets:
+    """
+    Targets from the prompt text, plus the diet_type from the extracted
+    intent (a keto diet implies a carb ceiling). Explicit numbers win over
+    the phrase defaults.
+    """
+    diet_type = str((query_profile or {}).get("diet_type") or "")
+    text = f"{prompt} {diet_type}"
+    targets = MacroTargets()
+
+    targets.min_protein = _first_number(_PROTEIN_GRAMS.search(text))
+    if targets.min_protein is None and _HIGH_PROTEIN.search(text):
+        targets.min_protein = HIGH_PROTEIN_GRAMS
+
+    targets.max_calories = _first_number(_CALORIE_LIMIT.search(text))
+    if targets.max_calories is None and _LOW_CALORIE.search(text):
+        targets.max_calories = LOW_CALORIE_KCAL
+
+    targets.max_carbs = _first_number(_CARB_LIMIT.search(text))
+    if targets.max_carbs is None:
+        if _KETO.search(text):
+            targets.max_carbs = KETO_CARB_GRAMS
+        elif _LOW_CARB.search(text):
+            targets.max_carbs = LOW_CARB_GRAMS
+
+    if _LOW_FAT.search(text):
+        targets.max_fat = LOW_FAT_GRAMS
+    if _HIGH_FIBER.search(text):
+        targets.min_fiber = HIGH_FIBER_GRAMS
+    return targets
+
+
+def macro_matrix(recipes: Sequence[Any]) -> np.ndarray:
+    """(len(recipes), len(MACRO_COLUMNS)) float matrix of per-serving macros, NaN where missing"""
+    rows = [[(recipe.get("macros") or {}).get(key) for key in MACRO_COLUMNS] for recipe in recipes]
+    # None becomes NaN under dtype=float
+    return np.array(rows, dtype=float).reshape(len(recipes), len(MACRO_COLUMNS))
+
+
+def macro_scores(matrix: np.ndarray, targets: MacroTargets) -> np.ndarray:
+    """
+    Score per row: each minimum contributes its fill ratio (capped at 1.5),
+    each ceiling subtracts the relative overshoot; missing macros a target
+    needs cost MISSING_MACRO_PENALTY
+    """
+    calories, protein, fat, carbs, fiber = matrix.T
+    minimums = [(protein, targets.min_protein), (fiber, targets.min_fiber)]
+    ceilings = [(calories, targets.max_calories), (carbs, targets.max_carbs), (fat, targets.max_fat)]
+
+    scores = np.zeros(len(matrix))
+    for values, target in minimums:
+        if target:
+            term = np.clip(values / target, 0.0, 1.5)
+            scores += np.where(np.isnan(values), -MISSING_MACRO_PENALTY, term)
+    for values, target in ceilings:
+        if target:
+            term = -np.maximum(values - target, 0.0) / target
+            scores += np.where(np.isnan(values), -MISSING_MACRO_PENALTY, term)
+    return scores
@@ -1,89 +1,349 @@
 """
 WSGI/ASGI compatible application wrapper
+
+app        - WSGI callable for WSGI hosts (gunicorn main:app). All requests in a
+             worker process share one event loop running in a background
+             thread; request and response bodies are streamed and the FastAPI
+             lifespan runs once per process.
+asgi_app   - the FastAPI app itself for native ASGI servers (uvicorn or
+             gunicorn with uvicorn workers). Preferred in production; see
+             gunicorn.conf.py and the README for worker settings.
 """
 
 import asyncio
-from typing import Any, Dict, List
+import atexit
+import logging
+import os
+import queue
+import threading
+from concurrent.futures import Future
+from http import HTTPStatus
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
 from agent_api import app as fastapi_app
 
+logger = logging.getLogger(__name__)
+
+WSGI_LIFESPAN_TIMEOUT = float(os.environ.get("WSGI_LIFESPAN_TIMEOUT_SECONDS", "30"))
+# Response chunks buffered between the event loop and the WSGI thread
+WSGI_RESPONSE_QUEUE_SIZE = int(os.environ.get("WSGI_RESPONSE_QUEUE_SIZE", "64"))
+WSGI_READ_CHUNK_BYTES = int(os.environ.get("WSGI_READ_CHUNK_BYTES", "65536"))
+
+_START = "start"
+_BODY = "body"
+_END = "end"
+_ERROR = "error"
+
+
+class _ResponseStream:
+    """
+    Hands response messages from the event loop to the WSGI thread.
+
+    Iterating yields body chunks as the app sends them. close() is called by
+    the WSGI server when the client goes away or the response is done; an
+    unfinished app call is cancelled.
+    """
+
+    def __init__(self, max_size: int = WSGI_RESPONSE_QUEUE_SIZE):
+        self._queue: "queue.Queue[Tuple[str, Any]]" = queue.Queue(max_size)
+        self.future: Optional[Future] = None
+        self.closed = False
+        self.finished = False
+
+    def put(self, item: Tuple[str, Any]) -> None:
+        # Blocks while the queue is full (backpressure), gives up once closed
+        while not self.closed:
+            try:
+                self._queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def try_put(self, item: Tuple[str, Any]) -> bool:
+        try:
+            self._queue.put_nowait(item)
+            return True
+        except queue.Full:
+            return False
+
+    def wait_start(self) -> Tuple[int, List[Tuple[bytes, bytes]]]:
+        kind, value = self._queue.get()
+        if kind == _START:
+            return value
+        if kind == _ERROR:
+            logger.error(f"ASGI app failed before starting a response: {value}")
+        else:
+            logger.error("ASGI app returned without starting a response")
+        self.finished = True
+        return 500, [(b"content-type", b"text/plain; charset=utf-8")]
+
+    def __iter__(self) -> Iterator[bytes]:
+        while not self.finished:
+            kind, value = self._queue.get()
+            if kind == _BODY:
+                yield value
+            else:
+                self.finished = True
+                if kind == _ERROR:
+                    logger.error(f"ASGI app failed while streaming a response: {value}")
+
+    def close(self) -> None:
+        self.closed = True
+        if not self.finished and self.future is not None:
+            self.future.cancel()
+        # Unblock a producer waiting on a full queue
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+
 
 class ASGItoWSGI:
-    def __init__(self, asgi_app):
-        self.asgi_app = asgi_app
+    """
+    Serve an ASGI app from a WSGI host.
 
-    def __call__(self, environ: Dict[str, Any], start_response):
-        # Create ASGI scope from WSGI environ
-        scope = {
-            "type": "http",
-            "method": environ["REQUEST_METHOD"],
-            "path": environ.get("PATH_INFO", "/"),
-            "query_string": environ.get("QUERY_STRING", "").encode(),
-            "headers": [
-                (key.lower().replace("_", "-").encode(), value.encode())
-                for key, value in environ.items()
-                if key.startswith("HTTP_")
-            ],
-        }
+    The event loop is created lazily in each worker process (so it is never
+    inherited across a fork) and runs in a daemon thread. WSGI threads submit
+    requests to it with run_coroutine_threadsafe and stream the response
+    back, so concurrent requests in a threaded worker run concurrently on
+    the loop.
+    """
 
-        # Add content-type and content-length headers
-        if "CONTENT_TYPE" in environ:
-            scope["headers"].append((b"content-type", environ["CONTENT_TYPE"].encode()))
-        if "CONTENT_LENGTH" in environ:
-            scope["headers"].append(
-                (b"content-length", environ["CONTENT_LENGTH"].encode())
-            )
+    def __init__(self, asgi_app, lifespan: bool = True):
+        self.asgi_app = asgi_app
+        self.lifespan = lifespan
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+        self._state: Dict[str, Any] = {}
+        self._lifespan_queue: Optional[asyncio.Queue] = None
+        self._lifespan_task: Optional[asyncio.Task] = None
+        self._startup_done: Optional[asyncio.Future] = None
+        self._shutdown_done: Optional[asyncio.Future] = None
 
-        response = {"status": 500, "headers": [], "body": b""}
+    # Loop and lifespan
 
-        async def receive():
-            # Read request body if present
+    def start(self) -> asyncio.AbstractEventLoop:
+        """Start the background loop and run lifespan startup (idempotent per process)"""
+        if self._loop is not None and self._pid == os.getpid():
+            return self._loop
+        with self._lock:
+            if self._loop is None or self._pid != os.getpid():
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(
+                    target=self._run_loop, args=(loop,), name="asgi-event-loop", daemon=True
+                )
+                thread.start()
+                if self.lifespan:
+                    try:
+                        asyncio.run_coroutine_threadsafe(self._startup(), loop).result(
+                            WSGI_LIFESPAN_TIMEOUT
+                        )
+                    except BaseException:
+                        loop.call_soon_threadsafe(loop.stop)
+                        thread.join(timeout=5)
+                        raise
+                self._loop, self._thread, self._pid = loop, thread, os.getpid()
+                atexit.register(self.close)
+                logger.info(f"Started ASGI event loop thread in process {self._pid}")
+        return self._loop
+
+    def close(self) -> None:
+        """Run lifespan shutdown and stop the loop thread"""
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            if loop is None or self._pid != os.getpid():
+                return
+            self._loop = None
+        if self.lifespan and self._lifespan_task is not None:
             try:
-                content_length = int(environ.get("CONTENT_LENGTH", 0))
-                if content_length > 0:
-                    body = environ["wsgi.input"].read(content_length)
-                    return {"type": "http.request", "body": body}
-                else:
-                    return {"type": "http.request", "body": b""}
-            except:
-                return {"type": "http.request", "body": b""}
+                asyncio.run_coroutine_threadsafe(self._shutdown(), loop).result(
+                    WSGI_LIFESPAN_TIMEOUT
+                )
+            except Exception as e:
+                logger.error(f"ASGI lifespan shutdown failed: {e}")
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout=WSGI_LIFESPAN_TIMEOUT)
 
-        async def send(message):
-            if message["type"] == "http.response.start":
-                response["status"] = message["status"]
-                response["headers"] = message.get("headers", [])
-            elif message["type"] == "http.response.body":
-                response["body"] += message.get("body", b"")
-
-        # Run the ASGI app
-        loop = asyncio.new_event_loop()
+    @staticmethod
+    def _run_loop(loop: asyncio.AbstractEventLoop) -> None:
         asyncio.set_event_loop(loop)
         try:
-            loop.run_until_complete(self.asgi_app(scope, receive, send))
+            loop.run_forever()
         finally:
             loop.close()
 
-        # Send WSGI response
-        status_line = (
-            f"{response['status']} {self._get_status_text(response['status'])}"
+    async def _startup(self) -> None:
+        loop = asyncio.get_running_loop()
+        self._lifespan_queue = asyncio.Queue()
+        self._startup_done = loop.create_future()
+        self._shutdown_done = loop.create_future()
+        scope = {"type": "lifespan", "asgi": {"version": "3.0"}, "state": self._state}
+        self._lifespan_task = asyncio.create_task(self._run_lifespan(scope))
+        await self._lifespan_queue.put({"type": "lifespan.startup"})
+        await self._startup_done
+
+    async def _shutdown(self) -> None:
+        await self._lifespan_queue.put({"type": "lifespan.shutdown"})
+        await self._shutdown_done
+
+    async def _run_lifespan(self, scope: Dict[str, Any]) -> None:
+        async def receive():
+            return await self._lifespan_queue.get()
+
+        async def send(message):
+            kind = message["type"]
+            if kind == "lifespan.startup.complete":
+                self._startup_done.set_result(True)
+            elif kind == "lifespan.startup.failed":
+                self._startup_done.set_exception(
+                    RuntimeError(f"Lifespan startup failed: {message.get('message', '')}")
+                )
+            elif kind == "lifespan.shutdown.complete":
+                self._shutdown_done.set_result(True)
+            elif kind == "lifespan.shutdown.failed":
+                self._shutdown_done.set_exception(
+                    RuntimeError(f"Lifespan shutdown failed: {message.get('message', '')}")
+                )
+
+        try:
+            await self.asgi_app(scope, receive, send)
+        except Exception as e:
+            # Apps without lifespan support raise on the unknown scope type
+            logger.warning(f"ASGI app lifespan raised: {e}")
+        finally:
+            for done in (self._startup_done, self._shutdown_done):
+                if not done.done():
+                    done.set_result(False)
+
+    # Requests
+
+    def __call__(self, environ: Dict[str, Any], start_response):
+        loop = self.start()
+        stream = _ResponseStream()
+        stream.future = asyncio.run_coroutine_threadsafe(
+            self._handle(self._build_scope(environ), environ, stream), loop
         )
+
+        status, headers = stream.wait_start()
+        start_response(
+            f"{status} {self._get_status_text(status)}",
+            [(name.decode("latin-1"), value.decode("latin-1")) for name, value in headers],
+        )
+        return stream
+
+    def _build_scope(self, environ: Dict[str, Any]) -> Dict[str, Any]:
         headers = [
-            (header[0].decode(), header[1].decode()) for header in response["headers"]
+            (key[5:].lower().replace("_", "-").encode("latin-1"), value.encode("latin-1"))
+            for key, value in environ.items()
+            if key.startswith("HTTP_")
         ]
+        if environ.get("CONTENT_TYPE"):
+            headers.append((b"content-type", environ["CONTENT_TYPE"].encode("latin-1")))
+        if environ.get("CONTENT_LENGTH"):
+            headers.append((b"content-length", environ["CONTENT_LENGTH"].encode("latin-1")))
 
-        start_response(status_line, headers)
-        return [response["body"]]
+        # PEP 3333 environ strings are latin-1 decoded bytes
+        raw_path = environ.get("PATH_INFO", "/").encode("latin-1")
+        server_port = environ.get("SERVER_PORT")
+        remote_port = environ.get("REMOTE_PORT")
+        return {
+            "type": "http",
+            "asgi": {"version": "3.0", "spec_version": "2.3"},
+            "http_version": environ.get("SERVER_PROTOCOL", "HTTP/1.1").split("/")[-1],
+            "method": environ["REQUEST_METHOD"],
+            "scheme": environ.get("wsgi.url_scheme", "http"),
+            "path": raw_path.decode("utf-8", "replace"),
+            "raw_path": raw_path,
+            "query_string": environ.get("QUERY_STRING", "").encode("latin-1"),
+            "root_path": environ.get("SCRIPT_NAME", ""),
+            "headers": headers,
+            "client": (environ.get("REMOTE_ADDR", ""), int(remote_port or 0)),
+            "server": (environ.get("SERVER_NAME", ""), int(server_port or 0)),
+            "state": dict(self._state),
+        }
+
+    async def _handle(
+        self, scope: Dict[str, Any], environ: Dict[str, Any], stream: _ResponseStream
+    ) -> None:
+        body = environ.get("wsgi.input")
+        try:
+            remaining: Optional[int] = int(environ.get("CONTENT_LENGTH") or 0)
+        except ValueError:
+            remaining = 0
+        if not remaining and environ.get("wsgi.input_terminated"):
+            remaining = None  # chunked upload: read until EOF
+        request_done = False
+        response_done = asyncio.Event()
+
+        async def receive():
+            nonlocal remaining, request_done
+            if request_done:
+                # Only reached by apps waiting for a disconnect
+                await response_done.wait()
+                return {"type": "http.disconnect"}
+            size = WSGI_READ_CHUNK_BYTES if remaining is None else min(remaining, WSGI_READ_CHUNK_BYTES)
+            chunk = b""
+            if body is not None and size > 0:
+                chunk = await asyncio.to_thread(body.read, size)
+            if remaining is not None:
+                remaining = remaining - len(chunk) if chunk else 0
+            more_body = bool(chunk) and (remaining is None or remaining > 0)
+            request_done = not more_body
+            return {"type": "http.request", "body": chunk, "more_body": more_body}
+
+        async def send(message):
+            kind = message["type"]
+            if kind == "http.response.start":
+                item = (_START, (message["status"], list(message.get("headers", []))))
+            elif kind == "http.response.body":
+                chunk = message.get("body", b"")
+                if chunk:
+                    await self._put(stream, (_BODY, chunk))
+                if message.get("more_body", False):
+                    return
+                item = (_END, None)
+            else:
+                return
+            await self._put(stream, item)
+
+        try:
+            await self.asgi_app(scope, receive, send)
+        except Exception as e:
+            await self._put(stream, (_ERROR, e))
+        else:
+            # No-op if the app already ended the response
+            stream.try_put((_END, None))
+        finally:
+            response_done.set()
+
+    @staticmethod
+    async def _put(stream: _ResponseStream, item: Tuple[str, Any]) -> None:
+        if not stream.try_put(item):
+            await asyncio.to_thread(stream.put, item)
 
     def _get_status_text(self, status_code: int) -> str:
-        status_texts = {
-            200: "OK",
-            201: "Created",
-            400: "Bad Request",
-            404: "Not Found",
-            422: "Unprocessable Entity",
-            500: "Internal Server Error",
-        }
-        return status_texts.get(status_code, "Unknown")
+        try:
+            return HTTPStatus(status_code).phrase
+        except ValueError:
+            return "Unknown"
 
 
 # Create WSGI-compatible app
 app = ASGItoWSGI(fastapi_app)
+
+# Native ASGI entry point: uvicorn main:asgi_app --workers N
+asgi_app = fastapi_app
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(
+        "main:asgi_app",
+        host=os.environ.get("HOST", "0.0.0.0"),
+        port=int(os.environ.get("PORT", "5000")),
+        workers=int(os.environ.get("WEB_CONCURRENCY", "1")),
+    )
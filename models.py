@@ -45,7 +45,10 @@ class IngredientModel(BaseModel):
 
     text: str
     quantity: Optional[float] = None
+    quantity_max: Optional[float] = None  # upper bound of ranges like "1-2"
     unit: Optional[str] = None
+    name: Optional[str] = None
+    note: Optional[str] = None
 
 
 class NutritionModel(BaseModel):
@@ -72,6 +75,7 @@ class FullRecipeModel(BaseModel):
     nutrition: Optional[NutritionModel] = None
     prep_time: Optional[int] = None  # minutes
     cook_time: Optional[int] = None  # minutes
+    total_time: Optional[int] = None  # minutes
     servings: Optional[int] = None
     difficulty: Optional[str] = None
     cuisine_type: Optional[str] = None
@@ -0,0 +1,77 @@
+"""
+schema.org nutrition parsing
+Turns a Recipe's NutritionInformation block ({"calories": "320 kcal",
+"proteinContent": "25 g", ...}) into the per-serving macros stored with
+each recipe, using the keys of models.NutritionModel: calories (kcal) and
+protein, fat, carbs, fiber, sugar (grams).
+"""
+
+import logging
+import re
+from functools import lru_cache
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# macros key -> schema.org NutritionInformation property
+NUTRITION_PROPERTIES = {
+    "calories": "calories",
+    "protein": "proteinContent",
+    "fat": "fatContent",
+    "carbs": "carbohydrateContent",
+    "fiber": "fiberContent",
+    "sugar": "sugarContent",
+}
+
+# The sign is captured so negative amounts are rejected rather than read as positive
+_AMOUNT = re.compile(r"(-?(?:\d[\d,]*(?:\.\d+)?|\.\d+))\s*([a-zμµ]*)", re.IGNORECASE)
+# Multipliers to grams, or to kcal for energy
+_UNIT_SCALE = {
+    "": 1.0,
+    "g": 1.0,
+    "gram": 1.0,
+    "grams": 1.0,
+    "mg": 0.001,
+    "mcg": 0.000001,
+    "µg": 0.000001,
+    "μg": 0.000001,
+    "kcal": 1.0,
+    "cal": 1.0,
+    "calorie": 1.0,
+    "calories": 1.0,
+    "kj": 1 / 4.184,
+}
+
+
+@lru_cache(maxsize=4096)
+def parse_amount(value: str) -> Optional[float]:
+    """Number in grams (or kcal) from "25 g", "1,200 kcal", "500mg" or "1339 kJ"; None if unparseable"""
+    match = _AMOUNT.search(value)
+    if not match:
+        return None
+    scale = _UNIT_SCALE.get(match.group(2).lower())
+    if scale is None:
+        return None
+    return round(float(match.group(1).replace(",", "")) * scale, 2)
+
+
+def parse_nutrition(nutrition: Any) -> Dict[str, float]:
+    """Macros from a schema.org nutrition block; keys with no usable value are omitted"""
+    if isinstance(nutrition, list):
+        nutrition = next((item for item in nutrition if isinstance(item, dict)), None)
+    if not isinstance(nutrition, dict):
+        return {}
+
+    macros = {}
+    for key, prop in NUTRITION_PROPERTIES.items():
+        value = nutrition.get(prop)
+        if isinstance(value, bool) or value is None:
+            continue
+        try:
+            amount = float(value) if isinstance(value, (int, float)) else parse_amount(str(value))
+        except (TypeError, ValueError) as e:
+            logger.warning(f"Error parsing nutrition {prop}={value!r}: {e}")
+            continue
+        if amount is not None and amount >= 0:
+            macros[key] = int(round(amount)) if key == "calories" else amount
+    return macros
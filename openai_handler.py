@@ -1,19 +1,13 @@
 """
 OpenAI handler for extracting recipe intent and keywords
 """
-from dotenv import load_dotenv; load_dotenv()
-import os
 import json
 import logging
-from openai import OpenAI
 from models import RecipeIntent
+from services import services
 
 logger = logging.getLogger(__name__)
 
-# Initialize OpenAI client
-OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
-openai_client = OpenAI(api_key=OPENAI_API_KEY)
-
 
 def extract_search_keywords(enriched_prompt: str) -> list[str]:
     """
@@ -22,7 +16,7 @@ def extract_search_keywords(enriched_prompt: str) -> list[str]:
     try:
         # the newest OpenAI model is "gpt-4o" which was released May 13, 2024.
         # do not change this unless explicitly requested by the user
-        response = openai_client.chat.completions.create(
+        response = services.openai.chat.completions.create(
             model="gpt-4o",
             messages=[
                 {
@@ -91,7 +85,7 @@ def extract_recipe_intent(prompt: str) -> RecipeIntent:
     try:
         # the newest OpenAI model is "gpt-4o" which was released May 13, 2024.
         # do not change this unless explicitly requested by the user
-        response = openai_client.chat.completions.create(
+        response = services.openai.chat.completions.create(
             model="gpt-4o",
             messages=[
                 {
@@ -0,0 +1,261 @@
+"""
+Direct Postgres backend for recipe_search bulk storage
+Talks to the Supabase Postgres database (or any Postgres) over psycopg with an
+async connection pool, loading rows with COPY inside a single transaction
+"""
+
+import asyncio
+import logging
+import os
+from typing import Any, Dict, List, Optional
+
+from psycopg.types.json import Jsonb
+from psycopg_pool import AsyncConnectionPool
+
+from recipe_catalog import CATALOG_COLUMNS, LINK_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+DATABASE_URL = os.environ.get("DATABASE_URL")
+PG_POOL_MIN_SIZE = int(os.environ.get("PG_POOL_MIN_SIZE", "1"))
+PG_POOL_MAX_SIZE = int(os.environ.get("PG_POOL_MAX_SIZE", "10"))
+PG_POOL_TIMEOUT = float(os.environ.get("PG_POOL_TIMEOUT_SECONDS", "10"))
+
+# Column order used for COPY; matches RecipeBulkStorage._format_recipe_for_insertion
+RECIPE_SEARCH_COLUMNS = (
+    "user_id",
+    "title",
+    "description",
+    "image_url",
+    "ingredients",
+    "parsed_ingredients",
+    "instructions",
+    "macros",
+    "servings",
+    "prep_time",
+    "cook_time",
+    "total_time",
+    "diet_tags",
+    "source_url",
+    "site_name",
+    "created_at",
+)
+JSON_COLUMNS = {"ingredients", "parsed_ingredients", "instructions", "macros", "diet_tags"}
+# Catalog columns a re-crawled recipe overwrites on conflict
+CATALOG_UPDATES = ", ".join(
+    f"{column} = EXCLUDED.{column}" for column in CATALOG_COLUMNS if column != "recipe_id"
+)
+
+# Schema for local Postgres instances used in tests and benchmarks
+RECIPE_SEARCH_DDL = """
+CREATE TABLE IF NOT EXISTS recipe_search (
+    id bigserial PRIMARY KEY,
+    user_id text NOT NULL,
+    title text,
+    description text,
+    image_url text,
+    ingredients jsonb,
+    parsed_ingredients jsonb,
+    instructions jsonb,
+    macros jsonb,
+    servings integer,
+    prep_time integer,
+    cook_time integer,
+    total_time integer,
+    diet_tags jsonb,
+    source_url text,
+    site_name text,
+    created_at timestamptz DEFAULT now()
+);
+CREATE INDEX IF NOT EXISTS recipe_search_user_id_idx ON recipe_search (user_id);
+"""
+# Normalized mode additionally needs sql/normalized_recipe_catalog.sql
+
+
+class PostgresRecipeStorage:
+    """
+    recipe_search storage over a psycopg async connection pool.
+
+    Replacing a user's search results is one transaction: a DELETE for the
+    user followed by a COPY of the new rows, so readers never see a user with
+    their old rows gone and new rows missing.
+    """
+
+    def __init__(
+        self,
+        dsn: Optional[str] = None,
+        min_size: int = PG_POOL_MIN_SIZE,
+        max_size: int = PG_POOL_MAX_SIZE,
+    ):
+        self.dsn = dsn or DATABASE_URL
+        if not self.dsn:
+            raise ValueError("DATABASE_URL environment variable must be set")
+        self.pool = AsyncConnectionPool(
+            self.dsn,
+            min_size=min_size,
+            max_size=max_size,
+            timeout=PG_POOL_TIMEOUT,
+            open=False,
+        )
+        self._opened = False
+        self._open_lock = asyncio.Lock()
+
+    async def open(self) -> None:
+        if self._opened:
+            return
+        async with self._open_lock:
+            if not self._opened:
+                await self.pool.open()
+                self._opened = True
+                logger.info(
+                    f"Opened Postgres pool (min={self.pool.min_size}, max={self.pool.max_size})"
+                )
+
+    async def close(self) -> None:
+        if self._opened:
+            await self.pool.close()
+            self._opened = False
+
+    async def ensure_schema(self) -> None:
+        """Create recipe_search if missing (local instances only)"""
+        await self.open()
+        async with self.pool.connection() as conn:
+            await conn.execute(RECIPE_SEARCH_DDL)
+
+    async def replace_user_recipes(self, user_id: str, rows: List[Dict[str, Any]]) -> int:
+        """Delete the user's previous rows and COPY the new ones in one transaction"""
+        return await self.replace_many({user_id: rows})
+
+    async def replace_many(self, rows_by_user: Dict[str, List[Dict[str, Any]]]) -> int:
+        """
+        Replace search results for many users at once: one DELETE over all
+        user_ids and one COPY of every row, committed together.
+        """
+        if not rows_by_user:
+            return 0
+        await self.open()
+        user_ids = list(rows_by_user)
+        rows = [row for user_rows in rows_by_user.values() for row in user_rows]
+
+        async with self.pool.connection() as conn:
+            async with conn.transaction():
+                await conn.execute(
+                    "DELETE FROM recipe_search WHERE user_id = ANY(%s)", (user_ids,)
+                )
+                if rows:
+                    await self._copy_rows(conn, rows)
+
+        logger.info(
+            f"Replaced recipe_search rows for {len(user_ids)} users ({len(rows)} rows) via COPY"
+        )
+        return len(rows)
+
+    async def copy_recipes(self, rows: List[Dict[str, Any]]) -> int:
+        """Append rows to recipe_search with COPY (no delete)"""
+        if not rows:
+            return 0
+        await self.open()
+        async with self.pool.connection() as conn:
+            async with conn.transaction():
+                await self._copy_rows(conn, rows)
+        return len(rows)
+
+    async def replace_many_normalized(
+        self,
+        catalog_rows: List[Dict[str, Any]],
+        links_by_user: Dict[str, List[Dict[str, Any]]],
+    ) -> int:
+        """
+        Normalized replace in one transaction: COPY catalog rows into a staging
+        table and upsert them into recipe_catalog (existing recipes take the
+        new values), then swap the users' (user_id, recipe_id, rank,
+        created_at) rows in recipe_search.
+        """
+        if not links_by_user:
+            return 0
+        await self.open()
+        user_ids = list(links_by_user)
+        links = [row for user_rows in links_by_user.values() for row in user_rows]
+        columns = ", ".join(CATALOG_COLUMNS)
+
+        async with self.pool.connection() as conn:
+            async with conn.transaction():
+                if catalog_rows:
+                    await conn.execute(
+                        "CREATE TEMP TABLE recipe_catalog_stage "
+                        "(LIKE recipe_catalog INCLUDING DEFAULTS) ON COMMIT DROP"
+                    )
+                    await self._copy_rows(
+                        conn, catalog_rows, "recipe_catalog_stage", CATALOG_COLUMNS
+                    )
+                    await conn.execute(
+                        f"INSERT INTO recipe_catalog ({columns}) "
+                        f"SELECT DISTINCT ON (recipe_id) {columns} FROM recipe_catalog_stage "
+                        f"ON CONFLICT (recipe_id) DO UPDATE SET {CATALOG_UPDATES}"
+                    )
+                await conn.execute(
+                    "DELETE FROM recipe_search WHERE user_id = ANY(%s)", (user_ids,)
+                )
+                if links:
+                    await self._copy_rows(conn, links, "recipe_search", LINK_COLUMNS)
+
+        logger.info(
+            f"Replaced normalized recipe_search rows for {len(user_ids)} users "
+            f"({len(links)} links, {len(catalog_rows)} catalog candidates)"
+        )
+        return len(links)
+
+    async def _copy_rows(
+        self,
+        conn,
+        rows: List[Dict[str, Any]],
+        table: str = "recipe_search",
+        columns: tuple = RECIPE_SEARCH_COLUMNS,
+    ) -> None:
+        column_list = ", ".join(columns)
+        async with conn.cursor() as cur:
+            async with cur.copy(f"COPY {table} ({column_list}) FROM STDIN") as copy:
+                for row in rows:
+                    await copy.write_row(_copy_values(row, columns))
+
+    async def fetch_user_recipes(self, user_id: str) -> List[Dict[str, Any]]:
+        await self.open()
+        async with self.pool.connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(
+                    "SELECT * FROM recipe_search WHERE user_id = %s", (user_id,)
+                )
+                columns = [column.name for column in cur.description]
+                return [dict(zip(columns, row)) for row in await cur.fetchall()]
+
+    async def count_user_recipes(self, user_id: str) -> int:
+        await self.open()
+        async with self.pool.connection() as conn:
+            cur = await conn.execute(
+                "SELECT count(*) FROM recipe_search WHERE user_id = %s", (user_id,)
+            )
+            row = await cur.fetchone()
+            return row[0] if row else 0
+
+
+def _copy_values(row: Dict[str, Any], columns: tuple = RECIPE_SEARCH_COLUMNS) -> tuple:
+    return tuple(
+        Jsonb(row.get(column)) if column in JSON_COLUMNS else row.get(column)
+        for column in columns
+    )
+
+
+_storage: Optional[PostgresRecipeStorage] = None
+
+
+def get_postgres_storage() -> PostgresRecipeStorage:
+    """Process-wide PostgresRecipeStorage, created on first use"""
+    global _storage
+    if _storage is None:
+        _storage = PostgresRecipeStorage()
+    return _storage
+
+
+async def close_postgres_storage() -> None:
+    if _storage is not None:
+        await _storage.close()
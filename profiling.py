@@ -0,0 +1,270 @@
+"""
+On-demand sampling profiler for live /agent requests
+A profiled request is sampled from a background thread every
+PROFILE_INTERVAL_MS: its own asyncio tasks (the request task and every task
+it creates) when they are running on the event loop, and executor threads
+while they run its asyncio.to_thread work. Stacks are written as folded
+text (flamegraph.pl, speedscope, inferno) to PROFILE_DIR, oldest files
+removed past PROFILE_MAX_BYTES. Requests are picked one in
+PROFILE_SAMPLE_EVERY, or by sending X-Profile: <PROFILE_TOKEN>; both can be
+changed at runtime through POST /profiling.
+"""
+
+import asyncio
+import asyncio.tasks
+import logging
+import os
+import secrets
+import sys
+import threading
+import time
+import weakref
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+PROFILE_ENABLED = os.environ.get("PROFILE_ENABLED", "false").lower() == "true"
+# Profile one in N requests; 0 profiles only requests carrying the header
+PROFILE_SAMPLE_EVERY = int(os.environ.get("PROFILE_SAMPLE_EVERY", "0"))
+# X-Profile header value that forces a profile; also required to toggle at runtime
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN", "")
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+PROFILE_MAX_BYTES = int(os.environ.get("PROFILE_MAX_BYTES", str(50 * 1024 * 1024)))
+PROFILE_INTERVAL_MS = float(os.environ.get("PROFILE_INTERVAL_MS", "5"))
+# Profiles per worker at once; further picks are skipped
+PROFILE_MAX_CONCURRENT = int(os.environ.get("PROFILE_MAX_CONCURRENT", "4"))
+
+# asyncio's own frames below the task being run; stacks start after these
+_LOOP_ROOTS = {("events.py", "_run"), ("thread.py", "run")}
+
+
+class ProfileSession:
+    def __init__(self, name: str):
+        self.name = name
+        self.id = f"{name}-{time.strftime('%Y%m%dT%H%M%S')}-{secrets.token_hex(4)}"
+        self.tasks: "weakref.WeakSet[asyncio.Task]" = weakref.WeakSet()
+        self.threads: Dict[int, int] = {}  # thread ident -> nesting depth
+        self.samples: Counter = Counter()
+        self.started = time.monotonic()
+        self.done = False
+
+
+_session: ContextVar[Optional[ProfileSession]] = ContextVar("profile_session", default=None)
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_qualname} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _folded_stack(frame) -> str:
+    labels: List[str] = []
+    while frame is not None:
+        code = frame.f_code
+        if (os.path.basename(code.co_filename), code.co_name) in _LOOP_ROOTS:
+            break
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+class ProfilingExecutor(ThreadPoolExecutor):
+    """Default executor that tells the profiler which thread runs a profiled request's work"""
+
+    def __init__(self, profiler: "SamplingProfiler", **kwargs):
+        super().__init__(**kwargs)
+        self._profiler = profiler
+
+    def submit(self, fn, /, *args, **kwargs):
+        session = _session.get()
+        if session is None:
+            return super().submit(fn, *args, **kwargs)
+        return super().submit(self._profiler.run_in_session, session, fn, *args, **kwargs)
+
+
+class SamplingProfiler:
+    def __init__(self):
+        self.enabled = PROFILE_ENABLED
+        self.sample_every = PROFILE_SAMPLE_EVERY
+        self.interval = PROFILE_INTERVAL_MS / 1000
+        self.directory = PROFILE_DIR
+        self.max_bytes = PROFILE_MAX_BYTES
+        self.profiled = 0
+        self.skipped = 0
+        self._requests = 0
+        self._sessions: List[ProfileSession] = []
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        self._sampler: Optional[threading.Thread] = None
+
+    def install(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Hook task creation and the default executor of the serving loop"""
+        self._loop = loop
+        self._loop_thread = threading.get_ident()
+        previous_factory = loop.get_task_factory()
+
+        def task_factory(loop, coro, **kwargs):
+            if previous_factory is not None:
+                task = previous_factory(loop, coro, **kwargs)
+            else:
+                task = asyncio.Task(coro, loop=loop, **kwargs)
+            # Runs in the creating task's context, so children join its session
+            session = _session.get()
+            if session is not None:
+                session.tasks.add(task)
+            return task
+
+        loop.set_task_factory(task_factory)
+        loop.set_default_executor(ProfilingExecutor(self, thread_name_prefix="asyncio"))
+
+    # Selection
+
+    def should_profile(self, header: Optional[str]) -> bool:
+        if not self.enabled or self._loop is None:
+            return False
+        if header and PROFILE_TOKEN and secrets.compare_digest(header, PROFILE_TOKEN):
+            return True
+        if self.sample_every <= 0:
+            return False
+        self._requests += 1
+        return self._requests % self.sample_every == 0
+
+    @contextmanager
+    def profile(self, name: str, header: Optional[str] = None):
+        """
+        Profile the body (and the tasks and threads it starts) when this
+        request is picked; yields the session, or None when not profiled
+        """
+        if _session.get() is not None or not self.should_profile(header):
+            yield None
+            return
+        with self._lock:
+            if len(self._sessions) >= PROFILE_MAX_CONCURRENT:
+                self.skipped += 1
+                session = None
+            else:
+                session = ProfileSession(name)
+                self._sessions.append(session)
+        if session is None:
+            yield None
+            return
+
+        task = asyncio.current_task()
+        if task is not None:
+            session.tasks.add(task)
+        token = _session.set(session)
+        self._ensure_sampler()
+        try:
+            yield session
+        finally:
+            _session.reset(token)
+            # The sampler thread writes the profile and drops the session
+            session.done = True
+
+    def run_in_session(self, session: ProfileSession, fn, *args, **kwargs):
+        ident = threading.get_ident()
+        session.threads[ident] = session.threads.get(ident, 0) + 1
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            depth = session.threads.pop(ident, 1) - 1
+            if depth > 0:
+                session.threads[ident] = depth
+
+    # Sampling
+
+    def _ensure_sampler(self) -> None:
+        with self._lock:
+            if self._sampler is None or not self._sampler.is_alive():
+                self._sampler = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+                self._sampler.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                sessions = list(self._sessions)
+                if not sessions:
+                    self._sampler = None
+                    return
+            self._sample(sessions)
+            for session in sessions:
+                if session.done:
+                    self._finish(session)
+            time.sleep(self.interval)
+
+    def _sample(self, sessions: List[ProfileSession]) -> None:
+        frames = sys._current_frames()
+        current = asyncio.tasks._current_tasks.get(self._loop)
+        loop_frame = frames.get(self._loop_thread)
+        for session in sessions:
+            if current is not None and loop_frame is not None and current in session.tasks:
+                session.samples[_folded_stack(loop_frame)] += 1
+            for ident in list(session.threads):
+                frame = frames.get(ident)
+                if frame is not None:
+                    session.samples[f"[thread];{_folded_stack(frame)}"] += 1
+
+    def _finish(self, session: ProfileSession) -> None:
+        with self._lock:
+            self._sessions.remove(session)
+        self.profiled += 1
+        try:
+            self._write(session)
+        except OSError as e:
+            logger.warning(f"Failed to write profile {session.id}: {e}")
+
+    def _write(self, session: ProfileSession) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{session.id}.folded")
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in session.samples.most_common():
+                f.write(f"{session.name};{stack} {count}\n")
+        elapsed_ms = (time.monotonic() - session.started) * 1000
+        logger.info(
+            f"Wrote profile {path}: {sum(session.samples.values())} samples over {elapsed_ms:.0f}ms"
+        )
+        self._rotate()
+
+    def _rotate(self) -> None:
+        """Delete the oldest profiles until the directory fits in max_bytes, keeping the newest"""
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".folded"):
+                stat = os.stat(os.path.join(self.directory, name))
+                entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries)[:-1]:
+            if total <= self.max_bytes:
+                break
+            os.remove(os.path.join(self.directory, name))
+            total -= size
+
+    # Runtime control
+
+    def configure(self, enabled: Optional[bool] = None, sample_every: Optional[int] = None) -> None:
+        if enabled is not None:
+            self.enabled = enabled
+        if sample_every is not None:
+            self.sample_every = max(0, sample_every)
+        logger.info(f"Profiling {'enabled' if self.enabled else 'disabled'}, one in {self.sample_every}")
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "sample_every": self.sample_every,
+            "header_trigger": bool(PROFILE_TOKEN),
+            "interval_ms": self.interval * 1000,
+            "directory": self.directory,
+            "max_bytes": self.max_bytes,
+            "active": len(self._sessions),
+            "profiled": self.profiled,
+            "skipped": self.skipped,
+        }
+
+
+profiler = SamplingProfiler()
@@ -5,30 +5,58 @@ Handles bulk insertion of recipes into recipe_search table with user cleanup
 
 import logging
 import os
-from typing import List, Dict, Any
+from typing import TYPE_CHECKING, List, Dict, Any, Optional
 from datetime import datetime
-from supabase import create_client, Client
+from data_access import db
+from repository import RecipeRepository, get_repository
+from write_behind import write_queue, WriteOp
+from ingredient_parser import ingredient_rows
+from diet_classifier import recipe_diet_tags
+from recipe_catalog import (
+    build_normalized_rows,
+    known_catalog_ids,
+    normalized_mode,
+    store_normalized,
+)
+
+if TYPE_CHECKING:
+    from supabase import Client
 
 logger = logging.getLogger(__name__)
 
+# "supabase" (REST via supabase-py) or "postgres" (direct psycopg + COPY)
+RECIPE_STORAGE_BACKEND = os.environ.get("RECIPE_STORAGE_BACKEND", "supabase")
+
 
 class RecipeBulkStorage:
     """Handles bulk recipe insertion with user cleanup for Task 5"""
 
-    def __init__(self):
-        self.supabase = self._get_supabase_service_client()
+    def __init__(
+        self,
+        backend: Optional[str] = None,
+        repository: Optional[RecipeRepository] = None,
+    ):
+        self.backend = (backend or RECIPE_STORAGE_BACKEND).lower()
+        self.postgres = None
+        self._repository = repository
 
-    def _get_supabase_service_client(self) -> Client:
-        """Initialize Supabase client with service role key for bypassing RLS"""
-        url = os.environ.get("SUPABASE_URL")
-        service_key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
+        if self.backend == "postgres":
+            # Imported here so psycopg is only required for this backend
+            from postgres_storage import get_postgres_storage
 
-        if not url or not service_key:
-            raise ValueError(
-                "SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY environment variables must be set"
-            )
+            self.postgres = get_postgres_storage()
+
+    @property
+    def repository(self) -> RecipeRepository:
+        return self._repository or get_repository()
 
-        return create_client(url, service_key)
+    @property
+    def supabase(self) -> "Client":
+        return self._get_supabase_service_client()
+
+    def _get_supabase_service_client(self) -> "Client":
+        """Shared Supabase client with service role key for bypassing RLS"""
+        return db.service
 
     async def insert_recipes_bulk(
         self, recipes_data: List[Dict[str, Any]], user_id: str
@@ -37,76 +65,133 @@ class RecipeBulkStorage:
         Task 5: Insert up to 10 valid recipes into recipe_search table
 
         Steps:
-        1. Delete previous rows for the user_id
-        2. Bulk insert new recipes with all required fields
-        3. Return count of successfully inserted recipes
+        1. Format new recipes with all required fields
+        2. Delete previous rows for the user_id
+        3. Bulk insert the new rows
+
+        Steps 2 and 3 are handed to the write-behind queue when it is running,
+        so the database round trips happen after the response is sent.
 
         Args:
             recipes_data: List of recipe dictionaries from Task 4 crawler
             user_id: User ID for the recipes
 
         Returns:
-            Number of successfully inserted recipes
+            Number of recipes inserted (or accepted for insertion)
         """
         try:
-            # Step 1: Delete previous rows for this user_id
-            await self._delete_user_previous_searches(user_id)
-
-            # Step 2: Prepare recipes for bulk insertion (max 10)
-            recipes_to_insert = recipes_data[:10]  # Limit to 10 as specified
-
-            if not recipes_to_insert:
-                logger.warning(f"No recipes to insert for user {user_id}")
-                return 0
-
-            # Step 3: Format recipes for recipe_search table
-            formatted_recipes = []
+            # Step 1: Prepare recipes for bulk insertion (max 10)
             current_time = datetime.utcnow().isoformat()
-
-            for recipe in recipes_to_insert:
-                formatted_recipe = self._format_recipe_for_insertion(
-                    recipe, user_id, current_time
-                )
-                if formatted_recipe:
-                    formatted_recipes.append(formatted_recipe)
+            formatted_recipes = self._format_recipes(recipes_data, user_id, current_time)
 
             if not formatted_recipes:
                 logger.warning(f"No valid recipes to insert for user {user_id}")
-                return 0
 
-            # Step 4: Bulk insert recipes
-            response = (
-                self.supabase.table("recipe_search").insert(formatted_recipes).execute()
+            # Steps 2 and 3: Replace the user's previous rows
+            inserted_count = await self._replace_user_rows(
+                {user_id: formatted_recipes}, current_time
             )
-
-            inserted_count = len(response.data) if response.data else 0
             logger.info(
                 f"Successfully bulk inserted {inserted_count} recipes for user {user_id}"
             )
-
             return inserted_count
 
         except Exception as e:
             logger.error(f"Error in bulk recipe insertion for user {user_id}: {e}")
             return 0
 
-    async def _delete_user_previous_searches(self, user_id: str) -> None:
-        """Delete previous recipe_search rows for the user to keep only latest search"""
+    async def insert_recipes_bulk_many(
+        self, recipes_by_user: Dict[str, List[Dict[str, Any]]]
+    ) -> int:
+        """
+        Replace recipe_search rows for many users in one call, for
+        catalog-scale ingestion. On the postgres backend this is a single
+        DELETE plus one COPY in one transaction.
+
+        Returns:
+            Total number of rows inserted (or accepted for insertion)
+        """
         try:
-            response = (
-                self.supabase.table("recipe_search")
-                .delete()
-                .eq("user_id", user_id)
-                .execute()
+            current_time = datetime.utcnow().isoformat()
+            formatted_by_user = {
+                user_id: self._format_recipes(recipes, user_id, current_time)
+                for user_id, recipes in recipes_by_user.items()
+            }
+            return await self._replace_user_rows(formatted_by_user, current_time)
+        except Exception as e:
+            logger.error(f"Error in bulk recipe ingestion for {len(recipes_by_user)} users: {e}")
+            return 0
+
+    def _format_recipes(
+        self, recipes: List[Dict[str, Any]], user_id: str, created_at: str
+    ) -> List[Dict[str, Any]]:
+        formatted_recipes = []
+        for recipe in recipes[:10]:  # Limit to 10 as specified
+            formatted_recipe = self._format_recipe_for_insertion(recipe, user_id, created_at)
+            if formatted_recipe:
+                formatted_recipes.append(formatted_recipe)
+        return formatted_recipes
+
+    async def _replace_user_rows(
+        self, formatted_by_user: Dict[str, List[Dict[str, Any]]], created_at: str
+    ) -> int:
+        """
+        Delete each user's previous rows and write the new ones, using the
+        configured backend and storage mode. Returns rows written or queued.
+        """
+        if normalized_mode():
+            return await self._replace_user_rows_normalized(formatted_by_user, created_at)
+
+        if self.postgres is not None:
+            # Delete + COPY in a single transaction
+            return await self.postgres.replace_many(formatted_by_user)
+
+        total = 0
+        for user_id, formatted in formatted_by_user.items():
+            op = WriteOp("replace", "recipe_search", formatted, user_id=user_id)
+            if write_queue.submit(op):
+                logger.info(f"Queued {len(formatted)} recipes for bulk insert for user {user_id}")
+                total += len(formatted)
+                continue
+
+            total += await self.repository.replace_user_rows(
+                "recipe_search", [user_id], formatted
             )
+        return total
 
-            deleted_count = len(response.data) if response.data else 0
-            if deleted_count > 0:
-                logger.info(
-                    f"Deleted {deleted_count} previous recipe searches for user {user_id}"
-                )
-            else:
-                logger.info(f"No previous recipe searches found for user {user_id}")
+    async def _replace_user_rows_normalized(
+        self, formatted_by_user: Dict[str, List[Dict[str, Any]]], created_at: str
+    ) -> int:
+        """Upsert recipes once into recipe_catalog and store only link rows per user"""
+        catalog_by_user = {}
+        links_by_user = {}
+        for user_id, formatted in formatted_by_user.items():
+            catalog_by_user[user_id], links_by_user[user_id] = build_normalized_rows(
+                formatted, user_id, created_at
+            )
+
+        if self.postgres is not None:
+            catalog_rows = known_catalog_ids.filter_new(
+                [row for rows in catalog_by_user.values() for row in rows]
+            )
+            count = await self.postgres.replace_many_normalized(catalog_rows, links_by_user)
+            known_catalog_ids.add_rows(catalog_rows)
+            return count
+
+        total = 0
+        for user_id, links in links_by_user.items():
+            await store_normalized(
+                catalog_by_user[user_id],
+                WriteOp("replace", "recipe_search", links, user_id=user_id),
+            )
+            total += len(links)
+        return total
+
+    async def _delete_user_previous_searches(self, user_id: str) -> None:
+        """Delete previous recipe_search rows for the user to keep only latest search"""
+        try:
+            await self.repository.replace_user_rows("recipe_search", [user_id], [])
+            logger.info(f"Deleted previous recipe searches for user {user_id}")
 
         except Exception as e:
             logger.error(f"Error deleting previous searches for user {user_id}: {e}")
@@ -119,7 +204,9 @@ class RecipeBulkStorage:
         Format recipe data for recipe_search table insertion
 
         Required fields: user_id, title, description, image_url, ingredients,
-                        instructions, macros, servings, source_url, site_name, created_at
+                        parsed_ingredients, instructions, macros, servings,
+                        prep_time, cook_time, total_time, diet_tags,
+                        source_url, site_name, created_at
         """
         try:
             formatted = {
@@ -128,9 +215,14 @@ class RecipeBulkStorage:
                 "description": recipe.get("description", "").strip(),
                 "image_url": recipe.get("image_url", "").strip(),
                 "ingredients": recipe.get("ingredients", []),
+                "parsed_ingredients": ingredient_rows(recipe),
                 "instructions": recipe.get("instructions", []),
                 "macros": recipe.get("macros", {}),
                 "servings": recipe.get("servings"),
+                "prep_time": recipe.get("prep_time"),
+                "cook_time": recipe.get("cook_time"),
+                "total_time": recipe.get("total_time"),
+                "diet_tags": recipe_diet_tags(recipe),
                 "source_url": recipe.get("source_url", "").strip(),
                 "site_name": recipe.get("site_name", "").strip(),
                 "created_at": created_at,
@@ -159,13 +251,9 @@ class RecipeBulkStorage:
     async def get_user_recipe_searches(self, user_id: str) -> List[Dict[str, Any]]:
         """Get all recipe searches for a user (for testing purposes)"""
         try:
-            response = (
-                self.supabase.table("recipe_search")
-                .select("*")
-                .eq("user_id", user_id)
-                .execute()
-            )
-            return response.data if response.data else []
+            if self.postgres is not None:
+                return await self.postgres.fetch_user_recipes(user_id)
+            return await self.repository.get_recipe_searches(user_id)
         except Exception as e:
             logger.error(f"Error fetching recipe searches for user {user_id}: {e}")
             return []
@@ -173,13 +261,9 @@ class RecipeBulkStorage:
     async def get_recipe_search_count(self, user_id: str) -> int:
         """Get count of recipe searches for a user"""
         try:
-            response = (
-                self.supabase.table("recipe_search")
-                .select("id", count="exact")
-                .eq("user_id", user_id)
-                .execute()
-            )
-            return response.count if hasattr(response, "count") else 0
+            if self.postgres is not None:
+                return await self.postgres.count_user_recipes(user_id)
+            return await self.repository.count_recipe_searches(user_id)
         except Exception as e:
             logger.error(f"Error counting recipe searches for user {user_id}: {e}")
             return 0
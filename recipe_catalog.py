@@ -0,0 +1,168 @@
+"""
+Normalized recipe storage
+Full recipes live once in recipe_catalog keyed by a hash of their canonical
+URL; recipe_search only holds lightweight (user_id, recipe_id, rank,
+created_at) rows pointing at them. Schema: sql/normalized_recipe_catalog.sql
+"""
+
+import hashlib
+import logging
+import os
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Tuple
+
+from diet_classifier import recipe_diet_tags
+from ingredient_parser import ingredient_rows
+from url_filter import canonicalize_url
+from write_behind import write_queue, WriteOp
+
+logger = logging.getLogger(__name__)
+
+# "denormalized" (full recipe copied per user row) or "normalized" (catalog + links)
+RECIPE_STORAGE_MODE = os.environ.get("RECIPE_STORAGE_MODE", "denormalized").lower()
+# How many catalog ids to remember as already stored in this process
+CATALOG_KNOWN_IDS_SIZE = int(os.environ.get("CATALOG_KNOWN_IDS_SIZE", "50000"))
+
+CATALOG_COLUMNS = (
+    "recipe_id",
+    "canonical_url",
+    "source_url",
+    "title",
+    "description",
+    "image_url",
+    "ingredients",
+    "parsed_ingredients",
+    "instructions",
+    "macros",
+    "servings",
+    "prep_time",
+    "cook_time",
+    "total_time",
+    "diet_tags",
+    "site_name",
+)
+LINK_COLUMNS = ("user_id", "recipe_id", "rank", "created_at")
+
+
+def normalized_mode() -> bool:
+    return RECIPE_STORAGE_MODE == "normalized"
+
+
+def catalog_recipe_id(source_url: str) -> str:
+    """Stable recipe id: first 128 bits of sha256 over the canonical URL"""
+    return hashlib.sha256(canonicalize_url(source_url).encode("utf-8")).hexdigest()[:32]
+
+
+def catalog_row(recipe: Dict[str, Any]) -> Dict[str, Any]:
+    source_url = (recipe.get("source_url") or "").strip()
+    return {
+        "recipe_id": catalog_recipe_id(source_url),
+        "canonical_url": canonicalize_url(source_url),
+        "source_url": source_url,
+        "title": (recipe.get("title") or "").strip(),
+        "description": (recipe.get("description") or "").strip(),
+        "image_url": (recipe.get("image_url") or "").strip(),
+        "ingredients": recipe.get("ingredients", []),
+        "parsed_ingredients": ingredient_rows(recipe),
+        "instructions": recipe.get("instructions", []),
+        "macros": recipe.get("macros", {}),
+        "servings": recipe.get("servings"),
+        "prep_time": recipe.get("prep_time"),
+        "cook_time": recipe.get("cook_time"),
+        "total_time": recipe.get("total_time"),
+        "diet_tags": recipe_diet_tags(recipe),
+        "site_name": (recipe.get("site_name") or "").strip(),
+    }
+
+
+def build_normalized_rows(
+    recipes: Iterable[Dict[str, Any]], user_id: str, created_at: str
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Split formatted recipes into catalog rows and the user's link rows.
+    Rank is the 1-based position in the result list.
+    """
+    catalog_rows = []
+    link_rows = []
+    seen = set()
+    for recipe in recipes:
+        row = catalog_row(recipe)
+        if not row["title"] or not row["source_url"]:
+            continue
+        recipe_id = row["recipe_id"]
+        if recipe_id in seen:
+            continue
+        seen.add(recipe_id)
+        catalog_rows.append(row)
+        link_rows.append(
+            {
+                "user_id": user_id,
+                "recipe_id": recipe_id,
+                "rank": len(link_rows) + 1,
+                "created_at": created_at,
+            }
+        )
+    return catalog_rows, link_rows
+
+
+class KnownCatalogIds:
+    """
+    LRU of recipe_ids this process has already written to recipe_catalog,
+    so popular recipes are upserted once rather than on every search
+    """
+
+    def __init__(self, max_size: int = CATALOG_KNOWN_IDS_SIZE):
+        self.max_size = max_size
+        self._ids: "OrderedDict[str, None]" = OrderedDict()
+
+    def __contains__(self, recipe_id: str) -> bool:
+        if recipe_id in self._ids:
+            self._ids.move_to_end(recipe_id)
+            return True
+        return False
+
+    def filter_new(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return [row for row in rows if row["recipe_id"] not in self]
+
+    def add_rows(self, rows: List[Dict[str, Any]]) -> None:
+        for row in rows:
+            self._ids[row["recipe_id"]] = None
+            self._ids.move_to_end(row["recipe_id"])
+        while len(self._ids) > self.max_size:
+            self._ids.popitem(last=False)
+
+
+known_catalog_ids = KnownCatalogIds()
+
+
+async def store_normalized(catalog_rows: List[Dict[str, Any]], link_op: WriteOp) -> bool:
+    """
+    Write catalog rows not yet known to this process, then the link op.
+
+    Both go through the write-behind queue when possible; the queue flushes
+    catalog upserts before link writes and drops the links to catalog rows
+    whose upsert failed. If the link op can't be queued both are written
+    inline, catalog first, so links never point at a missing recipe.
+    Returns True when the writes were queued.
+    """
+    new_rows = known_catalog_ids.filter_new(catalog_rows)
+    upsert_op = WriteOp(
+        "upsert",
+        "recipe_catalog",
+        new_rows,
+        on_conflict="recipe_id",
+        on_success=lambda: known_catalog_ids.add_rows(new_rows),
+    )
+    if new_rows:
+        link_op.requires = upsert_op
+
+    catalog_queued = not new_rows or write_queue.submit(upsert_op)
+    if catalog_queued and write_queue.submit(link_op):
+        return True
+
+    if new_rows:
+        # Re-upserting after a queued upsert is harmless: it rewrites the same row.
+        # If this raises, the link op is not written either
+        await write_queue.apply_now(upsert_op)
+    await write_queue.apply_now(link_op)
+    return False
@@ -1,15 +1,159 @@
 import asyncio
+import hashlib
 import logging
+import os
 import re
 import json
-from typing import List, Dict, Optional, Any
+import time
+from dataclasses import dataclass, field
+from typing import Callable, List, Dict, Optional, Any, Set, Tuple, Union
 import httpx
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin, urlparse
-from supabase_sources import get_active_recipe_sources, build_search_urls
+from supabase_sources import (
+    DEFAULT_SOURCE_CONCURRENCY,
+    build_search_urls,
+    get_active_recipe_sources,
+    search_query_key,
+    source_host,
+    source_registry,
+)
+from url_filter import RecipeUrlFilter, canonicalize_url
+from diet_classifier import diet_tags
+from durations import recipe_times
+from ingredient_parser import parse_ingredients
+from ingredient_vocabulary import IngredientExclusions, compile_exclusions, ingredient_ids
+from nutrition import parse_nutrition
+from recipe_record import Recipe
+from metrics import (
+    RECIPE_EXTRACTIONS,
+    SOURCE_BYTES,
+    SOURCE_CACHE_HITS,
+    SOURCE_FETCHES,
+    observe_stage,
+    time_stage,
+)
+from tracing import traced
 
 logger = logging.getLogger(__name__)
 
+# Validated candidates fetched per page (per query in a batch) before ranking
+# picks the page; 0 keeps the old fetch cost: one page's worth, or one
+# recipe per site in a batch
+CANDIDATE_POOL_SIZE = int(os.environ.get("CANDIDATE_POOL_SIZE", "0"))
+
+# Orders a candidate pool best-first (agent_api.rank_matches bound to a query)
+Ranker = Callable[[List[Recipe]], List[Recipe]]
+
+
+def source_label(url: str) -> str:
+    """Metrics label for the source owning url (bounded to known sources)"""
+    source = source_registry.get_source(url)
+    return source.site_name if source else "other"
+
+
+def frontier_url_key(url: str) -> str:
+    """Short stable id for a recipe URL, kept in the frontier's seen set"""
+    return hashlib.blake2b(canonicalize_url(url).encode("utf-8"), digest_size=8).hexdigest()
+
+
+@dataclass
+class SiteFrontier:
+    """Crawl position within one source's search results"""
+
+    search_url: str
+    # Candidates consumed so far from this search page
+    offset: int = 0
+    # Candidate recipe URLs not yet visited; None until the search page is fetched
+    remaining: Optional[List[str]] = None
+
+    @property
+    def has_more(self) -> bool:
+        return self.remaining is None or bool(self.remaining)
+
+
+@dataclass
+class CrawlFrontier:
+    """Everything needed to resume a crawl where the previous page stopped"""
+
+    prompt: str
+    disliked_ingredients: List[str]
+    lanes: List[SiteFrontier]
+    seen: Set[str] = field(default_factory=set)
+    # Recipes whose total time is known to exceed this are dropped at extraction
+    max_minutes: Optional[float] = None
+    # Recipes whose ingredients break this diet (a DIET_RULES key) are dropped
+    diet_type: Optional[str] = None
+    # Extracted intent the caller ranks with, so resumed pages rank the same way
+    query_profile: Dict[str, Any] = field(default_factory=dict)
+
+    @classmethod
+    def new(
+        cls,
+        prompt: str,
+        disliked_ingredients: List[str],
+        search_urls: List[str],
+        max_minutes: Optional[float] = None,
+        diet_type: Optional[str] = None,
+        query_profile: Optional[Dict[str, Any]] = None,
+    ) -> "CrawlFrontier":
+        return cls(
+            prompt,
+            list(disliked_ingredients or []),
+            [SiteFrontier(url) for url in search_urls],
+            max_minutes=max_minutes,
+            diet_type=diet_type,
+            query_profile=dict(query_profile or {}),
+        )
+
+    @property
+    def has_more(self) -> bool:
+        return any(lane.has_more for lane in self.lanes)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "prompt": self.prompt,
+            "disliked_ingredients": self.disliked_ingredients,
+            "lanes": [
+                {"search_url": lane.search_url, "offset": lane.offset, "remaining": lane.remaining}
+                for lane in self.lanes
+            ],
+            "seen": sorted(self.seen),
+            "max_minutes": self.max_minutes,
+            "diet_type": self.diet_type,
+            "query_profile": self.query_profile,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "CrawlFrontier":
+        return cls(
+            prompt=data["prompt"],
+            disliked_ingredients=list(data.get("disliked_ingredients") or []),
+            lanes=[
+                SiteFrontier(lane["search_url"], int(lane.get("offset", 0)), lane.get("remaining"))
+                for lane in data.get("lanes", [])
+            ],
+            seen=set(data.get("seen", [])),
+            max_minutes=data.get("max_minutes"),
+            diet_type=data.get("diet_type"),
+            query_profile=dict(data.get("query_profile") or {}),
+        )
+
+
+def _fits_diet(recipe: Recipe, diet_type: Optional[str]) -> bool:
+    # diet_tags are computed once at extraction, so this is a list lookup
+    return not diet_type or diet_type in recipe.diet_tags
+
+
+def _excluded(recipe: Recipe, exclusions: IngredientExclusions) -> bool:
+    # Both sides are canonicalized up front, so this is a set intersection
+    return bool(exclusions) and exclusions.matches(recipe.ingredient_ids)
+
+
+def _over_time(total_time: Optional[int], max_minutes: Optional[float]) -> bool:
+    # Recipes that state no time are kept: they may still qualify
+    return max_minutes is not None and total_time is not None and total_time > max_minutes
+
 
 class RecipeCrawler:
     def __init__(self):
@@ -24,92 +168,392 @@ class RecipeCrawler:
                 "Connection": "keep-alive",
             },
         )
-
-    async def crawl_and_scrape_recipes(self, enriched_prompt: str, disliked_ingredients: List[str], max_recipes: int = 10) -> List[Dict[str, Any]]:
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    async def crawl_and_scrape_recipes(self, enriched_prompt: str, disliked_ingredients: List[str], max_recipes: int = 10, url_filter: Optional[RecipeUrlFilter] = None) -> List[Recipe]:
+        recipes, _ = await self.start_crawl(enriched_prompt, disliked_ingredients, max_recipes, url_filter)
+        return recipes
+
+    async def start_crawl(
+        self,
+        enriched_prompt: str,
+        disliked_ingredients: List[str],
+        page_size: int = 10,
+        url_filter: Optional[RecipeUrlFilter] = None,
+        rank: Optional[Ranker] = None,
+        max_minutes: Optional[float] = None,
+        diet_type: Optional[str] = None,
+        query_profile: Optional[Dict[str, Any]] = None,
+    ) -> Tuple[List[Recipe], Optional[Dict[str, Any]]]:
+        """
+        First page of results plus the crawl frontier to resume from
+        (None when every site is exhausted). See crawl_page for ordering.
+        With max_minutes, recipes known to take longer are skipped, and with
+        diet_type, recipes whose ingredients break the diet, on this and
+        every resumed page. query_profile is kept in the frontier for the
+        caller to rank resumed pages with.
+        """
         try:
-            sources = await get_active_recipe_sources()
+            with time_stage("sources"):
+                sources = await get_active_recipe_sources()
             if not sources:
                 logger.warning("No active recipe sources found")
-                return []
+                return [], None
 
             search_urls = build_search_urls(enriched_prompt, sources)
             if not search_urls:
                 logger.warning("No search URLs generated")
-                return []
+                return [], None
 
             logger.info(f"Generated {len(search_urls)} search URLs for crawling")
-            recipes_by_site = {}
-
-            for search_url in search_urls:
-                urls = await self._find_recipe_urls_from_search(search_url)
-                parsed_site = urlparse(search_url).netloc.replace("www.", "").split(".")[0].lower()
-
-                for url in urls:
-                    recipe = await self._scrape_recipe(url)
-                    if (
-                        recipe
-                        and recipe["ingredients"]
-                        and recipe["instructions"]
-                        and not self._contains_disliked_ingredients(recipe["ingredients"], disliked_ingredients)
-                        and parsed_site not in recipes_by_site
-                    ):
-                        recipes_by_site[parsed_site] = recipe
-                        break
-
-            recipes = list(recipes_by_site.values())[:max_recipes]
-            logger.info(f"Successfully scraped {len(recipes)} recipes")
-            return recipes
+            frontier = CrawlFrontier.new(
+                enriched_prompt, disliked_ingredients, search_urls, max_minutes, diet_type, query_profile
+            )
+            return await self.crawl_page(frontier, page_size, url_filter, rank)
 
         except Exception as e:
             logger.error(f"Error in crawl_and_scrape_recipes: {e}")
-            return []
+            return [], None
+
+    async def resume_crawl(
+        self,
+        state: Dict[str, Any],
+        page_size: int = 10,
+        url_filter: Optional[RecipeUrlFilter] = None,
+        rank: Optional[Ranker] = None,
+    ) -> Tuple[List[Recipe], Optional[Dict[str, Any]]]:
+        """Next page from a frontier returned by start_crawl/resume_crawl"""
+        try:
+            return await self.crawl_page(CrawlFrontier.from_dict(state), page_size, url_filter, rank)
+        except Exception as e:
+            logger.error(f"Error resuming crawl: {e}")
+            return [], None
+
+    async def crawl_page(
+        self,
+        frontier: "CrawlFrontier",
+        page_size: int,
+        url_filter: Optional[RecipeUrlFilter] = None,
+        rank: Optional[Ranker] = None,
+    ) -> Tuple[List[Recipe], Optional[Dict[str, Any]]]:
+        """
+        Fill a candidate pool round-robin across sites: each round takes the
+        next valid recipe from every site that still has candidates, in
+        source order, so the first round is one recipe per site. A round only
+        visits as many sites as the pool has room for. Search pages are
+        fetched lazily the first time a site is visited.
+
+        Without rank the pool is the page. With rank the pool holds up to
+        CANDIDATE_POOL_SIZE recipes, the best page_size of them are returned,
+        and the rest go back to the front of their site's queue so a later
+        page can still pick them (at the cost of fetching them again).
+        """
+        pool_size = max(page_size, CANDIDATE_POOL_SIZE) if rank else page_size
+        # Canonicalized once per page; each term is cached across pages and users
+        exclusions = compile_exclusions(frontier.disliked_ingredients)
+        candidates: List[Tuple[SiteFrontier, Recipe]] = []
+        while len(candidates) < pool_size:
+            lanes = [lane for lane in frontier.lanes if lane.has_more][: pool_size - len(candidates)]
+            if not lanes:
+                break
+            found = await asyncio.gather(
+                *(self._next_from_lane(frontier, lane, url_filter, exclusions) for lane in lanes)
+            )
+            candidates.extend((lane, recipe) for lane, recipe in zip(lanes, found) if recipe)
+
+        recipes = [recipe for _, recipe in candidates]
+        if rank and recipes:
+            recipes = rank(recipes)[:page_size]
+            self._requeue(frontier, candidates, recipes)
+
+        logger.info(f"Successfully scraped {len(recipes)} recipes from {len(candidates)} candidates")
+        return recipes, frontier.to_dict() if frontier.has_more else None
+
+    def _requeue(
+        self,
+        frontier: "CrawlFrontier",
+        candidates: List[Tuple["SiteFrontier", Recipe]],
+        kept: List[Recipe],
+    ) -> None:
+        """Put candidates that did not make the page back at the front of their lanes, in crawl order"""
+        kept_ids = {id(recipe) for recipe in kept}
+        for lane, recipe in reversed(candidates):
+            if id(recipe) in kept_ids:
+                continue
+            lane.remaining.insert(0, recipe.source_url)
+            lane.offset -= 1
+            frontier.seen.discard(frontier_url_key(recipe.source_url))
+
+    async def _next_from_lane(
+        self,
+        frontier: "CrawlFrontier",
+        lane: "SiteFrontier",
+        url_filter: Optional[RecipeUrlFilter],
+        exclusions: IngredientExclusions,
+    ) -> Optional[Recipe]:
+        if lane.remaining is None:
+            lane.remaining = await self._find_recipe_urls_from_search(lane.search_url)
+
+        skipped = 0
+        filter_seconds = 0.0
+        try:
+            while lane.remaining:
+                url = lane.remaining.pop(0)
+                lane.offset += 1
+                started = time.perf_counter()
+                excluded = bool(url_filter) and url in url_filter
+                key = frontier_url_key(url)
+                filter_seconds += time.perf_counter() - started
+                if excluded:
+                    # Skip hated and already-saved recipes before downloading them
+                    skipped += 1
+                    continue
+                if key in frontier.seen:
+                    continue
+                frontier.seen.add(key)
+
+                recipe = await self._scrape_recipe(url, frontier.max_minutes)
+                started = time.perf_counter()
+                accepted = (
+                    recipe
+                    and recipe.ingredients
+                    and recipe.instructions
+                    and _fits_diet(recipe, frontier.diet_type)
+                    and not _excluded(recipe, exclusions)
+                )
+                filter_seconds += time.perf_counter() - started
+                if accepted:
+                    return recipe
+            return None
+        finally:
+            observe_stage("filtering", filter_seconds)
+            if skipped:
+                logger.info(f"Skipped {skipped} excluded recipe URLs from {lane.search_url}")
+
+    async def crawl_batch(
+        self, queries: List[Dict[str, Any]], max_recipes: int = 10
+    ) -> Tuple[List[List[Recipe]], Dict[str, int]]:
+        """
+        Crawl for many prompts with one shared plan.
+
+        Each query is a dict with "prompt", "disliked_ingredients" and
+        optional "url_filter", "rank", "max_minutes" and "diet_type". Prompts with the same search text
+        share search URLs, every search page and recipe page is fetched at
+        most once per batch, and each query then gets its own filtered
+        candidate pool (see _collect_recipes), ranked when it has a "rank".
+        Returns (results in query order, plan stats).
+        """
+        stats = {"prompts": len(queries), "unique_queries": 0, "search_pages": 0, "recipe_pages": 0}
+        try:
+            with time_stage("sources"):
+                sources = await get_active_recipe_sources()
+            if not sources:
+                logger.warning("No active recipe sources found")
+                return [[] for _ in queries], stats
+
+            search_urls_by_key: Dict[str, List[str]] = {}
+            for query in queries:
+                key = search_query_key(query["prompt"])
+                if key not in search_urls_by_key:
+                    search_urls_by_key[key] = build_search_urls(query["prompt"], sources)
+            plan = list(dict.fromkeys(url for urls in search_urls_by_key.values() for url in urls))
+            logger.info(
+                f"Batch crawl plan: {len(queries)} prompts, {len(search_urls_by_key)} unique queries, "
+                f"{len(plan)} search URLs"
+            )
+
+            search_pages: Dict[str, asyncio.Task] = {}
+            recipe_pages: Dict[str, asyncio.Task] = {}
+
+            def find_urls(url: str) -> asyncio.Task:
+                return self._shared_fetch(search_pages, url, self._find_recipe_urls_from_search, "search")
+
+            def scrape(url: str) -> asyncio.Task:
+                return self._shared_fetch(recipe_pages, url, self._scrape_recipe, "recipe")
+
+            # Every search page in the plan is fetched up front, concurrently
+            await asyncio.gather(*(find_urls(url) for url in plan))
+            results = await asyncio.gather(
+                *(
+                    self._collect_recipes(
+                        search_urls_by_key[search_query_key(query["prompt"])],
+                        find_urls,
+                        scrape,
+                        query.get("disliked_ingredients") or [],
+                        query.get("url_filter"),
+                        CANDIDATE_POOL_SIZE if query.get("rank") else 0,
+                        query.get("rank"),
+                        query.get("max_minutes"),
+                        query.get("diet_type"),
+                    )
+                    for query in queries
+                )
+            )
+
+            stats.update(
+                unique_queries=len(search_urls_by_key),
+                search_pages=len(search_pages),
+                recipe_pages=len(recipe_pages),
+            )
+            logger.info(f"Batch crawl fetched {stats['search_pages']} search and {stats['recipe_pages']} recipe pages")
+            return [recipes[:max_recipes] for recipes in results], stats
 
-    def _contains_disliked_ingredients(self, ingredients: List[str], dislikes: List[str]) -> bool:
-        for ing in ingredients:
-            for dis in dislikes:
-                if dis.lower() in ing.lower():
-                    return True
-        return False
+        except Exception as e:
+            logger.error(f"Error in crawl_batch: {e}")
+            return [[] for _ in queries], stats
+
+    def _shared_fetch(self, tasks: Dict[str, asyncio.Task], url: str, fetch, kind: str) -> asyncio.Task:
+        """One task per URL; later callers await the same result"""
+        task = tasks.get(url)
+        if task is None:
+            task = tasks[url] = asyncio.ensure_future(self._limited(url, fetch))
+        else:
+            SOURCE_CACHE_HITS.inc(source_label(url), kind)
+        return task
+
+    async def _limited(self, url: str, fetch) -> Any:
+        # Respect each source's max_concurrency across the whole batch
+        host = source_host(url)
+        semaphore = self._semaphores.get(host)
+        if semaphore is None:
+            source = source_registry.get_source(url)
+            limit = source.max_concurrency if source else DEFAULT_SOURCE_CONCURRENCY
+            semaphore = self._semaphores[host] = asyncio.Semaphore(limit)
+        async with semaphore:
+            return await fetch(url)
+
+    async def _collect_recipes(
+        self,
+        search_urls: List[str],
+        find_urls,
+        scrape,
+        disliked_ingredients: List[str],
+        url_filter: Optional[RecipeUrlFilter],
+        pool_size: int = 0,
+        rank: Optional[Ranker] = None,
+        max_minutes: Optional[float] = None,
+        diet_type: Optional[str] = None,
+    ) -> List[Recipe]:
+        """
+        Candidate pool for one query: the first valid recipe per site, walking
+        each search page's results in order, then further rounds of one more
+        per site while the pool is below pool_size. Ranked with rank if given.
+        """
+        exclusions = compile_exclusions(disliked_ingredients)
+        queues: Dict[str, List[str]] = {}
+
+        for search_url in search_urls:
+            parsed_site = urlparse(search_url).netloc.replace("www.", "").split(".")[0].lower()
+            urls = await find_urls(search_url)
+
+            if url_filter:
+                # Skip hated and already-saved recipes before downloading them
+                kept = [url for url in urls if url not in url_filter]
+                if len(kept) < len(urls):
+                    logger.info(f"Skipped {len(urls) - len(kept)} excluded recipe URLs from {search_url}")
+                urls = kept
+
+            # A second search page for the same site only supplies more candidates
+            queues.setdefault(parsed_site, []).extend(urls)
+
+        recipes: List[Recipe] = []
+        sites = list(queues)
+        while sites:
+            found = await asyncio.gather(
+                *(self._next_valid(queues[site], scrape, exclusions, max_minutes, diet_type) for site in sites)
+            )
+            recipes.extend(recipe for recipe in found if recipe)
+            sites = [site for site in sites if queues[site]][: max(pool_size - len(recipes), 0)]
+
+        return rank(recipes) if rank and recipes else recipes
+
+    async def _next_valid(
+        self,
+        urls: List[str],
+        scrape,
+        exclusions: IngredientExclusions,
+        max_minutes: Optional[float] = None,
+        diet_type: Optional[str] = None,
+    ) -> Optional[Recipe]:
+        """Pop urls until one scrapes to a valid recipe"""
+        while urls:
+            recipe = await scrape(urls.pop(0))
+            with time_stage("filtering"):
+                # Pages are shared across the batch, so the per-query time
+                # limit is applied here rather than at extraction
+                accepted = (
+                    recipe
+                    and not _over_time(recipe.total_time, max_minutes)
+                    and recipe.ingredients
+                    and recipe.instructions
+                    and _fits_diet(recipe, diet_type)
+                    and not _excluded(recipe, exclusions)
+                )
+            if accepted:
+                return recipe
+        return None
+
+    async def aclose(self) -> None:
+        await self.session.aclose()
 
+    @traced("search_page", lambda self, search_url: {"url": search_url, "source": source_label(search_url)})
     async def _find_recipe_urls_from_search(self, search_url: str) -> List[str]:
+        source = source_label(search_url)
+        try:
+            with time_stage("search_fetch"):
+                response = await self.session.get(search_url)
+        except Exception as e:
+            SOURCE_FETCHES.inc(source, "search", "error")
+            source_registry.record_fetch(search_url, ok=False, error=str(e))
+            logger.error(f"Error fetching search page {search_url}: {e}")
+            return []
+        SOURCE_BYTES.inc(source, "search", amount=len(response.content))
+        if response.status_code != 200:
+            SOURCE_FETCHES.inc(source, "search", "error")
+            source_registry.record_fetch(search_url, ok=False, error=f"HTTP {response.status_code}")
+            return []
+        SOURCE_FETCHES.inc(source, "search", "ok")
+        source_registry.record_fetch(search_url, ok=True)
+
+        # The fetch succeeded: a page we can't parse is not a source failure
         try:
-            response = await self.session.get(search_url)
-            if response.status_code != 200:
-                return []
-
-            soup = BeautifulSoup(response.content, "html.parser")
-            recipe_urls = []
-
-            selectors = [
-                'a[href*="/recipe/"]', 'a[href*="/recipes/"]', 'a[href*="recipe-"]',
-                'a[href*="-recipe"]', ".recipe-card a", ".recipe-item a", ".recipe-link",
-                "article a", ".card a",
-            ]
-
-            for selector in selectors:
-                links = soup.select(selector)
-                for link in links:
-                    href = link.get("href")
-                    if href:
-                        full_url = urljoin(search_url, href)
-                        if self._is_recipe_url(full_url):
-                            recipe_urls.append(full_url)
-
-            all_links = soup.find_all("a", href=True)
-            for link in all_links[:50]:
+            with time_stage("search_parse"):
+                unique_urls = self._extract_recipe_links(response.content, search_url)
+        except Exception as e:
+            logger.error(f"Error finding recipe URLs from {search_url}: {e}")
+            return []
+        logger.info(f"Found {len(unique_urls)} recipe URLs from {search_url}")
+        return unique_urls[:20]
+
+    def _extract_recipe_links(self, html: Union[str, bytes], search_url: str) -> List[str]:
+        """Recipe URLs linked from a search results page, deduplicated in page order"""
+        soup = BeautifulSoup(html, "html.parser")
+        recipe_urls = []
+
+        selectors = [
+            'a[href*="/recipe/"]', 'a[href*="/recipes/"]', 'a[href*="recipe-"]',
+            'a[href*="-recipe"]', ".recipe-card a", ".recipe-item a", ".recipe-link",
+            "article a", ".card a",
+        ]
+
+        for selector in selectors:
+            links = soup.select(selector)
+            for link in links:
                 href = link.get("href")
                 if href:
                     full_url = urljoin(search_url, href)
                     if self._is_recipe_url(full_url):
                         recipe_urls.append(full_url)
 
-            unique_urls = list(dict.fromkeys(recipe_urls))
-            logger.info(f"Found {len(unique_urls)} recipe URLs from {search_url}")
-            return unique_urls[:20]
+        all_links = soup.find_all("a", href=True)
+        for link in all_links[:50]:
+            href = link.get("href")
+            if href:
+                full_url = urljoin(search_url, href)
+                if self._is_recipe_url(full_url):
+                    recipe_urls.append(full_url)
 
-        except Exception as e:
-            logger.error(f"Error finding recipe URLs from {search_url}: {e}")
-            return []
+        return list(dict.fromkeys(recipe_urls))
 
     def _is_recipe_url(self, url: str) -> bool:
         url_lower = url.lower()
@@ -120,24 +564,45 @@ class RecipeCrawler:
         recipe_indicators = ["/recipe/", "/recipes/", "recipe-", "-recipe", "/meal/", "/dinner/", "/lunch/", "/breakfast/"]
         return any(indicator in url_lower for indicator in recipe_indicators)
 
-    async def _scrape_recipe(self, url: str) -> Optional[Dict[str, Any]]:
+    @traced("recipe_page", lambda self, url, max_minutes=None: {"url": url, "source": source_label(url)})
+    async def _scrape_recipe(self, url: str, max_minutes: Optional[float] = None) -> Optional[Recipe]:
+        source = source_label(url)
         try:
-            response = await self.session.get(url)
-            if response.status_code != 200:
-                return None
-
-            soup = BeautifulSoup(response.content, "html.parser")
-            recipe_data = self._extract_jsonld_recipe(soup)
-            if not recipe_data:
-                recipe_data = self._extract_fallback_recipe(soup)
-            if not recipe_data:
-                return None
-
-            return self._format_recipe_output(recipe_data, url)
+            with time_stage("recipe_fetch"):
+                response = await self.session.get(url)
+        except Exception as e:
+            SOURCE_FETCHES.inc(source, "recipe", "error")
+            logger.error(f"Error fetching recipe from {url}: {e}")
+            return None
+        SOURCE_BYTES.inc(source, "recipe", amount=len(response.content))
+        if response.status_code != 200:
+            SOURCE_FETCHES.inc(source, "recipe", "error")
+            return None
+        SOURCE_FETCHES.inc(source, "recipe", "ok")
 
+        # Counted once as a fetch above; parse errors are extraction failures
+        try:
+            with time_stage("recipe_parse"):
+                soup = BeautifulSoup(response.content, "html.parser")
+                recipe_data = self._extract_jsonld_recipe(soup)
+                if not recipe_data:
+                    recipe_data = self._extract_fallback_recipe(soup)
+                if not recipe_data:
+                    RECIPE_EXTRACTIONS.inc(source, "failure")
+                    return None
+                # Before ingredient and nutrition parsing: an over-time recipe can't qualify
+                times = recipe_times(recipe_data)
+                if _over_time(times[2], max_minutes):
+                    RECIPE_EXTRACTIONS.inc(source, "over_time")
+                    return None
+
+                recipe = self._format_recipe_output(recipe_data, url, times)
         except Exception as e:
+            RECIPE_EXTRACTIONS.inc(source, "failure")
             logger.error(f"Error scraping recipe from {url}: {e}")
             return None
+        RECIPE_EXTRACTIONS.inc(source, "success")
+        return recipe
 
     def _extract_jsonld_recipe(self, soup: BeautifulSoup) -> Optional[Dict]:
         try:
@@ -194,7 +659,9 @@ class RecipeCrawler:
             logger.warning(f"Error parsing servings from {value}: {e}")
             return None
 
-    def _format_recipe_output(self, data: Dict, url: str) -> Dict[str, Any]:
+    def _format_recipe_output(
+        self, data: Dict, url: str, times: Optional[Tuple[Optional[int], Optional[int], Optional[int]]] = None
+    ) -> Recipe:
         image_url = data.get("image")
         if isinstance(image_url, dict):
             image_url = image_url.get("url", "")
@@ -219,14 +686,23 @@ class RecipeCrawler:
         else:
             instructions = []
 
-        return {
-            "title": data.get("name", ""),
-            "description": data.get("description", ""),
-            "image_url": image_url,
-            "ingredients": ingredients,
-            "instructions": instructions,
-            "macros": {},
-            "servings": self._parse_servings(data.get("recipeYield")),
-            "source_url": url,
-            "site_name": urlparse(url).netloc,
-        }
+        prep_time, cook_time, total_time = times or recipe_times(data)
+        parsed_ingredients = parse_ingredients(ingredients)
+
+        return Recipe(
+            title=data.get("name", ""),
+            description=data.get("description", ""),
+            image_url=image_url,
+            ingredients=ingredients,
+            parsed_ingredients=parsed_ingredients,
+            instructions=instructions,
+            macros=parse_nutrition(data.get("nutrition")),
+            servings=self._parse_servings(data.get("recipeYield")),
+            prep_time=prep_time,
+            cook_time=cook_time,
+            total_time=total_time,
+            diet_tags=diet_tags(parsed_ingredients),
+            source_url=url,
+            site_name=urlparse(url).netloc,
+            ingredient_ids=ingredient_ids(parsed_ingredients),
+        )
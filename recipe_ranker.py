@@ -0,0 +1,205 @@
+"""
+Multi-signal recipe ranking
+The crawler fills a candidate pool (CANDIDATE_POOL_SIZE) of validated
+recipes and this module orders it, so which recipes make a page no longer
+depends on which one a site happened to return first. Each candidate gets
+a row of signal values, all computed in NumPy over the whole pool:
+
+  keywords      share of the prompt's terms found in the title (full
+                credit) or the description and ingredient names
+  diet          1 when diet_classifier finds no ingredient that breaks the
+                diet, lower with each one that does (0 ingredients break it
+                once the crawl has filtered on the diet)
+  time          total_time against the prompt's time limit
+  completeness  image, description, servings, nutrition, enough
+                ingredients and steps
+  reputation    configured source reputation blended with fetch health
+  macros        macro_ranker score for nutrition goals in the prompt
+
+The score is the weighted sum (SIGNAL_WEIGHTS); ties keep crawl order.
+Signals the query does not ask for (no diet, no time limit, no nutrition
+goals) are zero for every candidate and do not affect the order.
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Set
+
+import numpy as np
+
+from diet_classifier import diet_violations, requested_diet
+from durations import prompt_time_limit
+from macro_ranker import MacroTargets, macro_matrix, macro_scores, macro_targets
+from supabase_sources import source_registry
+
+SIGNALS = ("keywords", "diet", "time", "completeness", "reputation", "macros")
+SIGNAL_WEIGHTS = {
+    "keywords": 3.0,
+    "diet": 2.0,
+    "time": 1.5,
+    "completeness": 1.0,
+    "reputation": 0.5,
+    "macros": 1.5,
+}
+# Credit for a query term found outside the title
+BODY_MATCH_WEIGHT = 0.5
+# Time signal for recipes that do not state a total time
+UNKNOWN_TIME_SCORE = 0.5
+
+_WORD = re.compile(r"[a-z]+")
+# Prompt words that say nothing about which recipe is wanted; time and
+# nutrition words are scored by the time and macros signals instead
+STOPWORDS = frozenset(
+    "a an and are as at be best but by can easy for from get give good have how i in "
+    "into is it like make me my need of on or our please recipe recipes show so some "
+    "something that the this to under want we what with without you your minute minutes "
+    "min mins hour hours less than over quick fast healthy high low calorie kcal cal "
+    "protein carb fat fiber gram".split()
+)
+
+
+def normalize_term(word: str) -> str:
+    """Crude singular form so "eggs" matches "egg" and "tomatoes" matches "tomato" """
+    if len(word) > 4 and word.endswith("oes"):
+        return word[:-2]
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def terms(text: str) -> Set[str]:
+    return {normalize_term(word) for word in _WORD.findall(text.lower())}
+
+
+@dataclass
+class RankingQuery:
+    """What the candidates are scored against, built once per crawl"""
+
+    terms: List[str] = field(default_factory=list)
+    diet_type: Optional[str] = None
+    max_minutes: Optional[float] = None
+    targets: MacroTargets = field(default_factory=MacroTargets)
+
+
+def ranking_query(prompt: str, query_profile: Optional[Dict[str, Any]] = None) -> RankingQuery:
+    """Query terms, diet, time limit and macro targets from the prompt and extracted intent"""
+    profile = query_profile or {}
+    words = [prompt, str(profile.get("cuisine") or "")]
+    words.extend(str(item) for item in profile.get("included_ingredients") or [])
+    query_terms = sorted(
+        term for term in terms(" ".join(words)) if term not in STOPWORDS and len(term) > 2
+    )
+
+    return RankingQuery(
+        terms=query_terms,
+        diet_type=requested_diet(prompt, query_profile),
+        max_minutes=prompt_time_limit(prompt, query_profile),
+        targets=macro_targets(prompt, query_profile),
+    )
+
+
+def _ingredient_names(recipe: Any) -> List[str]:
+    return [ingredient.name for ingredient in recipe.get("parsed_ingredients") or []]
+
+
+def keyword_scores(recipes: Sequence[Any], query_terms: List[str]) -> np.ndarray:
+    if not query_terms:
+        return np.zeros(len(recipes))
+    # Recipe words are looked up by surface form ("egg", "eggs", "egges") so
+    # only the query terms are ever normalized
+    columns = {
+        form: column
+        for column, term in enumerate(query_terms)
+        for form in (term, f"{term}s", f"{term}es")
+    }
+    title_hits = np.zeros((len(recipes), len(query_terms)), dtype=bool)
+    body_hits = np.zeros((len(recipes), len(query_terms)), dtype=bool)
+    for row, recipe in enumerate(recipes):
+        title = set(_WORD.findall((recipe.get("title") or "").lower()))
+        body = set(_WORD.findall(" ".join([recipe.get("description") or "", *_ingredient_names(recipe)]).lower()))
+        title_hits[row, [columns[word] for word in title & columns.keys()]] = True
+        body_hits[row, [columns[word] for word in body & columns.keys()]] = True
+    credit = np.maximum(title_hits * 1.0, body_hits * BODY_MATCH_WEIGHT)
+    return credit.mean(axis=1)
+
+
+def diet_scores(recipes: Sequence[Any], diet_type: Optional[str]) -> np.ndarray:
+    if not diet_type:
+        return np.zeros(len(recipes))
+    counts = np.array(
+        [diet_violations(recipe.get("parsed_ingredients") or [], diet_type) for recipe in recipes],
+        dtype=float,
+    )
+    return 1.0 / (1.0 + counts)
+
+
+def time_scores(recipes: Sequence[Any], max_minutes: Optional[float]) -> np.ndarray:
+    if not max_minutes:
+        return np.zeros(len(recipes))
+    # None (no stated time) becomes NaN under dtype=float
+    minutes = np.array([recipe.get("total_time") for recipe in recipes], dtype=float)
+    overshoot = np.maximum(minutes - max_minutes, 0.0) / max_minutes
+    return np.where(np.isnan(minutes), UNKNOWN_TIME_SCORE, np.clip(1.0 - overshoot, 0.0, 1.0))
+
+
+def completeness_scores(recipes: Sequence[Any]) -> np.ndarray:
+    checks = np.array(
+        [
+            [
+                bool(recipe.get("image_url")),
+                bool(recipe.get("description")),
+                recipe.get("servings") is not None,
+                bool(recipe.get("macros")),
+                len(recipe.get("ingredients") or []) >= 3,
+                len(recipe.get("instructions") or []) >= 3,
+            ]
+            for recipe in recipes
+        ],
+        dtype=float,
+    ).reshape(len(recipes), 6)
+    return checks.mean(axis=1)
+
+
+def reputation_scores(recipes: Sequence[Any]) -> np.ndarray:
+    return np.array(
+        [source_registry.reputation(recipe.get("source_url") or "") for recipe in recipes],
+        dtype=float,
+    )
+
+
+def feature_matrix(recipes: Sequence[Any], query: RankingQuery) -> np.ndarray:
+    """(len(recipes), len(SIGNALS)) matrix of signal values, columns in SIGNALS order"""
+    if query.targets.active:
+        # Normalized per target so the macro column is on the same scale as the others
+        macros = macro_scores(macro_matrix(recipes), query.targets) / len(query.targets.to_dict())
+    else:
+        macros = np.zeros(len(recipes))
+    return np.column_stack(
+        [
+            keyword_scores(recipes, query.terms),
+            diet_scores(recipes, query.diet_type),
+            time_scores(recipes, query.max_minutes),
+            completeness_scores(recipes),
+            reputation_scores(recipes),
+            macros,
+        ]
+    )
+
+
+_WEIGHTS = np.array([SIGNAL_WEIGHTS[signal] for signal in SIGNALS])
+
+
+def score_recipes(recipes: Sequence[Any], query: RankingQuery) -> np.ndarray:
+    if not recipes:
+        return np.zeros(0)
+    return feature_matrix(recipes, query) @ _WEIGHTS
+
+
+def rank_recipes(recipes: List[Any], query: RankingQuery) -> List[Any]:
+    """recipes reordered best-first for query"""
+    if len(recipes) < 2:
+        return recipes
+    scores = score_recipes(recipes, query)
+    # Stable sort on the negated score keeps crawl order among equal scores
+    order = np.argsort(-scores, kind="stable")
+    return [recipes[i] for i in order]
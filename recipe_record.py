@@ -0,0 +1,153 @@
+"""
+Compact recipe record for the crawl, storage and response hot path
+A Recipe is built once by RecipeCrawler._format_recipe_output and the same
+object is handed to the filters, the storage rows and the JSON response.
+Fields live in __slots__ (no per-instance dict), and Recipe is a read-only
+Mapping so code written against recipe dicts (recipe["title"],
+recipe.get("macros")) keeps working.
+"""
+
+import json
+from collections.abc import Mapping
+from typing import Any, Dict, FrozenSet, List, Optional
+
+from ingredient_parser import Ingredient
+
+RECIPE_FIELDS = (
+    "title",
+    "description",
+    "image_url",
+    "ingredients",
+    "parsed_ingredients",
+    "instructions",
+    "macros",
+    "servings",
+    "prep_time",
+    "cook_time",
+    "total_time",
+    "diet_tags",
+    "source_url",
+    "site_name",
+)
+
+
+class Recipe(Mapping):
+    __slots__ = RECIPE_FIELDS + ("ingredient_ids",)
+
+    def __init__(
+        self,
+        title: str = "",
+        description: str = "",
+        image_url: str = "",
+        ingredients: Optional[List[str]] = None,
+        parsed_ingredients: Optional[List[Ingredient]] = None,
+        instructions: Optional[List[str]] = None,
+        macros: Optional[Dict[str, Any]] = None,
+        servings: Optional[int] = None,
+        prep_time: Optional[int] = None,
+        cook_time: Optional[int] = None,
+        total_time: Optional[int] = None,
+        diet_tags: Optional[List[str]] = None,
+        source_url: str = "",
+        site_name: str = "",
+        ingredient_ids: FrozenSet[int] = frozenset(),
+    ):
+        self.title = title
+        self.description = description
+        self.image_url = image_url
+        self.ingredients = ingredients if ingredients is not None else []
+        # One Ingredient per ingredients entry, same order
+        self.parsed_ingredients = parsed_ingredients if parsed_ingredients is not None else []
+        self.instructions = instructions if instructions is not None else []
+        self.macros = macros if macros is not None else {}
+        self.servings = servings
+        # Minutes, from the schema.org prepTime/cookTime/totalTime durations
+        self.prep_time = prep_time
+        self.cook_time = cook_time
+        self.total_time = total_time
+        # Diets the ingredients comply with (diet_classifier.DIET_RULES keys)
+        self.diet_tags = diet_tags if diet_tags is not None else []
+        self.source_url = source_url
+        self.site_name = site_name
+        # ingredient_vocabulary ids of the ingredients, for exclusion checks;
+        # not a mapping key and never stored, since ids follow the vocabulary
+        self.ingredient_ids = ingredient_ids
+
+    # Mapping interface over the slots
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in RECIPE_FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self):
+        return iter(RECIPE_FIELDS)
+
+    def __len__(self) -> int:
+        return len(RECIPE_FIELDS)
+
+    def __contains__(self, key: object) -> bool:
+        return key in RECIPE_FIELDS
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key not in RECIPE_FIELDS:
+            return default
+        return getattr(self, key)
+
+    def __repr__(self) -> str:
+        return f"Recipe(title={self.title!r}, source_url={self.source_url!r})"
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Shallow dict of the fields; lists and macros are shared, not copied"""
+        return {
+            "title": self.title,
+            "description": self.description,
+            "image_url": self.image_url,
+            "ingredients": self.ingredients,
+            "parsed_ingredients": self.parsed_ingredients,
+            "instructions": self.instructions,
+            "macros": self.macros,
+            "servings": self.servings,
+            "prep_time": self.prep_time,
+            "cook_time": self.cook_time,
+            "total_time": self.total_time,
+            "diet_tags": self.diet_tags,
+            "source_url": self.source_url,
+            "site_name": self.site_name,
+        }
+
+    def to_row(self, user_id: str) -> Dict[str, Any]:
+        """recipe_search row for user_id, sharing this recipe's lists"""
+        return {
+            "user_id": user_id,
+            "title": self.title,
+            "description": self.description,
+            "image_url": self.image_url,
+            "servings": self.servings,
+            "prep_time": self.prep_time,
+            "cook_time": self.cook_time,
+            "total_time": self.total_time,
+            "diet_tags": self.diet_tags,
+            "source_url": self.source_url,
+            "ingredients": self.ingredients,
+            "parsed_ingredients": [ingredient.to_dict() for ingredient in self.parsed_ingredients],
+            "macros": self.macros,
+            "instructions": self.instructions,
+            "site_name": self.site_name,
+        }
+
+
+def _encode_default(value: Any) -> Any:
+    if isinstance(value, (Recipe, Ingredient)):
+        return value.to_dict()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+_encoder = json.JSONEncoder(
+    ensure_ascii=False, allow_nan=False, separators=(",", ":"), default=_encode_default
+)
+
+
+def encode_json(content: Any) -> bytes:
+    """UTF-8 JSON for API responses; Recipe objects are encoded without jsonable_encoder copies"""
+    return _encoder.encode(content).encode("utf-8")
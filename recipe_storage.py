@@ -4,37 +4,24 @@ Note: Primary storage now handled by RecipeBulkStorage system
 """
 
 import logging
-import os
-from typing import Dict, Any
-from supabase import create_client, Client
+from typing import TYPE_CHECKING, Dict, Any
+from data_access import db
+from repository import get_repository
 
-logger = logging.getLogger(__name__)
-
-
-def get_supabase_client() -> Client:
-    """Initialize Supabase client with anon key"""
-    url = os.environ.get("SUPABASE_URL")
-    key = os.environ.get("SUPABASE_KEY")
-
-    if not url or not key:
-        raise ValueError(
-            "SUPABASE_URL and SUPABASE_KEY environment variables must be set"
-        )
+if TYPE_CHECKING:
+    from supabase import Client
 
-    return create_client(url, key)
+logger = logging.getLogger(__name__)
 
 
-def get_supabase_service_client() -> Client:
-    """Initialize Supabase client with service role key for bypassing RLS"""
-    url = os.environ.get("SUPABASE_URL")
-    service_key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
+def get_supabase_client() -> "Client":
+    """Shared Supabase client with anon key"""
+    return db.anon
 
-    if not url or not service_key:
-        raise ValueError(
-            "SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY environment variables must be set"
-        )
 
-    return create_client(url, service_key)
+def get_supabase_service_client() -> "Client":
+    """Shared Supabase client with service role key for bypassing RLS"""
+    return db.service
 
 
 async def store_searched_recipe(recipe_data: Dict[str, Any], user_id: str) -> None:
@@ -42,9 +29,6 @@ async def store_searched_recipe(recipe_data: Dict[str, Any], user_id: str) -> No
     Store a single searched recipe in the recipe_search table
     """
     try:
-        # Use service role key to bypass RLS for inserting data
-        supabase = get_supabase_service_client()
-
         # Prepare data for recipe_search table
         search_data = {
             "user_id": user_id,
@@ -57,9 +41,10 @@ async def store_searched_recipe(recipe_data: Dict[str, Any], user_id: str) -> No
         }
 
         # Insert into recipe_search table
-        response = supabase.table("recipe_search").insert(search_data).execute()
+        # Use service role key to bypass RLS for inserting data
+        inserted = await get_repository().insert_rows("recipe_search", [search_data])
 
-        if response.data:
+        if inserted:
             logger.info(
                 f"Successfully stored recipe '{recipe_data.get('title', 'Unknown')}' for user {user_id}"
             )
@@ -0,0 +1,202 @@
+"""
+Pluggable storage for the agent
+RecipeRepository is the interface every module reads and writes through;
+SupabaseRepository is the production implementation and SQLiteRepository
+(sqlite_repository.py) keeps all data in a local file for single-node
+deployments and benchmarks. Select with AGENT_STORAGE_BACKEND.
+"""
+
+import logging
+import os
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional
+
+from data_access import db
+
+logger = logging.getLogger(__name__)
+
+# "supabase" (default) or "sqlite"
+AGENT_STORAGE_BACKEND = os.environ.get("AGENT_STORAGE_BACKEND", "supabase").lower()
+
+
+class RecipeRepository(ABC):
+    """
+    Storage operations used by the agent.
+
+    Write methods take a service flag that only matters to Supabase (service
+    role vs anon key); other backends ignore it.
+    """
+
+    name = "base"
+
+    # Reads
+
+    @abstractmethod
+    async def get_user_settings(self, user_id: str) -> Dict[str, Any]:
+        """The user's user_settings row, or {} if none"""
+
+    @abstractmethod
+    async def get_hated_recipe_urls(self, user_id: str) -> List[str]:
+        """source_url values from hated_recipes"""
+
+    @abstractmethod
+    async def get_saved_recipe_urls(self, user_id: str) -> List[str]:
+        """source_url values from saved_recipes"""
+
+    @abstractmethod
+    async def get_active_sources(self) -> List[Dict[str, Any]]:
+        """Rows from recipe_sources where active is true"""
+
+    @abstractmethod
+    async def get_recipe_searches(self, user_id: str) -> List[Dict[str, Any]]:
+        """The user's recipe_search rows"""
+
+    @abstractmethod
+    async def count_recipe_searches(self, user_id: str) -> int:
+        """Number of recipe_search rows for the user"""
+
+    # Writes
+
+    @abstractmethod
+    async def insert_rows(
+        self, table: str, rows: List[Dict[str, Any]], service: bool = True
+    ) -> int:
+        """Append rows to table; returns rows written"""
+
+    @abstractmethod
+    async def replace_user_rows(
+        self,
+        table: str,
+        user_ids: List[str],
+        rows: List[Dict[str, Any]],
+        service: bool = True,
+    ) -> int:
+        """Delete table rows for user_ids, then insert rows"""
+
+    @abstractmethod
+    async def upsert_rows(
+        self, table: str, rows: List[Dict[str, Any]], key: str, service: bool = True
+    ) -> int:
+        """Insert rows, updating the existing row when its key is already present"""
+
+    def query_stats(self) -> Dict[str, Dict[str, Any]]:
+        return {}
+
+    def close(self) -> None:
+        pass
+
+
+class SupabaseRepository(RecipeRepository):
+    """RecipeRepository over the shared Supabase data-access layer"""
+
+    name = "supabase"
+
+    async def get_user_settings(self, user_id: str) -> Dict[str, Any]:
+        response = await db.run(
+            "user_settings.select",
+            lambda client: client.table("user_settings")
+            .select("*")
+            .eq("user_id", user_id)
+            .limit(1),
+        )
+        return dict(response.data[0]) if response.data else {}
+
+    async def get_hated_recipe_urls(self, user_id: str) -> List[str]:
+        return await self._user_source_urls("hated_recipes", user_id)
+
+    async def get_saved_recipe_urls(self, user_id: str) -> List[str]:
+        return await self._user_source_urls("saved_recipes", user_id)
+
+    async def _user_source_urls(self, table: str, user_id: str) -> List[str]:
+        response = await db.run(
+            f"{table}.select",
+            lambda client: client.table(table).select("source_url").eq("user_id", user_id),
+        )
+        return [row["source_url"] for row in response.data or [] if row.get("source_url")]
+
+    async def get_active_sources(self) -> List[Dict[str, Any]]:
+        response = await db.run(
+            "recipe_sources.select",
+            lambda client: client.table("recipe_sources").select("*").eq("active", True),
+            service=False,
+        )
+        return response.data or []
+
+    async def get_recipe_searches(self, user_id: str) -> List[Dict[str, Any]]:
+        response = await db.run(
+            "recipe_search.select",
+            lambda client: client.table("recipe_search").select("*").eq("user_id", user_id),
+        )
+        return response.data or []
+
+    async def count_recipe_searches(self, user_id: str) -> int:
+        response = await db.run(
+            "recipe_search.count",
+            lambda client: client.table("recipe_search")
+            .select("id", count="exact")
+            .eq("user_id", user_id),
+        )
+        return response.count if getattr(response, "count", None) else 0
+
+    async def insert_rows(
+        self, table: str, rows: List[Dict[str, Any]], service: bool = True
+    ) -> int:
+        if not rows:
+            return 0
+        response = await db.ainsert(table, rows, service=service)
+        return len(response.data) if response.data else 0
+
+    async def replace_user_rows(
+        self,
+        table: str,
+        user_ids: List[str],
+        rows: List[Dict[str, Any]],
+        service: bool = True,
+    ) -> int:
+        await db.run(
+            f"{table}.delete",
+            lambda client: client.table(table).delete().in_("user_id", user_ids),
+            service=service,
+        )
+        return await self.insert_rows(table, rows, service=service)
+
+    async def upsert_rows(
+        self, table: str, rows: List[Dict[str, Any]], key: str, service: bool = True
+    ) -> int:
+        if not rows:
+            return 0
+        await db.run(
+            f"{table}.upsert",
+            lambda client: client.table(table).upsert(rows, on_conflict=key),
+            service=service,
+        )
+        return len(rows)
+
+    def query_stats(self) -> Dict[str, Dict[str, Any]]:
+        return db.query_stats()
+
+    def close(self) -> None:
+        db.close()
+
+
+_repository: Optional[RecipeRepository] = None
+
+
+def get_repository() -> RecipeRepository:
+    """Process-wide repository for the configured AGENT_STORAGE_BACKEND"""
+    global _repository
+    if _repository is None:
+        if AGENT_STORAGE_BACKEND == "sqlite":
+            from sqlite_repository import SQLiteRepository
+
+            _repository = SQLiteRepository()
+        else:
+            _repository = SupabaseRepository()
+        logger.info(f"Using {_repository.name} storage backend")
+    return _repository
+
+
+def set_repository(repository: Optional[RecipeRepository]) -> None:
+    """Swap the process-wide repository (tests, benchmarks)"""
+    global _repository
+    _repository = repository
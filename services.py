@@ -0,0 +1,180 @@
+"""
+Lazily initialized service container
+Owns the process-wide OpenAI client and the recipe crawler module and runs
+startup/shutdown for background services. Nothing heavy is imported or
+connected until first use or until start() warms it up from the FastAPI
+lifespan, so importing the API (tests, cold starts) stays fast.
+"""
+
+import asyncio
+import importlib
+import logging
+import os
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Dict, Optional
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+logger = logging.getLogger(__name__)
+
+_env_loaded = False
+
+
+def load_environment() -> None:
+    """Load .env once; call before importing modules that read env constants"""
+    global _env_loaded
+    if not _env_loaded:
+        from dotenv import load_dotenv
+
+        load_dotenv()
+        _env_loaded = True
+
+
+load_environment()
+
+# "1": the lifespan waits for warm-up, so the server only accepts traffic once
+# ready. "0": warm-up runs in the background and /ready reports 503 until done.
+SERVICE_WARMUP_BLOCKING = os.environ.get("SERVICE_WARMUP_BLOCKING", "1") != "0"
+
+
+class ServiceContainer:
+    """
+    Process-wide services created on first use.
+
+    start() validates configuration, warms up clients and imports and starts
+    background services; stop() shuts them down in reverse. ready is only
+    set once warm-up has finished.
+    """
+
+    def __init__(self):
+        self._openai: Optional["OpenAI"] = None
+        self._lock = threading.Lock()
+        self._warmup_task: Optional[asyncio.Task] = None
+        self.ready = False
+        self.started_at: Optional[float] = None
+        self.warmup_error: Optional[str] = None
+        self.warmup_timings: Dict[str, float] = {}
+
+    # Lazy services
+
+    @property
+    def openai(self) -> "OpenAI":
+        """OpenAI client, created on first use"""
+        if self._openai is None:
+            with self._lock:
+                if self._openai is None:
+                    api_key = os.environ.get("OPENAI_API_KEY")
+                    if not api_key:
+                        raise RuntimeError("OPENAI_API_KEY environment variable must be set")
+                    from openai import OpenAI
+
+                    self._openai = OpenAI(api_key=api_key)
+        return self._openai
+
+    def crawler(self) -> Any:
+        """New RecipeCrawler; the module (httpx, bs4) is imported on first call"""
+        from recipe_crawler import RecipeCrawler
+
+        return RecipeCrawler()
+
+    # Lifecycle
+
+    def check_config(self) -> None:
+        from repository import AGENT_STORAGE_BACKEND
+
+        if not os.environ.get("OPENAI_API_KEY"):
+            raise RuntimeError("Missing API keys or Supabase credentials in environment.")
+        if AGENT_STORAGE_BACKEND == "supabase" and (
+            not os.environ.get("SUPABASE_URL") or not os.environ.get("SUPABASE_KEY")
+        ):
+            raise RuntimeError("Missing API keys or Supabase credentials in environment.")
+
+    async def start(self) -> None:
+        self.started_at = time.perf_counter()
+        self.check_config()
+        if SERVICE_WARMUP_BLOCKING:
+            await self._warm_up()
+            if self.warmup_error:
+                raise RuntimeError(f"Service warm-up failed: {self.warmup_error}")
+        else:
+            self._warmup_task = asyncio.create_task(self._warm_up())
+
+    async def _warm_up(self) -> None:
+        from supabase_sources import source_registry
+        from write_behind import write_queue
+
+        try:
+            # Blocking imports and client construction run off the event loop
+            await self._step("openai", lambda: self.openai)
+            await self._step("crawler", lambda: importlib.import_module("recipe_crawler"))
+            await self._step("ranker", lambda: importlib.import_module("recipe_ranker"))
+            await self._step("storage", self._warm_storage)
+            await self._step("sources", source_registry.start)
+            await self._step("write_queue", write_queue.start)
+            self.ready = True
+            total_ms = (time.perf_counter() - self.started_at) * 1000
+            logger.info(f"Services ready in {total_ms:.0f}ms: {self.warmup_timings}")
+        except Exception as e:
+            self.warmup_error = str(e)
+            logger.error(f"Service warm-up failed: {e}")
+
+    async def _step(self, name: str, fn) -> None:
+        start = time.perf_counter()
+        if asyncio.iscoroutinefunction(fn):
+            await fn()
+        else:
+            await asyncio.to_thread(fn)
+        self.warmup_timings[name] = round((time.perf_counter() - start) * 1000, 1)
+
+    def _warm_storage(self) -> None:
+        from repository import get_repository
+
+        repository = get_repository()
+        if repository.name == "supabase":
+            from data_access import db
+
+            # Builds the clients and the shared HTTP pool
+            db.anon
+            try:
+                db.service
+            except ValueError as e:
+                logger.warning(f"Service-role client not warmed up: {e}")
+
+    async def stop(self) -> None:
+        from recipe_bulk_storage import RECIPE_STORAGE_BACKEND
+        from repository import get_repository
+        from supabase_sources import source_registry
+        from tracing import exporter
+        from write_behind import write_queue
+
+        self.ready = False
+        if self._warmup_task is not None and not self._warmup_task.done():
+            self._warmup_task.cancel()
+        # Drain queued agent_logs / recipe_search writes before exiting
+        await write_queue.stop()
+        await asyncio.to_thread(exporter.close)
+        await source_registry.stop()
+        if RECIPE_STORAGE_BACKEND == "postgres":
+            from postgres_storage import close_postgres_storage
+
+            await close_postgres_storage()
+        get_repository().close()
+        if self._openai is not None:
+            self._openai.close()
+            self._openai = None
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "warmup_ms": self.warmup_timings,
+            "error": self.warmup_error,
+        }
+
+
+services = ServiceContainer()
+
+
+def get_services() -> ServiceContainer:
+    return services
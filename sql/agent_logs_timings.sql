@@ -0,0 +1,7 @@
+-- Per-request stage timings from tracing.Trace.summary(), written by
+-- log_agent_activity next to results_count:
+-- {"trace_id": "...", "total_ms": 1234.5,
+--  "stages": {"llm_extraction": {"ms": 812.3, "count": 1}, ...},
+--  "sources": {"allrecipes": {"ms": 340.1, "count": 4}, ...}}
+
+ALTER TABLE agent_logs ADD COLUMN IF NOT EXISTS timings jsonb;
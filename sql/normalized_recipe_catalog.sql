@@ -0,0 +1,44 @@
+-- Normalized recipe storage (RECIPE_STORAGE_MODE=normalized)
+-- Each recipe is stored once in recipe_catalog; recipe_search keeps only
+-- (user_id, recipe_id, rank, created_at) per result.
+
+CREATE TABLE IF NOT EXISTS recipe_catalog (
+    recipe_id text PRIMARY KEY,          -- sha256(canonical_url), first 32 hex chars
+    canonical_url text NOT NULL UNIQUE,
+    source_url text NOT NULL,
+    title text NOT NULL,
+    description text,
+    image_url text,
+    ingredients jsonb,
+    instructions jsonb,
+    macros jsonb,
+    servings integer,
+    site_name text,
+    created_at timestamptz NOT NULL DEFAULT now()
+);
+
+-- Link columns on recipe_search; the full-recipe columns stay nullable so
+-- denormalized rows written before the switch remain readable.
+ALTER TABLE recipe_search ADD COLUMN IF NOT EXISTS recipe_id text REFERENCES recipe_catalog (recipe_id);
+ALTER TABLE recipe_search ADD COLUMN IF NOT EXISTS rank integer;
+CREATE INDEX IF NOT EXISTS recipe_search_user_id_idx ON recipe_search (user_id);
+
+-- Full results for readers (MealPlanner) regardless of storage mode
+CREATE OR REPLACE VIEW recipe_search_full AS
+SELECT
+    s.id,
+    s.user_id,
+    s.rank,
+    s.created_at,
+    COALESCE(c.title, s.title) AS title,
+    COALESCE(c.description, s.description) AS description,
+    COALESCE(c.image_url, s.image_url) AS image_url,
+    COALESCE(c.ingredients, s.ingredients) AS ingredients,
+    COALESCE(c.instructions, s.instructions) AS instructions,
+    COALESCE(c.macros, s.macros) AS macros,
+    COALESCE(c.servings, s.servings) AS servings,
+    COALESCE(c.source_url, s.source_url) AS source_url,
+    COALESCE(c.site_name, s.site_name) AS site_name,
+    s.recipe_id
+FROM recipe_search s
+LEFT JOIN recipe_catalog c ON c.recipe_id = s.recipe_id;
@@ -0,0 +1,34 @@
+-- Diets each recipe's ingredients comply with, from diet_classifier
+-- (["vegan", "vegetarian", "keto", "gluten-free", "dairy-free"] or a subset).
+-- Run after recipe_times.sql.
+
+ALTER TABLE recipe_search ADD COLUMN IF NOT EXISTS diet_tags jsonb;
+ALTER TABLE recipe_catalog ADD COLUMN IF NOT EXISTS diet_tags jsonb;
+
+-- Catalog lookups such as diet_tags @> '["vegan"]'
+CREATE INDEX IF NOT EXISTS recipe_catalog_diet_tags_idx ON recipe_catalog USING gin (diet_tags);
+
+-- Expose them through the normalized read view (new columns go last)
+CREATE OR REPLACE VIEW recipe_search_full AS
+SELECT
+    s.id,
+    s.user_id,
+    s.rank,
+    s.created_at,
+    COALESCE(c.title, s.title) AS title,
+    COALESCE(c.description, s.description) AS description,
+    COALESCE(c.image_url, s.image_url) AS image_url,
+    COALESCE(c.ingredients, s.ingredients) AS ingredients,
+    COALESCE(c.instructions, s.instructions) AS instructions,
+    COALESCE(c.macros, s.macros) AS macros,
+    COALESCE(c.servings, s.servings) AS servings,
+    COALESCE(c.source_url, s.source_url) AS source_url,
+    COALESCE(c.site_name, s.site_name) AS site_name,
+    s.recipe_id,
+    COALESCE(c.parsed_ingredients, s.parsed_ingredients) AS parsed_ingredients,
+    COALESCE(c.prep_time, s.prep_time) AS prep_time,
+    COALESCE(c.cook_time, s.cook_time) AS cook_time,
+    COALESCE(c.total_time, s.total_time) AS total_time,
+    COALESCE(c.diet_tags, s.diet_tags) AS diet_tags
+FROM recipe_search s
+LEFT JOIN recipe_catalog c ON c.recipe_id = s.recipe_id;
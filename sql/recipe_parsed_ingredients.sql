@@ -0,0 +1,29 @@
+-- Structured ingredients from ingredient_parser, one object per entry of
+-- ingredients, in the same order:
+-- [{"text": "1 (15 ounce) can chickpeas, drained", "quantity": 1.0,
+--   "quantity_max": null, "unit": "can", "name": "chickpeas",
+--   "note": "15 ounce; drained"}, ...]
+
+ALTER TABLE recipe_search ADD COLUMN IF NOT EXISTS parsed_ingredients jsonb;
+ALTER TABLE recipe_catalog ADD COLUMN IF NOT EXISTS parsed_ingredients jsonb;
+
+-- Expose them through the normalized read view (new columns go last)
+CREATE OR REPLACE VIEW recipe_search_full AS
+SELECT
+    s.id,
+    s.user_id,
+    s.rank,
+    s.created_at,
+    COALESCE(c.title, s.title) AS title,
+    COALESCE(c.description, s.description) AS description,
+    COALESCE(c.image_url, s.image_url) AS image_url,
+    COALESCE(c.ingredients, s.ingredients) AS ingredients,
+    COALESCE(c.instructions, s.instructions) AS instructions,
+    COALESCE(c.macros, s.macros) AS macros,
+    COALESCE(c.servings, s.servings) AS servings,
+    COALESCE(c.source_url, s.source_url) AS source_url,
+    COALESCE(c.site_name, s.site_name) AS site_name,
+    s.recipe_id,
+    COALESCE(c.parsed_ingredients, s.parsed_ingredients) AS parsed_ingredients
+FROM recipe_search s
+LEFT JOIN recipe_catalog c ON c.recipe_id = s.recipe_id;
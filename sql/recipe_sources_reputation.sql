@@ -0,0 +1,6 @@
+-- Optional per-source reputation (0-1) used by recipe_ranker as a ranking
+-- prior; blended with the observed fetch success rate. NULL falls back to
+-- RECIPE_SOURCE_REPUTATION.
+
+ALTER TABLE recipe_sources ADD COLUMN IF NOT EXISTS reputation real
+    CHECK (reputation IS NULL OR (reputation >= 0 AND reputation <= 1));
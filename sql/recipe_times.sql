@@ -0,0 +1,35 @@
+-- Preparation, cooking and total time in minutes, parsed from the
+-- schema.org prepTime, cookTime and totalTime durations (durations.py).
+-- total_time falls back to prep_time + cook_time when the page has no
+-- totalTime. Run after recipe_parsed_ingredients.sql.
+
+ALTER TABLE recipe_search ADD COLUMN IF NOT EXISTS prep_time integer;
+ALTER TABLE recipe_search ADD COLUMN IF NOT EXISTS cook_time integer;
+ALTER TABLE recipe_search ADD COLUMN IF NOT EXISTS total_time integer;
+ALTER TABLE recipe_catalog ADD COLUMN IF NOT EXISTS prep_time integer;
+ALTER TABLE recipe_catalog ADD COLUMN IF NOT EXISTS cook_time integer;
+ALTER TABLE recipe_catalog ADD COLUMN IF NOT EXISTS total_time integer;
+
+-- Expose them through the normalized read view (new columns go last)
+CREATE OR REPLACE VIEW recipe_search_full AS
+SELECT
+    s.id,
+    s.user_id,
+    s.rank,
+    s.created_at,
+    COALESCE(c.title, s.title) AS title,
+    COALESCE(c.description, s.description) AS description,
+    COALESCE(c.image_url, s.image_url) AS image_url,
+    COALESCE(c.ingredients, s.ingredients) AS ingredients,
+    COALESCE(c.instructions, s.instructions) AS instructions,
+    COALESCE(c.macros, s.macros) AS macros,
+    COALESCE(c.servings, s.servings) AS servings,
+    COALESCE(c.source_url, s.source_url) AS source_url,
+    COALESCE(c.site_name, s.site_name) AS site_name,
+    s.recipe_id,
+    COALESCE(c.parsed_ingredients, s.parsed_ingredients) AS parsed_ingredients,
+    COALESCE(c.prep_time, s.prep_time) AS prep_time,
+    COALESCE(c.cook_time, s.cook_time) AS cook_time,
+    COALESCE(c.total_time, s.total_time) AS total_time
+FROM recipe_search s
+LEFT JOIN recipe_catalog c ON c.recipe_id = s.recipe_id;
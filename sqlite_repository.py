@@ -0,0 +1,331 @@
+"""
+Embedded SQLite implementation of RecipeRepository
+All agent data in one local file (WAL mode) for single-node deployments,
+load tests and latency comparisons against Supabase
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from data_access import QueryStats
+from repository import RecipeRepository
+
+logger = logging.getLogger(__name__)
+
+SQLITE_PATH = os.environ.get("SQLITE_PATH", "kitchnsync.db")
+
+# Columns holding lists/dicts; stored as JSON text and decoded on read
+JSON_COLUMNS = {
+    "allergies",
+    "disliked_ingredients",
+    "included_ingredients",
+    "excluded_ingredients",
+    "ingredients",
+    "parsed_ingredients",
+    "diet_tags",
+    "instructions",
+    "macros",
+    "timings",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS user_settings (
+    user_id TEXT PRIMARY KEY,
+    diet_type TEXT,
+    allergies TEXT,
+    disliked_ingredients TEXT,
+    included_ingredients TEXT,
+    excluded_ingredients TEXT
+);
+CREATE TABLE IF NOT EXISTS hated_recipes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    recipe_title TEXT,
+    source_url TEXT
+);
+CREATE INDEX IF NOT EXISTS hated_recipes_user_id_idx ON hated_recipes (user_id);
+CREATE TABLE IF NOT EXISTS saved_recipes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    recipe_title TEXT,
+    source_url TEXT
+);
+CREATE INDEX IF NOT EXISTS saved_recipes_user_id_idx ON saved_recipes (user_id);
+CREATE TABLE IF NOT EXISTS recipe_sources (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    site_name TEXT,
+    url_template TEXT NOT NULL,
+    active INTEGER NOT NULL DEFAULT 1,
+    max_concurrency INTEGER,
+    reputation REAL
+);
+CREATE TABLE IF NOT EXISTS agent_logs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT,
+    prompt TEXT,
+    results_count INTEGER,
+    timings TEXT,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS recipe_catalog (
+    recipe_id TEXT PRIMARY KEY,
+    canonical_url TEXT NOT NULL UNIQUE,
+    source_url TEXT NOT NULL,
+    title TEXT NOT NULL,
+    description TEXT,
+    image_url TEXT,
+    ingredients TEXT,
+    parsed_ingredients TEXT,
+    instructions TEXT,
+    macros TEXT,
+    servings INTEGER,
+    prep_time INTEGER,
+    cook_time INTEGER,
+    total_time INTEGER,
+    diet_tags TEXT,
+    site_name TEXT,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS recipe_search (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    title TEXT,
+    description TEXT,
+    image_url TEXT,
+    ingredients TEXT,
+    parsed_ingredients TEXT,
+    instructions TEXT,
+    macros TEXT,
+    servings INTEGER,
+    prep_time INTEGER,
+    cook_time INTEGER,
+    total_time INTEGER,
+    diet_tags TEXT,
+    source_url TEXT,
+    site_name TEXT,
+    recipe_id TEXT REFERENCES recipe_catalog (recipe_id),
+    rank INTEGER,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS recipe_search_user_id_idx ON recipe_search (user_id);
+"""
+
+
+def _encode(column: str, value: Any) -> Any:
+    if isinstance(value, (list, dict)):
+        return json.dumps(value)
+    if isinstance(value, bool):
+        return int(value)
+    return value
+
+
+def _decode_row(row: sqlite3.Row) -> Dict[str, Any]:
+    decoded = {}
+    for column in row.keys():
+        value = row[column]
+        if column in JSON_COLUMNS and isinstance(value, str):
+            try:
+                value = json.loads(value)
+            except ValueError:
+                pass
+        decoded[column] = value
+    return decoded
+
+
+class SQLiteRepository(RecipeRepository):
+    """
+    RecipeRepository backed by a local SQLite file.
+
+    Each worker thread gets its own connection so WAL readers run
+    concurrently; writes are serialized with a lock. Blocking calls run in
+    the default executor so the event loop never waits on disk.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or SQLITE_PATH
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._write_lock = threading.Lock()
+        self._columns: Dict[str, set] = {}
+        self._stats: Dict[str, QueryStats] = {}
+        with self._write_lock:
+            self._connection().executescript(SCHEMA)
+        logger.info(f"Opened SQLite repository at {self.path}")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=OFF")
+            self._local.conn = conn
+            self._connections.append(conn)
+        return conn
+
+    async def _run(self, label: str, fn, *args) -> Any:
+        return await asyncio.to_thread(self._timed, label, fn, *args)
+
+    def _timed(self, label: str, fn, *args) -> Any:
+        start = time.perf_counter()
+        ok = False
+        try:
+            result = fn(*args)
+            ok = True
+            return result
+        finally:
+            stats = self._stats.setdefault(label, QueryStats())
+            stats.record((time.perf_counter() - start) * 1000, ok)
+
+    # Reads
+
+    def _select(self, sql: str, params: tuple = ()) -> List[Dict[str, Any]]:
+        return [_decode_row(row) for row in self._connection().execute(sql, params)]
+
+    async def get_user_settings(self, user_id: str) -> Dict[str, Any]:
+        rows = await self._run(
+            "user_settings.select",
+            self._select,
+            "SELECT * FROM user_settings WHERE user_id = ? LIMIT 1",
+            (user_id,),
+        )
+        return rows[0] if rows else {}
+
+    async def get_hated_recipe_urls(self, user_id: str) -> List[str]:
+        return await self._user_source_urls("hated_recipes", user_id)
+
+    async def get_saved_recipe_urls(self, user_id: str) -> List[str]:
+        return await self._user_source_urls("saved_recipes", user_id)
+
+    async def _user_source_urls(self, table: str, user_id: str) -> List[str]:
+        rows = await self._run(
+            f"{table}.select",
+            self._select,
+            f"SELECT source_url FROM {table} WHERE user_id = ? AND source_url IS NOT NULL",
+            (user_id,),
+        )
+        return [row["source_url"] for row in rows]
+
+    async def get_active_sources(self) -> List[Dict[str, Any]]:
+        rows = await self._run(
+            "recipe_sources.select",
+            self._select,
+            "SELECT * FROM recipe_sources WHERE active = 1",
+        )
+        for row in rows:
+            row["active"] = bool(row["active"])
+        return rows
+
+    async def get_recipe_searches(self, user_id: str) -> List[Dict[str, Any]]:
+        return await self._run(
+            "recipe_search.select",
+            self._select,
+            "SELECT * FROM recipe_search WHERE user_id = ? ORDER BY id",
+            (user_id,),
+        )
+
+    async def count_recipe_searches(self, user_id: str) -> int:
+        rows = await self._run(
+            "recipe_search.count",
+            self._select,
+            "SELECT count(*) AS n FROM recipe_search WHERE user_id = ?",
+            (user_id,),
+        )
+        return rows[0]["n"] if rows else 0
+
+    # Writes
+
+    def _table_columns(self, conn: sqlite3.Connection, table: str) -> set:
+        columns = self._columns.get(table)
+        if columns is None:
+            columns = {row["name"] for row in conn.execute("SELECT name FROM pragma_table_info(?)", (table,))}
+            if not columns:
+                raise ValueError(f"Unknown table: {table}")
+            self._columns[table] = columns
+        return columns
+
+    def _row_columns(self, conn: sqlite3.Connection, table: str, rows) -> List[str]:
+        """Column list covering every key in rows; keys SCHEMA doesn't define are rejected"""
+        columns = self._table_columns(conn, table)
+        wanted = list(dict.fromkeys(key for row in rows for key in row))
+        unknown = [column for column in wanted if column not in columns]
+        if unknown:
+            raise ValueError(f"Unknown columns for {table}: {', '.join(unknown)}")
+        return wanted
+
+    def _insert(self, conn: sqlite3.Connection, table: str, rows, conflict_key=None) -> int:
+        """Insert rows; with conflict_key, rows whose key exists update that row"""
+        if not rows:
+            return 0
+        columns = self._row_columns(conn, table, rows)
+        column_list = ", ".join(f'"{column}"' for column in columns)
+        placeholders = ", ".join("?" for _ in columns)
+        sql = f"INSERT INTO {table} ({column_list}) VALUES ({placeholders})"
+        if conflict_key is not None:
+            updates = ", ".join(
+                f'"{column}" = excluded."{column}"' for column in columns if column != conflict_key
+            )
+            sql += f' ON CONFLICT ("{conflict_key}") DO ' + (f"UPDATE SET {updates}" if updates else "NOTHING")
+        conn.executemany(
+            sql,
+            [tuple(_encode(column, row.get(column)) for column in columns) for row in rows],
+        )
+        return len(rows)
+
+    def _write(self, fn, *args) -> int:
+        with self._write_lock:
+            conn = self._connection()
+            with conn:
+                return fn(conn, *args)
+
+    async def insert_rows(
+        self, table: str, rows: List[Dict[str, Any]], service: bool = True
+    ) -> int:
+        return await self._run(f"{table}.insert", self._write, self._insert, table, rows)
+
+    async def replace_user_rows(
+        self,
+        table: str,
+        user_ids: List[str],
+        rows: List[Dict[str, Any]],
+        service: bool = True,
+    ) -> int:
+        def replace(conn, table, user_ids, rows):
+            self._table_columns(conn, table)  # rejects unknown tables before the DELETE
+            placeholders = ", ".join("?" for _ in user_ids)
+            conn.execute(f"DELETE FROM {table} WHERE user_id IN ({placeholders})", user_ids)
+            return self._insert(conn, table, rows)
+
+        return await self._run(
+            f"{table}.replace", self._write, replace, table, list(user_ids), rows
+        )
+
+    async def upsert_rows(
+        self, table: str, rows: List[Dict[str, Any]], key: str, service: bool = True
+    ) -> int:
+        # key is the table's primary/unique key
+        return await self._run(
+            f"{table}.upsert",
+            self._write,
+            lambda conn, table, rows: self._insert(conn, table, rows, conflict_key=key),
+            table,
+            rows,
+        )
+
+    def query_stats(self) -> Dict[str, Dict[str, Any]]:
+        return {label: stats.as_dict() for label, stats in self._stats.items()}
+
+    def close(self) -> None:
+        for conn in self._connections:
+            conn.close()
+        self._connections = []
+        self._local = threading.local()
@@ -1,58 +1,296 @@
 """
 Supabase integration for fetching recipe sources
+
+Active sources are served from an in-process registry that is loaded at
+startup and refreshed in the background, so crawls never wait on Supabase.
 """
 
 import os
+import asyncio
 import logging
-from typing import List, Dict
-from supabase import create_client, Client
+import time
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import TYPE_CHECKING, List, Dict, Optional, Tuple
+from urllib.parse import urlparse
+from data_access import db
+from repository import get_repository
+
+if TYPE_CHECKING:
+    from supabase import Client
 
 logger = logging.getLogger(__name__)
 
+# Seconds between background refreshes of the recipe_sources snapshot
+SOURCES_REFRESH_INTERVAL = float(os.environ.get("RECIPE_SOURCES_REFRESH_SECONDS", "300"))
+# Default per-source concurrency when the row has no max_concurrency column
+DEFAULT_SOURCE_CONCURRENCY = int(os.environ.get("RECIPE_SOURCE_MAX_CONCURRENCY", "4"))
+# Consecutive fetch failures before a source is skipped until its cooldown ends
+SOURCE_FAILURE_THRESHOLD = int(os.environ.get("RECIPE_SOURCE_FAILURE_THRESHOLD", "3"))
+SOURCE_COOLDOWN_SECONDS = float(os.environ.get("RECIPE_SOURCE_COOLDOWN_SECONDS", "120"))
+# Reputation (0-1) for sources without a reputation column, and for unknown hosts
+DEFAULT_SOURCE_REPUTATION = float(os.environ.get("RECIPE_SOURCE_REPUTATION", "0.5"))
+
+
+def get_supabase_client() -> "Client":
+    """Shared Supabase client with anon key"""
+    return db.anon
+
+
+@lru_cache(maxsize=256)
+def compile_url_template(url_template: str) -> Optional[Tuple[str, ...]]:
+    """
+    Split a url_template on its {query} placeholder once so building a search
+    URL is a plain string join. Returns None for templates without {query}.
+    """
+    if "{query}" not in url_template:
+        return None
+    # Resolve escaped braces the same way str.format would
+    return tuple(
+        part.replace("{{", "{").replace("}}", "}")
+        for part in url_template.split("{query}")
+    )
+
+
+@dataclass
+class SourceHealth:
+    """Fetch outcome counters for a single recipe source"""
+
+    successes: int = 0
+    failures: int = 0
+    consecutive_failures: int = 0
+    last_error: Optional[str] = None
+    last_failure_at: float = 0.0
+
+    @property
+    def healthy(self) -> bool:
+        if self.consecutive_failures < SOURCE_FAILURE_THRESHOLD:
+            return True
+        # Give the source another chance once the cooldown has passed
+        return time.monotonic() - self.last_failure_at >= SOURCE_COOLDOWN_SECONDS
+
+    @property
+    def success_rate(self) -> float:
+        # Smoothed so a source with no fetches yet sits at 0.5
+        return (self.successes + 1) / (self.successes + self.failures + 2)
+
+
+@dataclass
+class CompiledSource:
+    """A recipe_sources row with its precompiled template and runtime metadata"""
+
+    id: Optional[int]
+    site_name: str
+    url_template: str
+    parts: Tuple[str, ...]
+    host: str
+    max_concurrency: int
+    reputation: float = DEFAULT_SOURCE_REPUTATION
+    health: SourceHealth = field(default_factory=SourceHealth)
+
+    def build_url(self, formatted_query: str) -> str:
+        return formatted_query.join(self.parts)
+
+    def as_dict(self) -> Dict:
+        return {
+            "id": self.id,
+            "site_name": self.site_name,
+            "url_template": self.url_template,
+            "active": True,
+            "host": self.host,
+            "max_concurrency": self.max_concurrency,
+            "reputation": self.reputation,
+        }
+
+
+class RecipeSourceRegistry:
+    """
+    In-memory snapshot of active recipe sources.
+
+    The snapshot is loaded once at startup and refreshed on an interval by a
+    background task. If Supabase is unreachable the last good snapshot keeps
+    being served.
+    """
+
+    def __init__(self, refresh_interval: float = SOURCES_REFRESH_INTERVAL):
+        self.refresh_interval = refresh_interval
+        self._sources: List[CompiledSource] = []
+        self._by_host: Dict[str, CompiledSource] = {}
+        self._loaded_at: Optional[float] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._refresh_lock = asyncio.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded_at is not None
+
+    async def start(self) -> None:
+        """Load the initial snapshot and start the background refresh loop"""
+        await self.refresh()
+        if self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self) -> None:
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+            self._refresh_task = None
 
-def get_supabase_client() -> Client:
-    """Initialize Supabase client"""
-    url = os.environ.get("SUPABASE_URL")
-    key = os.environ.get("SUPABASE_KEY")
+    async def _refresh_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            await self.refresh()
 
-    if not url or not key:
-        raise ValueError(
-            "SUPABASE_URL and SUPABASE_KEY environment variables must be set"
+    async def refresh(self) -> bool:
+        """
+        Reload the snapshot from the storage repository.
+        Returns False (and keeps the previous snapshot) on failure.
+        """
+        async with self._refresh_lock:
+            try:
+                rows = await get_repository().get_active_sources()
+            except Exception as e:
+                logger.error(
+                    f"Error refreshing recipe sources, keeping "
+                    f"{len(self._sources)} cached sources: {e}"
+                )
+                return False
+
+            self._install(rows)
+            return True
+
+    def _install(self, rows: List[Dict]) -> None:
+        sources = []
+        by_host = {}
+        for row in rows:
+            compiled = self._compile_source(row)
+            if compiled is None:
+                continue
+            # Carry health across refreshes so a reload doesn't reset failures
+            previous = self._by_host.get(compiled.host)
+            if previous is not None:
+                compiled.health = previous.health
+            sources.append(compiled)
+            by_host[compiled.host] = compiled
+
+        self._sources = sources
+        self._by_host = by_host
+        self._loaded_at = time.monotonic()
+
+        if sources:
+            logger.info(f"Loaded {len(sources)} active recipe sources")
+        else:
+            logger.warning("No active recipe sources found")
+
+    def _compile_source(self, row: Dict) -> Optional[CompiledSource]:
+        url_template = row.get("url_template") or ""
+        site_name = row.get("site_name") or "Unknown"
+        parts = compile_url_template(url_template)
+        if parts is None:
+            logger.warning(
+                f"Invalid URL template for {site_name}: {url_template} (missing {{query}} placeholder)"
+            )
+            return None
+
+        try:
+            max_concurrency = int(row.get("max_concurrency") or DEFAULT_SOURCE_CONCURRENCY)
+        except (TypeError, ValueError):
+            max_concurrency = DEFAULT_SOURCE_CONCURRENCY
+
+        try:
+            reputation = float(row["reputation"]) if row.get("reputation") is not None else DEFAULT_SOURCE_REPUTATION
+        except (TypeError, ValueError):
+            reputation = DEFAULT_SOURCE_REPUTATION
+
+        return CompiledSource(
+            id=row.get("id"),
+            site_name=site_name,
+            url_template=url_template,
+            parts=parts,
+            host=source_host(url_template),
+            max_concurrency=max(1, max_concurrency),
+            reputation=min(max(reputation, 0.0), 1.0),
         )
 
-    return create_client(url, key)
+    def get_sources(self) -> List[CompiledSource]:
+        """Healthy sources from the current snapshot (all of them if none are healthy)"""
+        healthy = [source for source in self._sources if source.health.healthy]
+        return healthy or list(self._sources)
+
+    def get_source(self, url: str) -> Optional[CompiledSource]:
+        return self._by_host.get(source_host(url))
+
+    def reputation(self, url: str) -> float:
+        """Ranking prior (0-1) for the source owning url: configured reputation and fetch success, equally weighted"""
+        source = self.get_source(url)
+        if source is None:
+            return DEFAULT_SOURCE_REPUTATION
+        return (source.reputation + source.health.success_rate) / 2
+
+    def record_fetch(self, url: str, ok: bool, error: Optional[str] = None) -> None:
+        """Update health for the source that owns url"""
+        source = self.get_source(url)
+        if source is None:
+            return
+        health = source.health
+        if ok:
+            health.successes += 1
+            health.consecutive_failures = 0
+        else:
+            health.failures += 1
+            health.consecutive_failures += 1
+            health.last_error = error
+            health.last_failure_at = time.monotonic()
+            if health.consecutive_failures == SOURCE_FAILURE_THRESHOLD:
+                logger.warning(
+                    f"Recipe source {source.site_name} marked unhealthy after "
+                    f"{health.consecutive_failures} failures: {error}"
+                )
+
+    def stats(self) -> List[Dict]:
+        return [
+            {
+                **source.as_dict(),
+                "healthy": source.health.healthy,
+                "successes": source.health.successes,
+                "failures": source.health.failures,
+                "last_error": source.health.last_error,
+            }
+            for source in self._sources
+        ]
+
+
+def source_host(url: str) -> str:
+    return urlparse(url).netloc.lower()
+
+
+source_registry = RecipeSourceRegistry()
 
 
 async def get_active_recipe_sources() -> List[Dict[str, str]]:
     """
-    Fetch active recipe sources from Supabase recipe_sources table
+    Return active recipe sources from the in-process registry
     Returns list of active source configurations with URL templates
     """
     try:
-        supabase = get_supabase_client()
-
-        # Query active recipe sources from Supabase
-        response = (
-            supabase.table("recipe_sources")
-            .select("id, site_name, url_template, active")
-            .eq("active", True)
-            .execute()
-        )
-
-        if response.data:
-            logger.info(
-                f"Fetched {len(response.data)} active recipe sources from Supabase"
-            )
-            return response.data
-        else:
-            logger.warning("No active recipe sources found in Supabase")
-            return []
+        if not source_registry.loaded:
+            # Not started from the app lifespan (scripts, tests): load on demand
+            await source_registry.refresh()
+        return [source.as_dict() for source in source_registry.get_sources()]
 
     except Exception as e:
-        logger.error(f"Error fetching recipe sources from Supabase: {e}")
+        logger.error(f"Error fetching recipe sources from registry: {e}")
         return []  # Return empty list instead of raising to prevent agent failure
 
 
+def search_query_key(prompt: str) -> str:
+    """Prompts that produce the same search (case and spacing ignored) share a key"""
+    return " ".join(prompt.lower().split())
+
+
 def build_search_urls(enhanced_prompt: str, sources: List[Dict[str, str]]) -> List[str]:
     """
     Build search URLs from recipe sources and enhanced prompt with user context
@@ -73,8 +311,9 @@ def build_search_urls(enhanced_prompt: str, sources: List[Dict[str, str]]) -> Li
         url_template = source.get("url_template", "")
         site_name = source.get("site_name", "Unknown")
 
-        if "{query}" in url_template:
-            search_url = url_template.format(query=formatted_query)
+        parts = compile_url_template(url_template)
+        if parts is not None:
+            search_url = formatted_query.join(parts)
             urls.append(search_url)
             logger.info(f"Built search URL for {site_name}: {search_url}")
         else:
@@ -0,0 +1,134 @@
+"""
+Offline tests for admission control: token buckets and slot queueing
+"""
+
+import asyncio
+
+import pytest
+
+import admission as admission_module
+from admission import AdmissionController, AdmissionRejected
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(admission_module.time, "monotonic", clock)
+    return clock
+
+
+def controller(**kwargs):
+    options = {"max_in_flight": 2, "max_queue": 4, "queue_timeout": 1, "rate_per_minute": 60, "burst": 2}
+    return AdmissionController(**{**options, **kwargs})
+
+
+def admit(gate, *user_ids, slots=1):
+    async def run():
+        taken = await gate.acquire(*user_ids, slots=slots)
+        gate.release(taken)
+
+    asyncio.run(run())
+
+
+def test_burst_then_refill(clock):
+    gate = controller()
+    admit(gate, "u1")
+    admit(gate, "u1")
+    with pytest.raises(AdmissionRejected) as rejected:
+        admit(gate, "u1")
+    assert rejected.value.status_code == 429
+    assert rejected.value.retry_after == 1
+    # Other users have their own bucket
+    admit(gate, "u2")
+    clock.now += 1
+    admit(gate, "u1")
+
+
+def test_batch_takes_one_token_per_distinct_user(clock):
+    gate = controller()
+    admit(gate, "u1", "u2", "u1")
+    admit(gate, "u1")
+    # u1 is out of tokens, so the batch is refused without charging u2
+    with pytest.raises(AdmissionRejected):
+        admit(gate, "u1", "u2")
+    admit(gate, "u2")
+    with pytest.raises(AdmissionRejected):
+        admit(gate, "u2")
+
+
+def test_zero_rate_disables_limiting(clock):
+    gate = controller(rate_per_minute=0)
+    for _ in range(10):
+        admit(gate, "u1")
+    assert gate.stats.rate_limited == 0
+
+
+def test_waiters_are_admitted_in_order_as_slots_free():
+    gate = controller(rate_per_minute=0)
+    order = []
+
+    async def request(name, hold):
+        async with gate.admit(slots=1):
+            order.append(name)
+            await hold.wait()
+
+    async def run():
+        holds = [asyncio.Event() for _ in range(4)]
+        tasks = [asyncio.create_task(request(i, hold)) for i, hold in enumerate(holds)]
+        await asyncio.sleep(0)
+        assert gate.in_flight == 2 and gate.queue_depth == 2
+        for hold in holds:
+            hold.set()
+            await asyncio.sleep(0)
+        await asyncio.gather(*tasks)
+
+    asyncio.run(run())
+    assert order == [0, 1, 2, 3]
+    assert gate.in_flight == 0
+
+
+def test_batch_slots_are_sized_and_capped():
+    gate = controller(rate_per_minute=0, max_in_flight=3)
+
+    async def run():
+        assert await gate.acquire(slots=2) == 2
+        assert gate.in_flight == 2
+        # A batch larger than the worker takes every slot, once they are free
+        batch = asyncio.create_task(gate.acquire(slots=10))
+        await asyncio.sleep(0)
+        assert gate.queue_depth == 1
+        gate.release(2)
+        assert await batch == 3
+        assert gate.in_flight == 3
+        gate.release(3)
+
+    asyncio.run(run())
+    assert gate.in_flight == 0
+
+
+def test_full_queue_and_timeout_shed_with_503():
+    gate = controller(rate_per_minute=0, max_in_flight=1, max_queue=1, queue_timeout=0.01)
+
+    async def run():
+        await gate.acquire()
+        waiter = asyncio.create_task(gate.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as full:
+            await gate.acquire()
+        with pytest.raises(AdmissionRejected) as timed_out:
+            await waiter
+        gate.release()
+        return full.value, timed_out.value
+
+    full, timed_out = asyncio.run(run())
+    assert (full.status_code, full.reason) == (503, "queue_full")
+    assert (timed_out.status_code, timed_out.reason) == (503, "queue_timeout")
+    assert gate.in_flight == 0 and gate.queue_depth == 0
@@ -0,0 +1,87 @@
+"""
+Offline tests for signed crawl cursors and the state resumed pages reuse
+"""
+
+import time
+
+import pytest
+
+import crawl_cursor
+from agent_api import resume_exclusions
+from crawl_cursor import InvalidCursor, _b64decode, _b64encode, decode_cursor, encode_cursor
+from recipe_crawler import CrawlFrontier
+from recipe_ranker import ranking_query
+
+STATE = {
+    "prompt": "vegan curry",
+    "disliked_ingredients": ["peanut"],
+    "lanes": [{"search_url": "https://example.com/search?q=curry", "offset": 2, "remaining": ["https://example.com/recipe/1"]}],
+    "seen": ["abc"],
+    "max_minutes": 30,
+    "diet_type": "vegan",
+    "query_profile": {"diet_type": "keto", "cuisine": "thai", "included_ingredients": ["tofu"]},
+}
+
+
+def test_round_trip_restores_the_frontier():
+    state = decode_cursor(encode_cursor(STATE, "u1"), "u1")
+    assert state == STATE
+    assert CrawlFrontier.from_dict(state).to_dict() == STATE
+
+
+def test_resumed_pages_rank_with_the_first_pages_profile():
+    state = decode_cursor(encode_cursor(STATE, "u1"), "u1")
+    resumed = ranking_query(state["prompt"], state["query_profile"])
+    assert resumed == ranking_query(STATE["prompt"], STATE["query_profile"])
+    assert "thai" in resumed.terms and "tofu" in resumed.terms
+    assert resumed.targets.max_carbs is not None
+
+
+def test_cursors_from_before_query_profiles_still_resume():
+    state = {key: value for key, value in STATE.items() if key != "query_profile"}
+    assert CrawlFrontier.from_dict(state).query_profile == {}
+
+
+def test_cursor_is_bound_to_its_user():
+    with pytest.raises(InvalidCursor, match="another user"):
+        decode_cursor(encode_cursor(STATE, "u1"), "u2")
+
+
+def test_edited_payload_is_rejected():
+    payload, signature = encode_cursor(STATE, "u1").split(".")
+    forged = encode_cursor({**STATE, "lanes": [{"search_url": "http://169.254.169.254/"}]}, "u1").split(".")[0]
+    with pytest.raises(InvalidCursor, match="signature"):
+        decode_cursor(f"{forged}.{signature}", "u1")
+
+    flipped = bytearray(_b64decode(payload))
+    flipped[-1] ^= 1
+    with pytest.raises(InvalidCursor, match="signature"):
+        decode_cursor(f"{_b64encode(bytes(flipped))}.{signature}", "u1")
+
+
+def test_malformed_cursors_are_rejected():
+    for token in ("", "no-dot", "!!!.???", "abc.def"):
+        with pytest.raises(InvalidCursor):
+            decode_cursor(token, "u1")
+
+
+def test_cursor_signed_with_another_key_is_rejected(monkeypatch):
+    token = encode_cursor(STATE, "u1")
+    monkeypatch.setattr(crawl_cursor, "_KEY", b"another-secret")
+    with pytest.raises(InvalidCursor, match="signature"):
+        decode_cursor(token, "u1")
+
+
+def test_expired_cursor_is_rejected(monkeypatch):
+    token = encode_cursor(STATE, "u1")
+    now = time.time()
+    monkeypatch.setattr(crawl_cursor.time, "time", lambda: now + crawl_cursor.CURSOR_TTL_SECONDS + 1)
+    with pytest.raises(InvalidCursor, match="expired"):
+        decode_cursor(token, "u1")
+
+
+def test_resumed_page_adds_exclusions_saved_since_page_one():
+    state = decode_cursor(encode_cursor(STATE, "u1"), "u1")
+    context = {"exclude_ingredients": ["shellfish", "peanut"]}
+    assert resume_exclusions(state, context) == ["peanut", "shellfish"]
+    assert resume_exclusions(state, {}) == ["peanut"]
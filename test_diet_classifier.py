@@ -0,0 +1,114 @@
+"""
+Offline tests for local diet-compliance classification
+"""
+
+import pytest
+
+from diet_classifier import (
+    canonical_diet,
+    diet_tags,
+    diet_violations,
+    ingredient_mask,
+    recipe_diet_tags,
+    requested_diet,
+)
+from ingredient_parser import parse_ingredients
+
+ALL_DIETS = ["vegan", "vegetarian", "keto", "gluten-free", "dairy-free"]
+
+
+def tags(*lines):
+    return diet_tags(parse_ingredients(lines))
+
+
+def test_plant_recipe_fits_every_diet():
+    assert tags("2 cups broccoli florets", "1 tbsp olive oil", "salt") == ALL_DIETS
+
+
+@pytest.mark.parametrize(
+    "line, missing",
+    [
+        ("1 lb chicken thighs", ["vegan", "vegetarian"]),
+        ("4 slices bacon", ["vegan", "vegetarian"]),
+        ("2 tbsp fish sauce", ["vegan", "vegetarian"]),
+        ("1 cup grated parmesan", ["vegan", "dairy-free"]),
+        ("2 large eggs", ["vegan"]),
+        ("1 tbsp honey", ["vegan", "keto"]),
+        ("2 cups all-purpose flour", ["keto", "gluten-free"]),
+        ("2 tbsp soy sauce", ["gluten-free"]),
+        ("8 oz egg noodles", ["vegan", "keto", "gluten-free"]),
+        ("1 cup rice", ["keto"]),
+    ],
+)
+def test_ingredients_rule_out_diets(line, missing):
+    assert tags(line) == [diet for diet in ALL_DIETS if diet not in missing]
+
+
+@pytest.mark.parametrize(
+    "line",
+    [
+        "1 can coconut milk",
+        "2 tbsp almond butter",
+        "1 tsp cream of tartar",
+        "1 medium eggplant",
+        "1 head butter lettuce",
+        "2 tbsp vegan butter",
+        "1 cup dairy-free yogurt",
+        "1 cup almond flour",
+    ],
+)
+def test_look_alikes_and_qualified_ingredients_are_fine(line):
+    assert tags(line) == ALL_DIETS
+
+
+def test_longest_phrase_wins():
+    assert ingredient_mask("peanut butter") == ingredient_mask("rice")
+    assert ingredient_mask("chicken broth") == ingredient_mask("chicken")
+    assert ingredient_mask("gluten-free soy sauce") == 0
+
+
+def test_violations_count_ingredients():
+    ingredients = parse_ingredients(["1 lb beef", "1 cup milk", "1 cup rice", "2 eggs"])
+    assert diet_violations(ingredients, "vegan") == 3
+    assert diet_violations(ingredients, "vegetarian") == 1
+    assert diet_violations(ingredients, "keto") == 1
+
+
+def test_recipe_diet_tags_prefers_stored_tags():
+    assert recipe_diet_tags({"ingredients": ["1 lb beef"]}) == ["keto", "gluten-free", "dairy-free"]
+    assert recipe_diet_tags({"ingredients": ["1 lb beef"], "diet_tags": ["vegan"]}) == ["vegan"]
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        ("Vegan", "vegan"),
+        ("plant-based", "vegan"),
+        ("gluten free", "gluten-free"),
+        ("Gluten_Free", "gluten-free"),
+        ("lactose-free", "dairy-free"),
+        ("paleo", None),
+        ("", None),
+        (None, None),
+    ],
+)
+def test_canonical_diet(value, expected):
+    assert canonical_diet(value) == expected
+
+
+def test_requested_diet_prefers_the_extracted_diet():
+    assert requested_diet("glutenfree pancakes") == "gluten-free"
+    assert requested_diet("veggie chili", {"diet_type": "veggie"}) == "vegetarian"
+    assert requested_diet("vegan curry", {"diet_type": "keto"}) == "keto"
+    assert requested_diet("vegan curry", {"diet_type": "paleo"}) == "vegan"
+    assert requested_diet("beef stew") is None
+
+
+def test_veggie_in_a_prompt_means_vegetables():
+    assert requested_diet("veggie chili") is None
+    assert requested_diet("chicken and veggie stir fry") is None
+    assert requested_diet("roasted veggie pasta with sausage") is None
+    # A diet that rules out the meat the prompt asks for is not enforced
+    assert requested_diet("vegetarian chili with beef") is None
+    assert requested_diet("vegan sausage rolls") == "vegan"
+    assert requested_diet("keto chicken thighs") == "keto"
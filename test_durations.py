@@ -0,0 +1,79 @@
+"""
+Offline tests for recipe durations and prompt time limits
+"""
+
+import pytest
+
+from durations import QUICK_MEAL_MINUTES, parse_duration, prompt_time_limit, recipe_times, time_limit
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        ("PT1H30M", 90),
+        ("PT90M", 90),
+        ("P0DT0H45M", 45),
+        ("P1DT2H", 1560),
+        ("PT90S", 2),
+        ("P30M", 30),
+        ("1 hr 10 mins", 70),
+        ("45 mins", 45),
+        ("2 hours", 120),
+        ("PT", None),
+        ("overnight", None),
+    ],
+)
+def test_parse_duration(value, expected):
+    assert parse_duration(value) == expected
+
+
+def test_recipe_times_falls_back_to_prep_plus_cook():
+    assert recipe_times({"prepTime": "PT10M", "cookTime": "PT20M"}) == (10, 20, 30)
+    assert recipe_times({"prepTime": "PT10M", "totalTime": "PT0M"}) == (10, None, 10)
+    assert recipe_times({"totalTime": ["PT45M"], "cookTime": 15}) == (None, 15, 45)
+    assert recipe_times({"prepTime": True, "cookTime": -5}) == (None, None, None)
+
+
+@pytest.mark.parametrize(
+    "prompt, expected",
+    [
+        ("chicken under 30 minutes", 30),
+        ("dinner in 20 mins", 20),
+        ("soup within 1.5 hours", 90),
+        ("ready in under an hour", 60),
+        ("dinner under 1 hour 30 minutes", 90),
+        ("ready in 2 hours 15 minutes", 135),
+        ("stew in an hour and 20 mins", 80),
+        ("1 hour 10 minutes or less", 70),
+        ("pasta in less than 15 min", 15),
+        ("45 minutes or less", 45),
+        ("curry, 20 min max", 20),
+        ("quick keto dinner", QUICK_MEAL_MINUTES),
+        ("fast weeknight pasta", QUICK_MEAL_MINUTES),
+        ("2 minute noodles in 5 minutes", 5),
+        # Numbers and words that name a dish are not limits
+        ("2 minute noodles", None),
+        ("30-minute meals", None),
+        ("1 hour roast", None),
+        ("1 hour 30 minute brisket", None),
+        ("fast food copycat burgers", None),
+        ("quick bread with walnuts", None),
+        ("overnight oats with quick oats", None),
+        ("breakfast burritos", None),
+    ],
+)
+def test_time_limit(prompt, expected):
+    assert time_limit(prompt) == expected
+
+
+def test_extracted_time_constraint():
+    assert prompt_time_limit("pasta", {"time_constraint": "30 minutes"}) == 30
+    assert prompt_time_limit("pasta", {"time_constraint": "quick"}) == QUICK_MEAL_MINUTES
+    assert prompt_time_limit("pasta", {"time_constraint": "1 hour 30 minutes"}) == 90
+    assert prompt_time_limit("pasta", {"time_constraint": "under 1 hour 30 minutes"}) == 90
+    assert prompt_time_limit("pasta", {"time_constraint": "2 hrs, 15 mins"}) == 135
+    assert prompt_time_limit("pasta", {"time_constraint": "one-pot"}) is None
+    # A stated number wins over "quick" wherever each appears
+    assert prompt_time_limit("quick pasta", {"time_constraint": "under 20 minutes"}) == 20
+    assert prompt_time_limit("pasta in 10 minutes", {"time_constraint": "quick"}) == 10
+    assert prompt_time_limit("2 minute noodles", {"time_constraint": None}) is None
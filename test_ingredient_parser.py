@@ -0,0 +1,77 @@
+"""
+Offline tests for structured ingredient parsing
+"""
+
+import pytest
+
+from ingredient_parser import Ingredient, ingredient_rows, parse_ingredient, parse_ingredients, parse_quantity
+
+
+@pytest.mark.parametrize(
+    "token, expected",
+    [
+        ("2", 2.0),
+        ("0.5", 0.5),
+        (".5", 0.5),
+        ("3/4", 0.75),
+        ("1 1/2", 1.5),
+        ("1 ⁄ 2", 0.5),
+        ("½", 0.5),
+        ("1½", 1.5),
+        ("1 ⅓", 1.333),
+        ("1/0", None),
+        ("some", None),
+    ],
+)
+def test_parse_quantity(token, expected):
+    assert parse_quantity(token) == expected
+
+
+@pytest.mark.parametrize(
+    "line, quantity, quantity_max, unit, name, note",
+    [
+        ("1 ½ cups all-purpose flour, sifted", 1.5, None, "cup", "all-purpose flour", "sifted"),
+        ("1 (15 ounce) can chickpeas, drained", 1.0, None, "can", "chickpeas", "15 ounce; drained"),
+        ("2-3 cloves garlic, minced", 2.0, 3.0, "clove", "garlic", "minced"),
+        ("4 to 6 fl oz cream", 4.0, 6.0, "fluid ounce", "cream", None),
+        ("3/4 tsp. baking soda", 0.75, None, "teaspoon", "baking soda", None),
+        ("1 1/2 lb chicken thighs (boneless)", 1.5, None, "pound", "chicken thighs", "boneless"),
+        ("a pinch of salt", 1.0, None, "pinch", "salt", None),
+        ("1 tin tomatoes", 1.0, None, "can", "tomatoes", None),
+        ("200 g granola", 200.0, None, "gram", "granola", None),
+        ("2 lemons", 2.0, None, None, "lemons", None),
+        ("Salt and pepper to taste", None, None, None, "salt and pepper to taste", None),
+    ],
+)
+def test_parse_ingredient(line, quantity, quantity_max, unit, name, note):
+    parsed = parse_ingredient(line)
+    assert parsed.text == line
+    assert (parsed.quantity, parsed.quantity_max, parsed.unit, parsed.name, parsed.note) == (
+        quantity,
+        quantity_max,
+        unit,
+        name,
+        note,
+    )
+
+
+def test_whitespace_is_normalized_and_results_are_shared():
+    assert parse_ingredient("2  cups\n milk").text == "2 cups milk"
+    assert parse_ingredient("2 cups milk") is parse_ingredient("2 cups milk")
+
+
+def test_scaled_returns_a_new_ingredient():
+    original = parse_ingredient("2-3 cloves garlic, minced")
+    doubled = original.scaled(2)
+    assert (doubled.quantity, doubled.quantity_max, doubled.unit, doubled.name) == (4.0, 6.0, "clove", "garlic")
+    assert original.quantity == 2.0
+
+
+def test_non_string_entries_are_parsed_from_str():
+    assert parse_ingredients([2, "1 cup rice"]) == [Ingredient("2", 2.0), parse_ingredient("1 cup rice")]
+
+
+def test_ingredient_rows_prefers_parsed_ingredients():
+    assert ingredient_rows({"ingredients": ["1 cup rice"]}) == [parse_ingredient("1 cup rice").to_dict()]
+    stored = [{"text": "1 cup rice", "name": "rice"}]
+    assert ingredient_rows({"ingredients": ["ignored"], "parsed_ingredients": stored}) == stored
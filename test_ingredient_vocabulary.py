@@ -0,0 +1,95 @@
+"""
+Offline tests for canonical ingredient exclusions
+"""
+
+import pytest
+
+from ingredient_parser import parse_ingredients
+from ingredient_vocabulary import canonical_ids, compile_exclusions, ingredient_ids, ingredient_tokens
+
+
+def excluded(terms, *lines):
+    return compile_exclusions(terms).matches(ingredient_ids(parse_ingredients(lines)))
+
+
+@pytest.mark.parametrize(
+    "terms, line",
+    [
+        # Synonyms and spellings
+        (["prawns"], "1 lb shrimp, peeled"),
+        (["shrimp"], "200g king prawns"),
+        (["cilantro"], "fresh coriander leaves"),
+        (["jalapeños"], "2 jalapeno peppers"),
+        # Groups and products
+        (["tree nuts"], "1 cup chopped walnuts"),
+        (["tree nuts"], "1/2 cup mixed nuts"),
+        (["nuts"], "2 tbsp peanut butter"),
+        (["dairy"], "1 cup grated Parmesan cheese"),
+        (["dairy"], "1 cup buttermilk"),
+        (["shellfish"], "2 tbsp oyster sauce"),
+        (["eggs"], "1/2 cup mayo"),
+        (["gluten"], "2 tbsp soy sauce"),
+        (["pine nuts, dairy"], "basil pesto"),
+        (["onions"], "1 tsp onion powder"),
+        # Names that contain the term as whole words, as the substring check did
+        (["cream"], "1 cup sour cream"),
+        (["cream"], "1 cup heavy cream"),
+        (["cream"], "1 cup whipping cream"),
+        (["cream"], "4 oz cream cheese, softened"),
+        (["milk"], "1 cup buttermilk"),
+        (["milk"], "1 cup whole milk"),
+        (["onion"], "3 green onions, sliced"),
+        (["onions"], "2 scallions"),
+        (["pepper"], "1 red bell pepper"),
+        (["peppers"], "2 jalapeno peppers"),
+        (["pepper"], "salt and pepper to taste"),
+        (["cheese"], "4 oz goat cheese"),
+        # Words outside the vocabulary
+        (["ghost pepper"], "1 ghost pepper, minced"),
+        (["raw onion"], "1 red onion"),
+    ],
+)
+def test_excluded(terms, line):
+    assert excluded(terms, line)
+
+
+@pytest.mark.parametrize(
+    "terms, line",
+    [
+        (["tree nuts"], "1 tsp nutmeg"),
+        (["nuts"], "1 tsp ground nutmeg"),
+        (["tree nuts"], "2 tbsp peanut butter"),
+        (["tree nuts"], "1 can coconut milk"),
+        (["dairy"], "1 can coconut milk"),
+        (["milk"], "1 can coconut milk"),
+        (["milk"], "1 cup almond milk"),
+        (["dairy"], "1 tsp cream of tartar"),
+        (["cream"], "1 tsp cream of tartar"),
+        (["cream"], "1 can coconut cream"),
+        (["butter"], "2 tbsp peanut butter"),
+        (["butter"], "1 cup buttermilk"),
+        (["shellfish"], "1 cup oyster mushrooms"),
+        (["oysters"], "1 cup oyster mushrooms"),
+        (["eggs"], "1 eggplant, diced"),
+        (["bell pepper"], "salt and pepper to taste"),
+        (["ghost pepper"], "1 bell pepper"),
+        (["greens"], "3 green onions"),
+    ],
+)
+def test_not_excluded(terms, line):
+    assert not excluded(terms, line)
+
+
+def test_notes_are_checked_too():
+    assert excluded(["dairy"], "1 cup sauce (made with cream)")
+
+
+def test_tokens_are_singular_and_accent_free():
+    assert ingredient_tokens("Jalapeños, Tomatoes & Anchovies") == ("jalapeno", "tomato", "anchovy")
+    assert canonical_ids("fresh prawns") == canonical_ids("shrimp")
+
+
+def test_empty_exclusions_match_nothing():
+    exclusions = compile_exclusions(["", " , "])
+    assert not exclusions
+    assert not exclusions.matches(canonical_ids("shrimp"))
@@ -0,0 +1,52 @@
+"""
+Offline tests for schema.org nutrition parsing
+"""
+
+import pytest
+
+from nutrition import parse_amount, parse_nutrition
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        ("25 g", 25.0),
+        ("25g", 25.0),
+        ("1,200 kcal", 1200.0),
+        ("320 calories", 320.0),
+        ("500mg", 0.5),
+        ("1339 kJ", 320.03),
+        (".5 g", 0.5),
+        ("about 12 grams", 12.0),
+        ("12 ounces", None),
+        ("n/a", None),
+    ],
+)
+def test_parse_amount(value, expected):
+    assert parse_amount(value) == expected
+
+
+def test_parse_nutrition_maps_schema_properties():
+    macros = parse_nutrition(
+        {
+            "@type": "NutritionInformation",
+            "calories": "320.4 kcal",
+            "proteinContent": "25 g",
+            "fatContent": 12,
+            "carbohydrateContent": "30.5g",
+            "fiberContent": "4000 mg",
+            "sugarContent": "n/a",
+            "sodiumContent": "500 mg",
+        }
+    )
+    assert macros == {"calories": 320, "protein": 25.0, "fat": 12.0, "carbs": 30.5, "fiber": 4.0}
+
+
+def test_parse_nutrition_skips_unusable_values():
+    assert parse_nutrition({"calories": True, "proteinContent": None, "fatContent": "-3 g"}) == {}
+    assert parse_nutrition("320 calories") == {}
+    assert parse_nutrition(None) == {}
+
+
+def test_parse_nutrition_takes_the_first_block_of_a_list():
+    assert parse_nutrition(["x", {"calories": "100"}, {"calories": "200"}]) == {"calories": 100}
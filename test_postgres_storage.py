@@ -0,0 +1,149 @@
+"""
+Tests for the direct Postgres backend against a real server.
+
+Set TEST_DATABASE_URL to a disposable database (the tests drop and recreate
+recipe_search and recipe_catalog), e.g.
+  TEST_DATABASE_URL=postgresql://postgres@127.0.0.1:5432/postgres python -m pytest test_postgres_storage.py
+Skipped when it is not set.
+"""
+
+import asyncio
+import os
+from pathlib import Path
+
+import pytest
+
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+pytestmark = pytest.mark.skipif(not TEST_DATABASE_URL, reason="TEST_DATABASE_URL not set")
+
+if TEST_DATABASE_URL:
+    import psycopg
+
+    from postgres_storage import RECIPE_SEARCH_DDL, PostgresRecipeStorage
+    from recipe_catalog import build_normalized_rows
+
+SQL_DIR = Path(__file__).parent / "sql"
+# Migrations that touch recipe_search and recipe_catalog, in the order they were added
+MIGRATIONS = (
+    "normalized_recipe_catalog.sql",
+    "recipe_parsed_ingredients.sql",
+    "recipe_times.sql",
+    "recipe_diet_tags.sql",
+)
+
+
+@pytest.fixture(autouse=True)
+def schema():
+    with psycopg.connect(TEST_DATABASE_URL, autocommit=True) as conn:
+        conn.execute("DROP VIEW IF EXISTS recipe_search_full")
+        conn.execute("DROP TABLE IF EXISTS recipe_search, recipe_catalog CASCADE")
+        conn.execute(RECIPE_SEARCH_DDL)
+        for name in MIGRATIONS:
+            conn.execute((SQL_DIR / name).read_text())
+
+
+def run(test):
+    async def wrapper():
+        storage = PostgresRecipeStorage(TEST_DATABASE_URL, min_size=1, max_size=2)
+        try:
+            return await test(storage)
+        finally:
+            await storage.close()
+
+    return asyncio.run(wrapper())
+
+
+def recipe_row(user_id, title, **extra):
+    return {
+        "user_id": user_id,
+        "title": title,
+        "description": "",
+        "image_url": "",
+        "ingredients": ["1 cup rice"],
+        "parsed_ingredients": [{"text": "1 cup rice", "quantity": 1.0, "unit": "cup", "name": "rice"}],
+        "instructions": ["cook"],
+        "macros": {"calories": 200},
+        "servings": 2,
+        "prep_time": 5,
+        "cook_time": 20,
+        "total_time": 25,
+        "diet_tags": ["vegan"],
+        "source_url": f"https://example.com/recipe/{title}",
+        "site_name": "example.com",
+        "created_at": "2026-01-01T00:00:00+00:00",
+        **extra,
+    }
+
+
+def recipe(title):
+    row = recipe_row("", title)
+    row.pop("user_id")
+    return row
+
+
+def test_replace_swaps_a_users_rows_and_keeps_json():
+    async def test(storage):
+        await storage.replace_many({"u1": [recipe_row("u1", "a"), recipe_row("u1", "b")], "u2": [recipe_row("u2", "c")]})
+        await storage.replace_user_recipes("u1", [recipe_row("u1", "d")])
+        return await storage.fetch_user_recipes("u1"), await storage.count_user_recipes("u2")
+
+    rows, other_count = run(test)
+    assert [row["title"] for row in rows] == ["d"]
+    assert rows[0]["ingredients"] == ["1 cup rice"]
+    assert rows[0]["macros"] == {"calories": 200}
+    assert rows[0]["diet_tags"] == ["vegan"]
+    assert rows[0]["total_time"] == 25
+    assert other_count == 1
+
+
+def test_copy_appends():
+    async def test(storage):
+        await storage.copy_recipes([recipe_row("u1", "a")])
+        await storage.copy_recipes([recipe_row("u1", "b")])
+        return await storage.count_user_recipes("u1")
+
+    assert run(test) == 2
+
+
+def test_failed_copy_rolls_back_the_delete():
+    async def test(storage):
+        await storage.replace_user_recipes("u1", [recipe_row("u1", "a")])
+        with pytest.raises(psycopg.Error):
+            await storage.replace_user_recipes("u1", [recipe_row("u1", "b", servings="not a number")])
+        return await storage.fetch_user_recipes("u1")
+
+    assert [row["title"] for row in run(test)] == ["a"]
+
+
+def test_normalized_replace_writes_catalog_once_and_links():
+    catalog_u1, links_u1 = build_normalized_rows([recipe("a"), recipe("b")], "u1", "2026-01-01T00:00:00+00:00")
+    catalog_u2, links_u2 = build_normalized_rows([recipe("b")], "u2", "2026-01-01T00:00:00+00:00")
+
+    async def test(storage):
+        count = await storage.replace_many_normalized(catalog_u1 + catalog_u2, {"u1": links_u1, "u2": links_u2})
+        async with storage.pool.connection() as conn:
+            catalog = await (await conn.execute("SELECT count(*) FROM recipe_catalog")).fetchone()
+            full = await (
+                await conn.execute("SELECT user_id, rank, title FROM recipe_search_full ORDER BY user_id, rank")
+            ).fetchall()
+        return count, catalog[0], full
+
+    count, catalog_count, full = run(test)
+    assert count == 3
+    assert catalog_count == 2
+    assert full == [("u1", 1, "a"), ("u1", 2, "b"), ("u2", 1, "b")]
+
+
+def test_normalized_replace_updates_existing_catalog_rows():
+    catalog, links = build_normalized_rows([recipe("a")], "u1", "2026-01-01T00:00:00+00:00")
+    updated = [{**row, "description": "new", "total_time": 40} for row in catalog]
+
+    async def test(storage):
+        await storage.replace_many_normalized(catalog, {"u1": links})
+        await storage.replace_many_normalized(updated, {"u1": links})
+        async with storage.pool.connection() as conn:
+            return await (
+                await conn.execute("SELECT description, total_time FROM recipe_catalog")
+            ).fetchall()
+
+    assert run(test) == [("new", 40)]
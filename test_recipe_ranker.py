@@ -0,0 +1,76 @@
+"""
+Offline tests for multi-signal recipe ranking
+"""
+
+from ingredient_parser import parse_ingredients
+from macro_ranker import MacroTargets, macro_matrix, macro_scores, macro_targets
+from recipe_ranker import RankingQuery, rank_recipes, ranking_query
+
+
+def recipe(title, ingredients=("1 cup rice",), **extra):
+    return {
+        "title": title,
+        "description": "",
+        "ingredients": list(ingredients),
+        "parsed_ingredients": parse_ingredients(ingredients),
+        "instructions": ["a", "b", "c"],
+        "source_url": f"https://example.com/recipe/{title}",
+        **extra,
+    }
+
+
+def titles(recipes):
+    return [item["title"] for item in recipes]
+
+
+def test_title_matches_beat_body_matches():
+    pool = [
+        recipe("plain rice"),
+        recipe("garlic rice", description="with mushroom"),
+        recipe("mushroom risotto"),
+    ]
+    assert titles(rank_recipes(pool, ranking_query("mushroom risotto"))) == [
+        "mushroom risotto",
+        "garlic rice",
+        "plain rice",
+    ]
+
+
+def test_recipes_that_break_the_diet_rank_lower():
+    pool = [recipe("chicken curry", ["1 lb chicken", "1 cup rice"]), recipe("chickpea curry", ["1 can chickpeas"])]
+    ranked = rank_recipes(pool, ranking_query("curry", {"diet_type": "vegetarian"}))
+    assert titles(ranked) == ["chickpea curry", "chicken curry"]
+
+
+def test_time_limit_prefers_recipes_within_it():
+    pool = [recipe("slow stew", total_time=120), recipe("unknown stew"), recipe("fast stew", total_time=20)]
+    ranked = rank_recipes(pool, ranking_query("stew in 30 minutes"))
+    assert titles(ranked) == ["fast stew", "unknown stew", "slow stew"]
+
+
+def test_macro_targets_order_by_nutrition():
+    pool = [
+        recipe("bowl a", macros={"calories": 300, "protein": 5.0}),
+        recipe("bowl b", macros={"calories": 550, "protein": 40.0}),
+        recipe("bowl c", macros={"calories": 900, "protein": 30.0}),
+        recipe("bowl d"),
+    ]
+    query = ranking_query("high protein bowl under 600 calories")
+    assert query.targets.min_protein is not None and query.targets.max_calories == 600
+    assert titles(rank_recipes(pool, query))[0] == "bowl b"
+
+    scores = macro_scores(macro_matrix(pool), query.targets)
+    assert scores[1] > scores[2] > scores[3]
+
+
+def test_ties_keep_crawl_order():
+    pool = [recipe(f"soup {i}") for i in range(5)]
+    assert rank_recipes(pool, RankingQuery()) == pool
+    assert rank_recipes(pool[:1], ranking_query("soup")) == pool[:1]
+
+
+def test_macro_targets_from_prompt_and_diet():
+    assert macro_targets("30g protein lunch").min_protein == 30
+    assert macro_targets("dinner", {"diet_type": "keto"}).max_carbs is not None
+    assert not macro_targets("pasta").active
+    assert MacroTargets().to_dict() == {}
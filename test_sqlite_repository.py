@@ -0,0 +1,64 @@
+"""
+Offline tests for the SQLite repository writes
+"""
+
+import asyncio
+
+import pytest
+
+from sqlite_repository import SQLiteRepository
+
+
+@pytest.fixture
+def repository(tmp_path):
+    repository = SQLiteRepository(str(tmp_path / "recipes.db"))
+    yield repository
+    repository.close()
+
+
+def catalog_row(recipe_id, title, **extra):
+    return {
+        "recipe_id": recipe_id,
+        "canonical_url": f"example.com/recipe/{recipe_id}",
+        "source_url": f"https://example.com/recipe/{recipe_id}",
+        "title": title,
+        **extra,
+    }
+
+
+def catalog(repository):
+    return repository._select("SELECT recipe_id, title, macros FROM recipe_catalog ORDER BY recipe_id")
+
+
+def test_upsert_updates_existing_rows(repository):
+    async def run():
+        await repository.upsert_rows("recipe_catalog", [catalog_row("r1", "old"), catalog_row("r2", "b")], "recipe_id")
+        await repository.upsert_rows(
+            "recipe_catalog", [catalog_row("r1", "new", macros={"calories": 300})], "recipe_id"
+        )
+
+    asyncio.run(run())
+    assert catalog(repository) == [
+        {"recipe_id": "r1", "title": "new", "macros": {"calories": 300}},
+        {"recipe_id": "r2", "title": "b", "macros": None},
+    ]
+
+
+def test_replace_user_rows_keeps_other_users(repository):
+    async def run():
+        await repository.insert_rows("recipe_search", [{"user_id": "u1", "title": "a"}, {"user_id": "u2", "title": "b"}])
+        await repository.replace_user_rows("recipe_search", ["u1"], [{"user_id": "u1", "title": "c"}])
+        return await repository.get_recipe_searches("u1"), await repository.count_recipe_searches("u2")
+
+    rows, other_count = asyncio.run(run())
+    assert [row["title"] for row in rows] == ["c"]
+    assert other_count == 1
+
+
+def test_unknown_columns_are_rejected(repository):
+    with pytest.raises(ValueError, match="Unknown columns for recipe_search: nickname"):
+        asyncio.run(repository.insert_rows("recipe_search", [{"user_id": "u1", "nickname": "x"}]))
+    columns = {row["name"] for row in repository._select("PRAGMA table_info(recipe_search)")}
+    assert "nickname" not in columns
+    with pytest.raises(ValueError):
+        asyncio.run(repository.insert_rows("recipe_search; DROP TABLE agent_logs", [{"user_id": "u1"}]))
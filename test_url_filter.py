@@ -0,0 +1,63 @@
+"""
+Offline tests for recipe URL canonicalization and the per-user URL filter
+"""
+
+import url_filter
+from url_filter import BloomFilter, RecipeUrlFilter, canonicalize_url
+
+
+def test_canonical_form_ignores_scheme_host_case_and_trailing_slash():
+    assert canonicalize_url("https://www.Example.com/recipe/soup/") == "example.com/recipe/soup"
+    assert canonicalize_url("http://example.com/recipe/soup#reviews") == "example.com/recipe/soup"
+
+
+def test_tracking_parameters_are_dropped():
+    assert (
+        canonicalize_url("https://example.com/recipe/soup?utm_source=x&utm_medium=y&fbclid=z")
+        == "example.com/recipe/soup"
+    )
+
+
+def test_identifying_query_parameters_are_kept_and_sorted():
+    first = canonicalize_url("https://example.com/recipe.php?id=123&lang=en")
+    assert first == "example.com/recipe.php?id=123&lang=en"
+    assert canonicalize_url("https://example.com/recipe.php?lang=en&id=123&utm_source=x") == first
+    assert canonicalize_url("https://example.com/recipe.php?id=124") != canonicalize_url(
+        "https://example.com/recipe.php?id=123"
+    )
+
+
+def test_query_id_recipes_do_not_collapse_in_the_filter():
+    urls = RecipeUrlFilter(["https://example.com/recipe.php?id=1"])
+    assert "https://www.example.com/recipe.php?id=1&utm_source=mail" in urls
+    assert "https://example.com/recipe.php?id=2" not in urls
+
+
+def test_small_collections_are_exact():
+    urls = RecipeUrlFilter([f"https://example.com/recipe/{i}" for i in range(10)])
+    assert urls.is_exact
+    assert len(urls) == 10
+    assert "https://example.com/recipe/3/" in urls
+    assert "https://example.com/recipe/11" not in urls
+    assert "https://example.com/recipe/1" not in RecipeUrlFilter()
+
+
+def test_large_collections_have_no_false_positives(monkeypatch):
+    monkeypatch.setattr(url_filter, "URL_FILTER_EXACT_LIMIT", 100)
+    hated = [f"https://example.com/recipe/{i}" for i in range(2000)]
+    urls = RecipeUrlFilter(hated)
+    assert not urls.is_exact
+    assert all(url in urls for url in hated)
+    # Bloom hits are confirmed, so no valid recipe is skipped
+    assert not any(f"https://example.com/recipe/{i}" in urls for i in range(2000, 52000))
+
+
+def test_bloom_filter_false_positive_rate_is_near_target():
+    # The tradeoff the confirmation step covers: the raw Bloom filter does
+    # report about URL_FILTER_ERROR_RATE of unseen items as present
+    bloom = BloomFilter(2000, error_rate=0.01)
+    for i in range(2000):
+        bloom.add(f"seen-{i}")
+    assert all(f"seen-{i}" in bloom for i in range(2000))
+    false_positives = sum(f"unseen-{i}" in bloom for i in range(50000))
+    assert false_positives / 50000 < 0.02
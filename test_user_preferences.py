@@ -0,0 +1,111 @@
+"""
+Offline tests for UserContextLoader caching and failure handling
+"""
+
+import asyncio
+
+import pytest
+
+from user_preferences import UserContextCache, UserContextLoader, UserContextUnavailable
+
+
+class FakeRepository:
+    def __init__(self, fail_settings: bool = False):
+        self.fail_settings = fail_settings
+        self.calls = 0
+
+    async def get_user_settings(self, user_id):
+        self.calls += 1
+        await asyncio.sleep(0)
+        if self.fail_settings:
+            raise RuntimeError("settings unavailable")
+        return {"diet_type": "vegan", "allergies": ["peanut"], "disliked_ingredients": ["cilantro"]}
+
+    async def get_hated_recipe_urls(self, user_id):
+        return ["https://example.com/recipe/hated"]
+
+    async def get_saved_recipe_urls(self, user_id):
+        return []
+
+
+def loader(repository):
+    return UserContextLoader(cache=UserContextCache(ttl=60), repository=repository)
+
+
+def test_context_combines_exclusions_and_is_cached():
+    repository = FakeRepository()
+    context_loader = loader(repository)
+
+    async def run():
+        first = await context_loader.load_user_context("u1")
+        second = await context_loader.load_user_context("u1")
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first is second
+    assert first["exclude_ingredients"] == ["peanut", "cilantro"]
+    assert "https://example.com/recipe/hated" in first["url_filter"]
+    assert repository.calls == 1
+
+
+def test_concurrent_loads_share_one_fetch():
+    repository = FakeRepository()
+    context_loader = loader(repository)
+
+    async def run():
+        return await asyncio.gather(*(context_loader.load_user_context("u1") for _ in range(5)))
+
+    contexts = asyncio.run(run())
+    assert all(context is contexts[0] for context in contexts)
+    assert repository.calls == 1
+
+
+def test_failed_settings_raise_instead_of_dropping_allergies():
+    repository = FakeRepository(fail_settings=True)
+    context_loader = loader(repository)
+
+    with pytest.raises(UserContextUnavailable):
+        asyncio.run(context_loader.load_user_context("u1"))
+    # Not cached: the next request tries again
+    assert context_loader.cache.get("u1") is None
+
+
+def test_concurrent_waiters_see_the_failure():
+    context_loader = loader(FakeRepository(fail_settings=True))
+
+    async def run():
+        return await asyncio.gather(
+            *(context_loader.load_user_context("u1") for _ in range(3)), return_exceptions=True
+        )
+
+    results = asyncio.run(run())
+    assert all(isinstance(result, UserContextUnavailable) for result in results)
+
+
+def test_invalidation_during_a_load_is_not_undone():
+    repository = FakeRepository()
+    context_loader = loader(repository)
+    release = asyncio.Event()
+    fetch_settings = repository.get_user_settings
+
+    async def slow_settings(user_id):
+        await release.wait()
+        return await fetch_settings(user_id)
+
+    repository.get_user_settings = slow_settings
+
+    async def run():
+        stale_load = asyncio.create_task(context_loader.load_user_context("u1"))
+        await asyncio.sleep(0)
+        # The user's settings change while the load is reading them
+        context_loader.cache.invalidate("u1")
+        fresh_load = asyncio.create_task(context_loader.load_user_context("u1"))
+        await asyncio.sleep(0)
+        release.set()
+        return await stale_load, await fresh_load
+
+    stale, fresh = asyncio.run(run())
+    assert stale is not fresh
+    # Only the load started after the invalidation was cached
+    assert context_loader.cache.get("u1") is fresh
+    assert repository.calls == 2
@@ -0,0 +1,139 @@
+"""
+Offline tests for write-behind batching against an in-memory repository
+"""
+
+import asyncio
+
+import pytest
+
+import write_behind
+from write_behind import WriteBehindQueue, WriteOp
+
+
+class MemoryRepository:
+    def __init__(self):
+        self.tables = {}
+        self.calls = []
+
+    def _check(self, rows):
+        if any(row.get("bad") for row in rows):
+            raise ValueError("bad row")
+
+    async def insert_rows(self, table, rows, service=True):
+        self.calls.append(("insert", table, len(rows)))
+        self._check(rows)
+        self.tables.setdefault(table, []).extend(rows)
+        return len(rows)
+
+    async def replace_user_rows(self, table, user_ids, rows, service=True):
+        self.calls.append(("replace", table, len(rows)))
+        self._check(rows)
+        kept = [row for row in self.tables.get(table, []) if row["user_id"] not in user_ids]
+        self.tables[table] = kept + list(rows)
+        return len(rows)
+
+    async def upsert_rows(self, table, rows, key, service=True):
+        self.calls.append(("upsert", table, len(rows)))
+        self._check(rows)
+        existing = {row[key]: row for row in self.tables.get(table, [])}
+        existing.update({row[key]: row for row in rows})
+        self.tables[table] = list(existing.values())
+        return len(rows)
+
+
+@pytest.fixture
+def repository(monkeypatch):
+    memory = MemoryRepository()
+    monkeypatch.setattr(write_behind, "get_repository", lambda: memory)
+    return memory
+
+
+def queue():
+    return WriteBehindQueue(max_retries=1, backoff_base=0)
+
+
+def titles(repository, table="recipe_search"):
+    return [(row["user_id"], row["title"]) for row in repository.tables.get(table, [])]
+
+
+def test_writes_for_one_user_keep_enqueue_order(repository):
+    batch = [
+        WriteOp("insert", "recipe_search", [{"user_id": "u1", "title": "old"}]),
+        WriteOp("replace", "recipe_search", [{"user_id": "u1", "title": "new"}], user_id="u1"),
+        WriteOp("insert", "recipe_search", [{"user_id": "u1", "title": "after"}]),
+    ]
+    asyncio.run(queue()._flush(batch))
+    assert titles(repository) == [("u1", "new"), ("u1", "after")]
+
+
+def test_users_are_merged_into_one_call_per_table(repository):
+    batch = [
+        WriteOp("insert", "recipe_search", [{"user_id": f"u{i}", "title": "t"}]) for i in range(5)
+    ] + [WriteOp("insert", "agent_logs", [{"user_id": "u1", "title": "log"}])]
+    asyncio.run(queue()._flush(batch))
+    assert sorted(repository.calls) == [("insert", "agent_logs", 1), ("insert", "recipe_search", 5)]
+
+
+def test_bad_row_only_fails_its_own_op(repository):
+    batch = [
+        WriteOp("insert", "recipe_search", [{"user_id": "u1", "title": "ok"}]),
+        WriteOp("insert", "recipe_search", [{"user_id": "u2", "title": "broken", "bad": True}]),
+        WriteOp("replace", "recipe_search", [{"user_id": "u3", "title": "ok"}], user_id="u3"),
+    ]
+    write_queue = queue()
+    asyncio.run(write_queue._flush(batch))
+    assert sorted(titles(repository)) == [("u1", "ok"), ("u3", "ok")]
+    assert write_queue.stats.failed_rows == 1
+    assert write_queue.stats.flushed_rows == 2
+
+
+def test_upserts_run_first_and_report_success(repository):
+    written = []
+    batch = [
+        WriteOp("insert", "recipe_search", [{"user_id": "u1", "title": "link"}]),
+        WriteOp(
+            "upsert", "recipe_catalog", [{"recipe_id": "r1", "title": "a"}],
+            on_conflict="recipe_id", on_success=lambda: written.append("r1"),
+        ),
+        WriteOp(
+            "upsert", "recipe_catalog", [{"recipe_id": "r2", "bad": True}],
+            on_conflict="recipe_id", on_success=lambda: written.append("r2"),
+        ),
+    ]
+    asyncio.run(queue()._flush(batch))
+    assert repository.calls[0][0] == "upsert"
+    assert written == ["r1"]
+    assert [row["recipe_id"] for row in repository.tables["recipe_catalog"]] == ["r1"]
+
+
+def test_links_to_a_failed_upsert_are_dropped(repository):
+    upsert = WriteOp(
+        "upsert", "recipe_catalog", [{"recipe_id": "r2", "bad": True}], on_conflict="recipe_id"
+    )
+    link = WriteOp(
+        "insert",
+        "recipe_search",
+        [{"user_id": "u1", "recipe_id": "r1", "title": "a"}, {"user_id": "u1", "recipe_id": "r2", "title": "b"}],
+        requires=upsert,
+    )
+    asyncio.run(queue()._flush([upsert, link]))
+    assert upsert.written is False
+    assert titles(repository) == [("u1", "a")]
+
+
+def test_queue_flushes_on_stop(repository):
+    write_queue = WriteBehindQueue(flush_interval=10, backoff_base=0)
+
+    async def run():
+        await write_queue.start()
+        for i in range(3):
+            assert write_queue.submit(WriteOp("insert", "agent_logs", [{"user_id": "u1", "title": str(i)}]))
+        await write_queue.stop()
+
+    asyncio.run(run())
+    assert titles(repository, "agent_logs") == [("u1", "0"), ("u1", "1"), ("u1", "2")]
+    assert not write_queue.running
+
+
+def test_submit_without_running_queue_is_refused():
+    assert not WriteBehindQueue().submit(WriteOp("insert", "agent_logs", [{}]))
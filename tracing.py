@@ -0,0 +1,332 @@
+"""
+Request-scoped tracing for the agent endpoints
+Spans are tracked in a contextvar, so they follow a request through awaits,
+asyncio tasks and asyncio.to_thread without being passed around. A finished
+trace yields a compact per-stage timing summary (Server-Timing header and
+agent_logs.timings) and can be exported as OTLP/JSON to a file or collector.
+"""
+
+import functools
+import inspect
+import json
+import logging
+import os
+import queue
+import secrets
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+TRACE_ENABLED = os.environ.get("TRACE_ENABLED", "true").lower() == "true"
+# JSON lines, one OTLP ExportTraceServiceRequest per trace
+TRACE_EXPORT_FILE = os.environ.get("TRACE_EXPORT_FILE", "")
+# OTLP/HTTP JSON collector base URL, e.g. http://localhost:4318
+TRACE_EXPORT_ENDPOINT = os.environ.get("TRACE_EXPORT_ENDPOINT", "")
+TRACE_EXPORT_QUEUE_SIZE = int(os.environ.get("TRACE_EXPORT_QUEUE_SIZE", "1000"))
+TRACE_SERVICE_NAME = os.environ.get("TRACE_SERVICE_NAME", "kitchnsync-agent")
+
+# OTLP span kinds and status codes
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+STATUS_ERROR = 2
+
+
+class Span:
+    __slots__ = ("trace", "name", "span_id", "parent_id", "kind", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, trace: "Trace", name: str, parent_id: str, kind: int, attributes: Dict[str, Any]):
+        self.trace = trace
+        self.name = name
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.kind = kind
+        self.attributes = attributes
+        self.error: Optional[str] = None
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+
+    @property
+    def duration_ms(self) -> float:
+        end_ns = self.end_ns or time.time_ns()
+        return (end_ns - self.start_ns) / 1e6
+
+
+class Trace:
+    """All spans of one request; spans from concurrent tasks append here"""
+
+    def __init__(self, name: str, attributes: Dict[str, Any]):
+        self.trace_id = secrets.token_hex(16)
+        self.spans: List[Span] = []
+        self.root = self.add(name, "", SPAN_KIND_SERVER, attributes)
+
+    def add(self, name: str, parent_id: str, kind: int, attributes: Dict[str, Any]) -> Span:
+        span = Span(self, name, parent_id, kind, attributes)
+        self.spans.append(span)
+        return span
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Milliseconds and span count per stage, plus fetch time per source.
+        Spans of the same stage running concurrently (page fetches) are
+        summed, so a stage total can exceed the request's wall time.
+        """
+        stages: Dict[str, Dict[str, Any]] = {}
+        sources: Dict[str, Dict[str, Any]] = {}
+        for span in self.spans[1:]:
+            duration = span.duration_ms
+            _accumulate(stages, span.name, duration)
+            source = span.attributes.get("source")
+            if source:
+                _accumulate(sources, source, duration)
+        return {
+            "trace_id": self.trace_id,
+            "total_ms": round(self.root.duration_ms, 1),
+            "stages": _rounded(stages),
+            "sources": _rounded(sources),
+        }
+
+    def to_otlp(self) -> Dict[str, Any]:
+        return {
+            "resourceSpans": [
+                {
+                    "resource": {"attributes": _otlp_attributes({"service.name": TRACE_SERVICE_NAME})},
+                    "scopeSpans": [{"scope": {"name": __name__}, "spans": [_otlp_span(s) for s in self.spans]}],
+                }
+            ]
+        }
+
+
+def _accumulate(totals: Dict[str, Dict[str, Any]], key: str, duration: float) -> None:
+    entry = totals.setdefault(key, {"ms": 0.0, "count": 0})
+    entry["ms"] += duration
+    entry["count"] += 1
+
+
+def _rounded(totals: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    return {key: {"ms": round(entry["ms"], 1), "count": entry["count"]} for key, entry in totals.items()}
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items() if value is not None]
+
+
+def _otlp_span(span: Span) -> Dict[str, Any]:
+    data = {
+        "traceId": span.trace.trace_id,
+        "spanId": span.span_id,
+        "name": span.name,
+        "kind": span.kind,
+        "startTimeUnixNano": str(span.start_ns),
+        "endTimeUnixNano": str(span.end_ns or time.time_ns()),
+        "attributes": _otlp_attributes(span.attributes),
+    }
+    if span.parent_id:
+        data["parentSpanId"] = span.parent_id
+    if span.error:
+        data["status"] = {"code": STATUS_ERROR, "message": span.error}
+    return data
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    span = _current_span.get()
+    return span.trace if span else None
+
+
+@contextmanager
+def start_trace(name: str, **attributes: Any):
+    """Root span for one request; yields the Trace, or None when tracing is off"""
+    if not TRACE_ENABLED:
+        yield None
+        return
+    trace = Trace(name, attributes)
+    token = _current_span.set(trace.root)
+    try:
+        yield trace
+    except BaseException as e:
+        trace.root.error = repr(e)
+        raise
+    finally:
+        trace.root.end_ns = time.time_ns()
+        _current_span.reset(token)
+        exporter.export(trace)
+
+
+@contextmanager
+def span(name: str, **attributes: Any):
+    """Child of the current span; a no-op outside a trace"""
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+    child = parent.trace.add(name, parent.span_id, SPAN_KIND_INTERNAL, attributes)
+    token = _current_span.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.error = repr(e)
+        raise
+    finally:
+        child.end_ns = time.time_ns()
+        _current_span.reset(token)
+
+
+def traced(name: str, attributes: Optional[Callable[..., Dict[str, Any]]] = None):
+    """
+    Decorator wrapping each call in span(name). attributes, called with the
+    function's arguments, supplies span attributes; it only runs when a
+    trace is active.
+    """
+    def decorator(func):
+        def span_attributes(args, kwargs) -> Dict[str, Any]:
+            if attributes is None or _current_span.get() is None:
+                return {}
+            return attributes(*args, **kwargs)
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(name, **span_attributes(args, kwargs)):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name, **span_attributes(args, kwargs)):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def timing_summary() -> Optional[Dict[str, Any]]:
+    """Summary of the current request's trace so far, or None outside a trace"""
+    trace = current_trace()
+    return trace.summary() if trace else None
+
+
+def server_timing(summary: Optional[Dict[str, Any]]) -> str:
+    """Server-Timing header value: total plus one entry per stage"""
+    if not summary:
+        return ""
+    entries = [f"total;dur={summary['total_ms']}"]
+    for stage, entry in summary["stages"].items():
+        entries.append(f'{stage};dur={entry["ms"]};desc="x{entry["count"]}"')
+    return ", ".join(entries)
+
+
+class TraceExporter:
+    """
+    Ships finished traces from a background thread so requests never wait
+    on disk or the collector. Traces are dropped when the queue is full.
+    """
+
+    def __init__(
+        self,
+        path: str = TRACE_EXPORT_FILE,
+        endpoint: str = TRACE_EXPORT_ENDPOINT,
+        max_size: int = TRACE_EXPORT_QUEUE_SIZE,
+    ):
+        self.path = path
+        self.endpoint = endpoint.rstrip("/")
+        self.exported = 0
+        self.dropped = 0
+        self._queue: "queue.Queue[Optional[Trace]]" = queue.Queue(max_size)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path or self.endpoint)
+
+    def export(self, trace: Trace) -> None:
+        if not self.enabled:
+            return
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            self.dropped += 1
+
+    def _ensure_thread(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            trace = self._queue.get()
+            if trace is None:
+                return
+            batch = [trace]
+            while len(batch) < 100:
+                try:
+                    trace = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if trace is None:
+                    self._write(batch)
+                    return
+                batch.append(trace)
+            self._write(batch)
+
+    def _write(self, traces: List[Trace]) -> None:
+        documents = [trace.to_otlp() for trace in traces]
+        ok = True
+        if self.path:
+            try:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    for document in documents:
+                        f.write(json.dumps(document, separators=(",", ":")) + "\n")
+            except OSError as e:
+                ok = False
+                logger.warning(f"Failed to write traces to {self.path}: {e}")
+        if self.endpoint:
+            # One request per batch: resourceSpans from each trace concatenated
+            body = {"resourceSpans": [rs for document in documents for rs in document["resourceSpans"]]}
+            request = urllib.request.Request(
+                f"{self.endpoint}/v1/traces",
+                data=json.dumps(body).encode("utf-8"),
+                headers={"Content-Type": "application/json"},
+                method="POST",
+            )
+            try:
+                with urllib.request.urlopen(request, timeout=5):
+                    pass
+            except OSError as e:
+                ok = False
+                logger.warning(f"Failed to export {len(traces)} traces to {self.endpoint}: {e}")
+        if ok:
+            self.exported += len(traces)
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Flush queued traces and stop the export thread"""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+
+
+exporter = TraceExporter()
@@ -0,0 +1,139 @@
+"""
+Per-user recipe URL membership filter
+Lets the crawler skip hated and already-saved recipes before fetching them
+"""
+
+import hashlib
+import logging
+import math
+import os
+from array import array
+from bisect import bisect_left
+from functools import lru_cache
+from typing import Iterable, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+logger = logging.getLogger(__name__)
+
+# Users with at most this many URLs get an exact set instead of a Bloom filter
+URL_FILTER_EXACT_LIMIT = int(os.environ.get("URL_FILTER_EXACT_LIMIT", "512"))
+# Target false-positive rate for the Bloom filter
+URL_FILTER_ERROR_RATE = float(os.environ.get("URL_FILTER_ERROR_RATE", "0.001"))
+
+# Query parameters that track the visit rather than identify the page
+TRACKING_PARAMS = frozenset(
+    "fbclid gclid dclid msclkid mc_cid mc_eid igshid yclid ref ref_src ref_url".split()
+)
+
+
+def _identifying_query(query: str) -> str:
+    params = [
+        (key, value)
+        for key, value in parse_qsl(query, keep_blank_values=True)
+        if key.lower() not in TRACKING_PARAMS and not key.lower().startswith("utm_")
+    ]
+    return urlencode(sorted(params))
+
+
+@lru_cache(maxsize=8192)
+def canonicalize_url(url: str) -> str:
+    """
+    Reduce a recipe URL to a stable form so the same page matches however it
+    was linked: lowercase host without www., no scheme, fragment, trailing
+    slash or tracking parameters (utm_*, fbclid, ...). Other query
+    parameters are kept, sorted, since some sites identify recipes by them
+    ("?id=123").
+    """
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    path = parts.path.rstrip("/") or "/"
+    query = _identifying_query(parts.query) if parts.query else ""
+    return f"{host}{path}?{query}" if query else f"{host}{path}"
+
+
+def _hash_pair(item: str) -> Tuple[int, int]:
+    digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+    return int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings using double hashing"""
+
+    __slots__ = ("size", "hash_count", "bits")
+
+    def __init__(self, capacity: int, error_rate: float = URL_FILTER_ERROR_RATE):
+        capacity = max(1, capacity)
+        size = int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.size = max(8, size)
+        self.hash_count = max(1, int(round(self.size / capacity * math.log(2))))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str):
+        h1, h2 = _hash_pair(item)
+        for i in range(self.hash_count):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, item: str) -> None:
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item: str) -> bool:
+        bits = self.bits
+        for position in self._positions(item):
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+
+class RecipeUrlFilter:
+    """
+    Membership test for a user's hated and saved recipe URLs.
+
+    Small collections are held as an exact set of canonical URLs; larger ones
+    switch to a Bloom filter sized for URL_FILTER_ERROR_RATE plus a sorted
+    array of 64-bit URL fingerprints, about 10 bytes per URL in total, so
+    memory stays small for users with thousands of entries. The Bloom filter
+    rejects most unseen URLs without a lookup; its hits are confirmed by a
+    binary search of the fingerprints, since a Bloom false positive would
+    skip a valid recipe URL as hated or saved, while a fingerprint collision
+    (about 2^-64 per pair) is negligible.
+    """
+
+    __slots__ = ("count", "_exact", "_bloom", "_fingerprints")
+
+    def __init__(self, urls: Iterable[str] = ()):
+        canonical = {canonicalize_url(url) for url in urls if url}
+        self.count = len(canonical)
+        self._exact: Optional[frozenset] = None
+        self._bloom: Optional[BloomFilter] = None
+        self._fingerprints = array("Q")
+
+        if self.count <= URL_FILTER_EXACT_LIMIT:
+            self._exact = frozenset(canonical)
+        else:
+            self._bloom = BloomFilter(self.count)
+            for url in canonical:
+                self._bloom.add(url)
+            self._fingerprints = array("Q", sorted(_hash_pair(url)[0] for url in canonical))
+
+    @property
+    def is_exact(self) -> bool:
+        return self._exact is not None
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __contains__(self, url: str) -> bool:
+        if not self.count:
+            return False
+        key = canonicalize_url(url)
+        if self._exact is not None:
+            return key in self._exact
+        if key not in self._bloom:
+            return False
+        fingerprint = _hash_pair(key)[0]
+        fingerprints = self._fingerprints
+        index = bisect_left(fingerprints, fingerprint)
+        return index < len(fingerprints) and fingerprints[index] == fingerprint
@@ -3,38 +3,205 @@ User context loading for personalized recipe filtering
 Updated to work with user_settings, hated_recipes, and saved_recipes tables
 """
 
+import asyncio
 import logging
-from typing import Optional, List, Dict, Any
-from supabase import Client
-from recipe_storage import get_supabase_service_client
+import os
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Optional, List, Dict, Any
+from data_access import db
+from repository import RecipeRepository, get_repository
+from url_filter import RecipeUrlFilter
+
+if TYPE_CHECKING:
+    from supabase import Client
 
 logger = logging.getLogger(__name__)
 
+# How long a loaded user context is served from memory
+USER_CONTEXT_TTL_SECONDS = float(os.environ.get("USER_CONTEXT_TTL_SECONDS", "60"))
+USER_CONTEXT_CACHE_SIZE = int(os.environ.get("USER_CONTEXT_CACHE_SIZE", "10000"))
+
+
+class UserContextCache:
+    """
+    Per-user TTL cache for loaded user contexts.
+
+    Entries expire after ttl seconds and can be dropped early through
+    invalidate() when settings, hated or saved recipes change. invalidate()
+    also bumps the user's generation and forgets their in-flight load, so
+    a load that started before the change is neither cached nor joined.
+    """
+
+    def __init__(
+        self,
+        ttl: float = USER_CONTEXT_TTL_SECONDS,
+        max_size: int = USER_CONTEXT_CACHE_SIZE,
+    ):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.inflight: Dict[str, asyncio.Future] = {}
+        # Bumped by invalidate(); _epoch covers invalidating every user
+        self._epoch = 0
+        self._generations: "OrderedDict[str, int]" = OrderedDict()
+
+    def generation(self, user_id: str) -> tuple:
+        return self._epoch, self._generations.get(user_id, 0)
+
+    def get(self, user_id: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        expires_at, context = entry
+        if time.monotonic() >= expires_at:
+            self._entries.pop(user_id, None)
+            return None
+        self._entries.move_to_end(user_id)
+        return context
+
+    def set(self, user_id: str, context: Dict[str, Any]) -> None:
+        if self.ttl <= 0:
+            return
+        self._entries[user_id] = (time.monotonic() + self.ttl, context)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: Optional[str] = None) -> None:
+        """Drop one user's context, or every cached context when user_id is None"""
+        if user_id is None:
+            self._entries.clear()
+            self.inflight.clear()
+            self._epoch += 1
+            self._generations.clear()
+            return
+        self._entries.pop(user_id, None)
+        self.inflight.pop(user_id, None)
+        self._generations[user_id] = self._generations.get(user_id, 0) + 1
+        self._generations.move_to_end(user_id)
+        while len(self._generations) > self.max_size:
+            self._generations.popitem(last=False)
+
+
+user_context_cache = UserContextCache()
+
+
+class UserContextUnavailable(Exception):
+    """A user's settings, hated or saved recipes could not be loaded"""
+
+
+def invalidate_user_context(user_id: Optional[str] = None) -> None:
+    """
+    Invalidation hook: call when a user's settings, hated or saved recipes
+    change so the next request reloads them
+    """
+    user_context_cache.invalidate(user_id)
+    logger.info(f"Invalidated user context cache for {user_id or 'all users'}")
+
+
+def _empty_context() -> Dict[str, Any]:
+    return {
+        "diet_type": "",
+        "exclude_ingredients": [],
+        "excluded_urls": [],
+        "saved_urls": [],
+        "settings": {},
+        "url_filter": RecipeUrlFilter(),
+    }
+
 
 class UserContextLoader:
-    def __init__(self):
-        self.supabase: Client = get_supabase_service_client()
+    def __init__(
+        self,
+        cache: Optional[UserContextCache] = None,
+        repository: Optional[RecipeRepository] = None,
+    ):
+        self.cache = cache or user_context_cache
+        self._repository = repository
+
+    @property
+    def repository(self) -> RecipeRepository:
+        return self._repository or get_repository()
+
+    @property
+    def supabase(self) -> "Client":
+        return db.service
 
     async def load_user_context(self, user_id: str) -> Dict[str, Any]:
         """
-        Load complete user context from Supabase tables.
+        Load complete user context from the storage repository.
 
-        Retrieves:
-        - diet_type, allergies, disliked_ingredients from user_settings table
+        Retrieves concurrently:
+        - user_settings row (diet_type, allergies, disliked_ingredients, ...)
         - source_url values from hated_recipes table
         - source_url values from saved_recipes table
 
-        Returns dict with diet_type, exclude_ingredients, and excluded_urls
+        Contexts are cached per user for USER_CONTEXT_TTL_SECONDS and
+        concurrent loads for the same user share one set of queries.
+
+        Returns dict with diet_type, exclude_ingredients, excluded_urls,
+        saved_urls, the raw settings row and a url_filter over hated and
+        saved URLs. Raises UserContextUnavailable when any lookup fails:
+        a context without the user's allergies must not be crawled with.
         """
-        try:
-            # Get user settings (diet preferences and restrictions)
-            settings = await self._get_user_settings(user_id)
+        context = self.cache.get(user_id)
+        if context is not None:
+            return context
 
-            # Get hated recipe URLs
-            hated_urls = await self._get_hated_recipe_urls(user_id)
+        inflight = self.cache.inflight.get(user_id)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
 
-            # Get saved recipe URLs (for reference, not exclusion)
-            saved_urls = await self._get_saved_recipe_urls(user_id)
+        future = asyncio.get_running_loop().create_future()
+        self.cache.inflight[user_id] = future
+        generation = self.cache.generation(user_id)
+        try:
+            context, complete = await self._fetch_user_context(user_id)
+        except BaseException:
+            # Only cancellation gets here; _fetch_user_context handles errors
+            future.cancel()
+            raise
+        finally:
+            # invalidate() may already have replaced or dropped this load
+            if self.cache.inflight.get(user_id) is future:
+                del self.cache.inflight[user_id]
+
+        if not complete:
+            error = UserContextUnavailable(f"Could not load user context for {user_id}")
+            future.set_exception(error)
+            # Marks the exception retrieved when no concurrent load is waiting
+            future.exception()
+            raise error
+
+        if self.cache.generation(user_id) == generation:
+            self.cache.set(user_id, context)
+        else:
+            # Invalidated mid-load: the rows read may predate the change
+            logger.info(f"User context for {user_id} changed while loading, not caching it")
+        future.set_result(context)
+        return context
+
+    async def _fetch_user_context(self, user_id: str):
+        """Run the three lookups concurrently; returns (context, all_succeeded)"""
+        try:
+            settings, hated_urls, saved_urls = await asyncio.gather(
+                self._get_user_settings(user_id),
+                self._get_hated_recipe_urls(user_id),
+                self._get_saved_recipe_urls(user_id),
+                return_exceptions=True,
+            )
+
+            complete = True
+            if isinstance(settings, BaseException):
+                logger.error(f"Error fetching user settings for {user_id}: {settings}")
+                settings, complete = {}, False
+            if isinstance(hated_urls, BaseException):
+                logger.error(f"Error fetching hated recipes for {user_id}: {hated_urls}")
+                hated_urls, complete = [], False
+            if isinstance(saved_urls, BaseException):
+                logger.error(f"Error fetching saved recipes for {user_id}: {saved_urls}")
+                saved_urls, complete = [], False
 
             # Combine allergies and disliked ingredients into exclusion list
             exclude_ingredients = []
@@ -45,10 +212,13 @@ class UserContextLoader:
 
             # Create user context dict
             context = {
-                "diet_type": settings.get("diet_type", ""),
+                "diet_type": settings.get("diet_type", "") or "",
                 "exclude_ingredients": exclude_ingredients,
                 "excluded_urls": hated_urls,
                 "saved_urls": saved_urls,  # Optional: for potential future use
+                "settings": settings,
+                # Built once per cached context; checked before any recipe fetch
+                "url_filter": RecipeUrlFilter(hated_urls + saved_urls),
             }
 
             logger.info(
@@ -56,100 +226,42 @@ class UserContextLoader:
                 f"exclusions={len(exclude_ingredients)}, hated_urls={len(hated_urls)}"
             )
 
-            return context
+            return context, complete
 
         except Exception as e:
             logger.error(f"Error loading user context for {user_id}: {e}")
-            return {
-                "diet_type": "",
-                "exclude_ingredients": [],
-                "excluded_urls": [],
-                "saved_urls": [],
-            }
+            return _empty_context(), False
 
     async def _get_user_settings(self, user_id: str) -> Dict[str, Any]:
         """
-        Fetch user settings from user_settings table
+        Fetch the user's user_settings row (empty dict if none)
         """
-        try:
-            response = (
-                self.supabase.table("user_settings")
-                .select("diet_type, allergies, disliked_ingredients")
-                .eq("user_id", user_id)
-                .execute()
-            )
+        settings = await self.repository.get_user_settings(user_id)
 
-            if response.data:
-                settings = response.data[0]
-                return {
-                    "diet_type": settings.get("diet_type", ""),
-                    "allergies": settings.get("allergies", []) or [],
-                    "disliked_ingredients": settings.get("disliked_ingredients", [])
-                    or [],
-                }
-            else:
-                logger.info(f"No user settings found for user {user_id}")
-                return {"diet_type": "", "allergies": [], "disliked_ingredients": []}
+        if settings:
+            settings["diet_type"] = settings.get("diet_type") or ""
+            settings["allergies"] = settings.get("allergies") or []
+            settings["disliked_ingredients"] = settings.get("disliked_ingredients") or []
+            return settings
 
-        except Exception as e:
-            logger.error(f"Error fetching user settings for {user_id}: {e}")
-            return {"diet_type": "", "allergies": [], "disliked_ingredients": []}
+        logger.info(f"No user settings found for user {user_id}")
+        return {}
 
     async def _get_hated_recipe_urls(self, user_id: str) -> List[str]:
         """
         Fetch list of hated recipe URLs from hated_recipes table
         """
-        try:
-            response = (
-                self.supabase.table("hated_recipes")
-                .select("source_url")
-                .eq("user_id", user_id)
-                .execute()
-            )
-
-            if response.data:
-                urls = [
-                    recipe["source_url"]
-                    for recipe in response.data
-                    if recipe.get("source_url")
-                ]
-                logger.info(f"Found {len(urls)} hated recipes for user {user_id}")
-                return urls
-            else:
-                logger.info(f"No hated recipes found for user {user_id}")
-                return []
-
-        except Exception as e:
-            logger.error(f"Error fetching hated recipes for {user_id}: {e}")
-            return []
+        urls = await self.repository.get_hated_recipe_urls(user_id)
+        logger.info(f"Found {len(urls)} hated recipes for user {user_id}")
+        return urls
 
     async def _get_saved_recipe_urls(self, user_id: str) -> List[str]:
         """
         Fetch list of saved recipe URLs from saved_recipes table
         """
-        try:
-            response = (
-                self.supabase.table("saved_recipes")
-                .select("source_url")
-                .eq("user_id", user_id)
-                .execute()
-            )
-
-            if response.data:
-                urls = [
-                    recipe["source_url"]
-                    for recipe in response.data
-                    if recipe.get("source_url")
-                ]
-                logger.info(f"Found {len(urls)} saved recipes for user {user_id}")
-                return urls
-            else:
-                logger.info(f"No saved recipes found for user {user_id}")
-                return []
-
-        except Exception as e:
-            logger.error(f"Error fetching saved recipes for {user_id}: {e}")
-            return []
+        urls = await self.repository.get_saved_recipe_urls(user_id)
+        logger.info(f"Found {len(urls)} saved recipes for user {user_id}")
+        return urls
 
     def enhance_prompt_with_context(
         self, original_prompt: str, context: Dict[str, Any]
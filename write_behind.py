@@ -0,0 +1,345 @@
+"""
+Write-behind batching for agent_logs and recipe_search writes
+Requests enqueue their writes and return; a background worker flushes them to
+the storage repository in batches on size or time triggers, retrying with backoff
+"""
+
+import asyncio
+import logging
+import os
+import random
+from dataclasses import dataclass, replace
+from typing import Any, Callable, Dict, List, Optional
+
+from repository import get_repository
+
+logger = logging.getLogger(__name__)
+
+WRITE_QUEUE_MAX_SIZE = int(os.environ.get("WRITE_QUEUE_MAX_SIZE", "5000"))
+WRITE_BATCH_SIZE = int(os.environ.get("WRITE_BATCH_SIZE", "200"))
+WRITE_FLUSH_INTERVAL = float(os.environ.get("WRITE_FLUSH_INTERVAL_SECONDS", "0.5"))
+WRITE_MAX_RETRIES = int(os.environ.get("WRITE_MAX_RETRIES", "5"))
+WRITE_BACKOFF_BASE = float(os.environ.get("WRITE_BACKOFF_BASE_SECONDS", "0.2"))
+WRITE_DRAIN_TIMEOUT = float(os.environ.get("WRITE_DRAIN_TIMEOUT_SECONDS", "10"))
+
+
+@dataclass
+class WriteOp:
+    """
+    One queued write.
+
+    kind "insert" appends rows to table. kind "replace" deletes the user's
+    existing rows in table and inserts rows in their place. kind "upsert"
+    inserts rows, updating the existing row when its on_conflict key is
+    already present. on_success runs after the op's rows have been written.
+
+    requires names an upsert the rows reference: if it could not be written,
+    rows whose value for its on_conflict key is among the upsert's rows are
+    dropped before this op is applied. written records the op's outcome.
+    """
+
+    kind: str
+    table: str
+    rows: List[Dict[str, Any]]
+    user_id: Optional[str] = None
+    service: bool = True
+    on_conflict: Optional[str] = None
+    on_success: Optional[Callable[[], None]] = None
+    requires: Optional["WriteOp"] = None
+    written: Optional[bool] = None
+
+
+@dataclass
+class WriteStats:
+    enqueued: int = 0
+    rejected: int = 0
+    flushed_rows: int = 0
+    batches: int = 0
+    retries: int = 0
+    failed_rows: int = 0
+    last_error: Optional[str] = None
+
+    def as_dict(self) -> Dict[str, Any]:
+        return dict(self.__dict__)
+
+
+def _without_unwritten(op: WriteOp) -> WriteOp:
+    """op minus the rows that reference keys of a failed required upsert"""
+    required = op.requires
+    if required is None or required.written is not False:
+        return op
+    key = required.on_conflict
+    missing = {row[key] for row in required.rows}
+    rows = [row for row in op.rows if row.get(key) not in missing]
+    if len(rows) < len(op.rows):
+        logger.warning(
+            f"Write-behind dropping {len(op.rows) - len(rows)} {op.table} rows "
+            f"that reference unwritten {required.table} rows"
+        )
+    return replace(op, rows=rows, requires=None)
+
+
+def _owner(op: WriteOp) -> Optional[str]:
+    """User whose rows op writes, for per-user ordering"""
+    if op.user_id is not None:
+        return op.user_id
+    return op.rows[0].get("user_id") if op.rows else None
+
+
+class WriteBehindQueue:
+    """
+    Bounded in-memory queue with a single flushing worker.
+
+    Ops are collected until WRITE_BATCH_SIZE rows are pending or
+    WRITE_FLUSH_INTERVAL has passed since the first one. Upserts are merged
+    and deduplicated on their conflict key and run first, so rows they
+    reference exist before replaces and inserts are applied; rows that
+    require an upsert that failed are dropped rather than written dangling.
+    Each user's inserts and replaces are then applied in enqueue order (a
+    replace drops the user's earlier writes to the same table), merged
+    across users: one insert call per table, and one delete over all
+    affected users plus one insert per table for replaces. When a merged call fails, its ops are
+    retried one by one so a bad row does not fail other users' writes.
+    """
+
+    def __init__(
+        self,
+        max_size: int = WRITE_QUEUE_MAX_SIZE,
+        batch_size: int = WRITE_BATCH_SIZE,
+        flush_interval: float = WRITE_FLUSH_INTERVAL,
+        max_retries: int = WRITE_MAX_RETRIES,
+        backoff_base: float = WRITE_BACKOFF_BASE,
+    ):
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.stats = WriteStats()
+        self._queue: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._worker: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._worker is not None and not self._worker.done()
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._worker = asyncio.create_task(self._run())
+        logger.info(
+            f"Write-behind queue started (batch={self.batch_size}, "
+            f"interval={self.flush_interval}s, max={self.max_size})"
+        )
+
+    async def stop(self, timeout: float = WRITE_DRAIN_TIMEOUT) -> None:
+        """Flush everything still queued, then stop the worker"""
+        if not self.running:
+            return
+        await self._queue.put(None)  # sentinel: drain and exit
+        try:
+            await asyncio.wait_for(asyncio.shield(self._worker), timeout)
+        except asyncio.TimeoutError:
+            logger.error(
+                f"Write-behind drain timed out with {self.depth} ops still queued"
+            )
+            self._worker.cancel()
+        self._worker = None
+
+    def submit(self, op: WriteOp) -> bool:
+        """
+        Enqueue op without blocking. Returns False when the queue is not
+        running on this thread's loop or is full; callers then write directly.
+        """
+        if not self.running:
+            return False
+        try:
+            if asyncio.get_running_loop() is not self._loop:
+                return False
+        except RuntimeError:
+            return False
+        try:
+            self._queue.put_nowait(op)
+        except asyncio.QueueFull:
+            self.stats.rejected += 1
+            logger.warning("Write-behind queue full, writing synchronously")
+            return False
+        self.stats.enqueued += 1
+        return True
+
+    async def _run(self) -> None:
+        draining = False
+        while not draining:
+            first = await self._queue.get()
+            if first is None:
+                break
+            batch = [first]
+            pending_rows = len(first.rows)
+            deadline = self._loop.time() + self.flush_interval
+
+            while pending_rows < self.batch_size:
+                remaining = deadline - self._loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    op = await asyncio.wait_for(self._queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                if op is None:
+                    draining = True
+                    break
+                batch.append(op)
+                pending_rows += len(op.rows)
+
+            await self._flush(batch)
+
+        # Drain whatever arrived behind the sentinel
+        leftover = []
+        while not self._queue.empty():
+            op = self._queue.get_nowait()
+            if op is not None:
+                leftover.append(op)
+        if leftover:
+            await self._flush(leftover)
+        logger.info("Write-behind queue drained")
+
+    async def _flush(self, batch: List[WriteOp]) -> None:
+        repository = get_repository()
+        upsert_ops = [op for op in batch if op.kind == "upsert"]
+        if upsert_ops:
+            await self._flush_upserts(repository, upsert_ops)
+
+        # Each user's writes, in the order they were enqueued
+        sequences: Dict[Optional[str], List[WriteOp]] = {}
+        for op in batch:
+            if op.kind == "upsert":
+                continue
+            op = _without_unwritten(op)
+            ops = sequences.setdefault(_owner(op), [])
+            target = (op.table, op.service)
+            if op.kind == "replace":
+                # A replace supersedes the user's earlier writes to the table
+                ops[:] = [queued for queued in ops if (queued.table, queued.service) != target]
+            elif ops and ops[-1].kind == "insert" and (ops[-1].table, ops[-1].service) == target:
+                ops[-1] = WriteOp("insert", op.table, ops[-1].rows + op.rows, ops[-1].user_id, op.service)
+                continue
+            ops.append(op)
+
+        # Round n writes every user's n-th op, merged across users; a user
+        # has at most one op per round, so their order is kept
+        while sequences:
+            await self._flush_round(repository, [ops.pop(0) for ops in sequences.values()])
+            sequences = {owner: ops for owner, ops in sequences.items() if ops}
+
+        self.stats.batches += 1
+
+    async def _flush_upserts(self, repository, ops: List[WriteOp]) -> None:
+        groups: Dict[tuple, List[WriteOp]] = {}
+        for op in ops:
+            groups.setdefault((op.table, op.service, op.on_conflict), []).append(op)
+
+        for (table, service, on_conflict), group in groups.items():
+
+            def write(parts, t=table, s=service, c=on_conflict):
+                by_key = {}
+                for op in parts:
+                    for row in op.rows:
+                        by_key[row[c]] = row
+                return repository.upsert_rows(t, list(by_key.values()), c, service=s)
+
+            written = await self._write_parts(f"{table}.upsert", group, write)
+            for op, ok in zip(group, written):
+                op.written = ok
+                if ok and op.on_success:
+                    op.on_success()
+
+    async def _flush_round(self, repository, ops: List[WriteOp]) -> None:
+        groups: Dict[tuple, List[WriteOp]] = {}
+        for op in ops:
+            groups.setdefault((op.kind, op.table, op.service), []).append(op)
+
+        for (kind, table, service), group in groups.items():
+            if kind == "replace":
+
+                def write(parts, t=table, s=service):
+                    rows = [row for op in parts for row in op.rows]
+                    return repository.replace_user_rows(t, [op.user_id for op in parts], rows, service=s)
+
+            else:
+
+                def write(parts, t=table, s=service):
+                    return repository.insert_rows(t, [row for op in parts for row in op.rows], service=s)
+
+            await self._write_parts(f"{table}.{kind}", group, write)
+
+    async def _write_parts(self, label: str, parts: List[WriteOp], write) -> List[bool]:
+        """
+        Write parts as one merged call; if that fails, write each part on
+        its own with retries, so one bad row only costs its own op.
+        Returns whether each part was written.
+        """
+        if len(parts) > 1:
+            try:
+                await write(parts)
+                self.stats.flushed_rows += sum(len(op.rows) for op in parts)
+                return [True] * len(parts)
+            except Exception as e:
+                self.stats.last_error = str(e)
+                logger.warning(f"Write-behind {label} failed for {len(parts)} ops, writing them one by one: {e}")
+        return list(
+            await asyncio.gather(
+                *(self._with_retries(label, len(op.rows), lambda part=[op]: write(part)) for op in parts)
+            )
+        )
+
+    async def apply_now(self, op: WriteOp) -> None:
+        """Perform op immediately, bypassing the queue (used as the fallback path)"""
+        repository = get_repository()
+        write = _without_unwritten(op)
+        if write.kind == "upsert":
+            await repository.upsert_rows(write.table, write.rows, write.on_conflict, service=write.service)
+        elif write.kind == "replace":
+            await repository.replace_user_rows(
+                write.table, [write.user_id], write.rows, service=write.service
+            )
+        else:
+            await repository.insert_rows(write.table, write.rows, service=write.service)
+        op.written = True
+        if op.on_success:
+            op.on_success()
+
+    async def _with_retries(self, label: str, row_count: int, write) -> bool:
+        for attempt in range(self.max_retries + 1):
+            try:
+                await write()
+                self.stats.flushed_rows += row_count
+                return True
+            except Exception as e:
+                self.stats.last_error = str(e)
+                if attempt == self.max_retries:
+                    self.stats.failed_rows += row_count
+                    logger.error(
+                        f"Write-behind {label} failed after {attempt + 1} attempts, "
+                        f"dropping {row_count} rows: {e}"
+                    )
+                    return False
+                self.stats.retries += 1
+                delay = self.backoff_base * (2**attempt)
+                delay += random.uniform(0, delay / 2)
+                logger.warning(
+                    f"Write-behind {label} failed (attempt {attempt + 1}), retrying in {delay:.2f}s: {e}"
+                )
+                await asyncio.sleep(delay)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"running": self.running, "depth": self.depth, **self.stats.as_dict()}
+
+
+write_queue = WriteBehindQueue()